@@ -1,48 +1,491 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.report_service import generate_report
-import tempfile, shutil, os
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from app.api.uploads import finalize_upload, receive_form, receive_upload, resolve_input_path
+from app.core.config import settings
+from app.services.artifact_service import REPORT_PDF, TRANSCRIPTION_PDF, get_artifact_store
+from app.services.job_service import PRIORITIES, BatchEntry, QueueFullError, get_job_manager
+from app.services.live_service import LiveSession
+from app.services.upload_service import (
+    UploadConflictError, UploadNotFoundError, UploadRangeError, UploadTooLargeError, get_upload_store,
+    parse_content_range,
+)
+from app.services.report_formats import parse_sections, to_html, to_json, to_markdown
+from app.services.report_service import (
+    audio_hash, ensure_report_pdf, prepare_report, report_key, stream_report_summary,
+)
+import json, os
 
 router = APIRouter(prefix="/report", tags=["Report Generator"])
-#POST endpoint to generate a meeting report from an uploaded audio file
-@router.post("/generate")
-async def generate_meeting_report(file: UploadFile = File(...)):
-    # Validate the file extension (only supported audio formats)
-    allowed_extensions = (".wav", ".mp3", ".m4a", ".ogg")
-    if not file.filename.lower().endswith(allowed_extensions):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file format. Allowed extensions: {', '.join(allowed_extensions)}"
-        )
-
-    tmp = None
-    try:
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            audio_path = tmp.name
-
-        # generate report
-        result = generate_report(audio_path)
-
-        # check the output
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
-
-        return {
-            "summary": result.get("summary", "Summary not available."),
-            "pdf_path": result.get("pdf_path", None),
-            "language": result.get("language", "unknown"),
-        }
-
-    except HTTPException:
-        raise
+
+#Report formats ("format" query parameter) and their media types
+REPORT_FORMATS = {
+    "json": "application/json",
+    "markdown": "text/markdown",
+    "html": "text/html",
+    "pdf": "application/pdf",
+}
+
+#Request bodies of the upload endpoints, documented for OpenAPI (the forms are
+#parsed while they arrive, see receive_form)
+AUDIO_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+BATCH_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "properties": {
+        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        "paths": {"type": "array", "items": {"type": "string"}},
+        "priority": {"type": "string", "enum": list(PRIORITIES), "default": "batch"},
+    },
+}}}}}
+
+#Function to remove a temporary upload once it is no longer needed
+def remove_temp_file(path: str):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception as cleanup_err:
+            print(f"Could not remove temporary file: {cleanup_err}", flush=True)
+
+#POST endpoint to generate a meeting report from an uploaded audio file, answered
+#as JSON (default), Markdown, HTML or PDF (Accept header or "format" parameter)
+@router.post("/generate", openapi_extra=AUDIO_FORM)
+async def generate_meeting_report(request: Request, accept: Optional[str] = Header(None),
+                                  report_format: Optional[str] = Query(None, alias="format")):
+    # Choose the format before the work is done (406 if none can be served)
+    fmt = negotiate_format(accept, report_format)
+    # Store the upload under its real format (rejects unsupported or oversized files)
+    audio_path = await receive_upload(request)
+    # generate report in a background job (identical pending requests share it),
+    # the event loop keeps serving while waiting for it
+    job = await submit_job(audio_path)
+    await job.wait()
+
+    # check the output
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error)
+
+    return await report_response(job.result, fmt, {
+        "summary": job.result.get("summary", "Summary not available."),
+        "pdf_path": job.result.get("pdf_path", None),
+        "language": job.result.get("language", "unknown"),
+        **download_urls(job.result),
+    })
+
+#POST endpoint streaming the final summary as plain text while the model
+#generates it (the PDFs are written once the stream ends)
+@router.post("/generate/stream", openapi_extra=AUDIO_FORM)
+async def stream_meeting_report(request: Request):
+    # Transcription and chunk summaries run as a job, queued like the other
+    # reports, only the final merge is streamed by this request
+    job = await submit_job(await receive_upload(request), prepare_only=True)
+    await job.wait()
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=job.error)
+    prepared = job.result
+    # The report is available by id once the stream ends
+    report_id, _ = await run_in_threadpool(get_artifact_store().create)
+
+    return StreamingResponse(
+        stream_report_summary(prepared, report_id),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "X-Report-Id": report_id,
+            "X-Report-Language": str(prepared["language"]),
+            "X-Report-Participants": ", ".join(prepared["participants"]),
+        },
+    )
+
+#Function to build the download URLs of the PDFs of a report result
+#(rendered on their first download)
+def download_urls(result: dict) -> dict:
+    report_id = result.get("report_id")
+    return {
+        "report_id": report_id,
+        "pdf_url": f"{router.prefix}/files/{report_id}/{REPORT_PDF}" if report_id else None,
+        "transcription_pdf_url": f"{router.prefix}/files/{report_id}/{TRANSCRIPTION_PDF}" if report_id else None,
+    }
+
+#Function to choose a report format: the "format" query parameter if given,
+#else the preferred type of the Accept header that can be served (JSON by default)
+def negotiate_format(accept: Optional[str], report_format: Optional[str]) -> str:
+    if report_format:
+        report_format = {"md": "markdown"}.get(report_format.lower(), report_format.lower())
+        if report_format not in REPORT_FORMATS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown format, expected one of: {', '.join(REPORT_FORMATS)}")
+        return report_format
+    if not accept:
+        return "json"
+
+    media_ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            media_ranges.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(media_ranges):
+        if media_type in ("*/*", "application/*"):
+            return "json"
+        if media_type == "text/*":
+            return "markdown"
+        for name, served_type in REPORT_FORMATS.items():
+            if media_type == served_type:
+                return name
+    raise HTTPException(status_code=406,
+                        detail=f"Reports are available as: {', '.join(REPORT_FORMATS.values())}")
+
+#Function to answer with a report in the chosen format; `body` is the JSON answer
+#(completed with the summary sections), the PDF is rendered if not done yet
+async def report_response(result: dict, report_format: str, body: dict,
+                          if_none_match: Optional[str] = None) -> Response:
+    headers = {"Vary": "Accept"}
+    if report_format == "pdf":
+        if not result.get("report_id"):
+            raise HTTPException(status_code=404, detail="No PDF available for this report.")
+        response = await pdf_file_response(result["report_id"], REPORT_PDF, if_none_match)
+        response.headers.update(headers)
+        return response
+    if report_format == "markdown":
+        return Response(to_markdown(result), media_type="text/markdown; charset=utf-8", headers=headers)
+    if report_format == "html":
+        return HTMLResponse(to_html(result), headers=headers)
+    return JSONResponse({**body, "sections": parse_sections(result.get("summary", ""))}, headers=headers)
+
+#Function to serve a report PDF (rendered on its first request) with ETag
+#(304 when the client copy is current) and Range support; a report never
+#changes once written, so clients may cache it
+async def pdf_file_response(report_id: str, name: str, if_none_match: Optional[str]) -> Response:
+    path = await run_in_threadpool(ensure_report_pdf, report_id, name)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path) if path else None
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired report file.")
+
+    headers = {"Cache-Control": f"private, max-age={settings.ARTIFACT_TTL_SECONDS}, immutable"}
+    response = FileResponse(path, media_type="application/pdf", filename=name,
+                            stat_result=stat_result, headers=headers)
+    if if_none_match and etag_matches(if_none_match, response.headers["etag"]):
+        return Response(status_code=304, headers={"ETag": response.headers["etag"], **headers})
+    return response
+
+#Function to tell whether an If-None-Match header matches the ETag of a file
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+#Function to look up a job or answer 404
+def find_job(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
+#Function to hash an audio file off the event loop: its report key and its
+#content hash, passed on to the pipeline (None, None if it cannot be read:
+#the report is then not shared)
+async def audio_key(audio_path: str):
+    try:
+        content_hash = await run_in_threadpool(audio_hash, audio_path)
     except Exception as e:
-        # Catch any unexpected error during processing
-        print(f"Error during report generation: {e}", flush=True)
-        raise HTTPException(status_code=500, detail=f"Internal error : {e}")
+        print(f"Could not hash upload, report will not be shared: {e}", flush=True)
+        return None, None
+    return report_key(audio_path, content_hash), content_hash
+
+#Function to answer 503 when the job queue is full
+def queue_full(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+#Function to queue the report of an uploaded file (503 when too many jobs are pending),
+#attaching it to the pending job of the same audio and options if there is one;
+#with `prepare_only` the job stops before the final merge (prepare_report result)
+async def submit_job(audio_path: str, prepare_only: bool = False):
+    key, content_hash = await audio_key(audio_path)
+    runner = None
+    if prepare_only:
+        runner, key = prepare_report, key and f"{key}:prepared"
+    try:
+        return get_job_manager().submit(audio_path, key, content_hash=content_hash, runner=runner)
+    except QueueFullError as e:
+        remove_temp_file(audio_path)
+        raise queue_full(e)
+
+#Function to format one job event as a Server-Sent Event (None = keep-alive comment)
+def format_sse(event) -> str:
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+#Function to stream the events of a job (stages, chunk summaries, final result)
+def event_stream(job, after: int = 0):
+    async def events():
+        async for event in job.iter_events(after):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Job-Id": job.id},
+    )
+
+#POST endpoint queuing a report job, answers at once with the job id
+@router.post("/jobs", status_code=202, openapi_extra=AUDIO_FORM)
+async def submit_report_job(request: Request):
+    job = await submit_job(await receive_upload(request))
+    return {"job_id": job.id, "status": job.status}
+
+#POST endpoint generating a report while streaming its progress and partial
+#chunk summaries as Server-Sent Events (the last event carries the result)
+@router.post("/generate/events", openapi_extra=AUDIO_FORM)
+async def generate_meeting_report_events(request: Request):
+    return event_stream(await submit_job(await receive_upload(request)))
+
+#GET endpoint following the events of a job, resuming after Last-Event-ID
+@router.get("/jobs/{job_id}/events")
+async def get_report_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    job = find_job(job_id)
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return event_stream(job, after)
+
+#GET endpoint returning the status and stage progress of a job
+@router.get("/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    return find_job(job_id).to_dict()
+
+#GET endpoint returning the report of a finished job as JSON (summary, sections
+#and PDF URLs), Markdown, HTML or PDF (Accept header or "format" parameter)
+@router.get("/jobs/{job_id}/result")
+async def get_report_job_result(job_id: str, accept: Optional[str] = Header(None),
+                                report_format: Optional[str] = Query(None, alias="format"),
+                                if_none_match: Optional[str] = Header(None)):
+    fmt = negotiate_format(accept, report_format)
+    job = find_job(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    return await report_response(job.result, fmt, {
+        "summary": job.result.get("summary", "Summary not available."),
+        "pdf_path": job.result.get("pdf_path"),
+        "transcription_pdf_path": job.result.get("transcription_pdf_path"),
+        "participants": job.result.get("participants", []),
+        "language": job.result.get("language", "unknown"),
+        **download_urls(job.result),
+    }, if_none_match)
+
+#GET endpoint returning a stored report by id (e.g. from a live meeting or a
+#streamed summary) in the format negotiated like the job results
+@router.get("/reports/{report_id}")
+async def get_report(report_id: str, accept: Optional[str] = Header(None),
+                     report_format: Optional[str] = Query(None, alias="format"),
+                     if_none_match: Optional[str] = Header(None)):
+    fmt = negotiate_format(accept, report_format)
+    report = await run_in_threadpool(get_artifact_store().load_data, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired report.")
+    result = {**report, "report_id": report_id}
+    body = {key: value for key, value in to_json(result).items() if key != "sections"}
+    return await report_response(result, fmt, {**body, **download_urls(result)}, if_none_match)
+
+#GET/HEAD endpoint downloading a report PDF ("report.pdf" or "transcription.pdf"),
+#rendered on its first download
+@router.api_route("/files/{report_id}/{name}", methods=["GET", "HEAD"])
+async def download_report_file(report_id: str, name: str, if_none_match: Optional[str] = Header(None)):
+    return await pdf_file_response(report_id, name, if_none_match)
+
+#POST endpoint queuing the reports of many meetings at once (e.g. nightly):
+#uploaded files and/or paths under BATCH_INPUT_DIR, run after interactive requests
+#unless priority is "interactive" (form fields "files", "paths" and "priority")
+@router.post("/batches", status_code=202, openapi_extra=BATCH_FORM)
+async def submit_report_batch(request: Request):
+    # Uploads are written to disk as they arrive (at most BATCH_MAX_FILES)
+    form = await receive_form(request, "files", max_files=settings.BATCH_MAX_FILES)
+    try:
+        priority = (form.values("priority") or ["batch"])[-1]
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=400, detail=f"Unknown priority, expected one of: {', '.join(PRIORITIES)}")
+        paths = [path for path in form.values("paths") if path]
+        if not form.files and not paths:
+            raise HTTPException(status_code=400, detail="No audio files or paths given.")
+        entries = []
+        for path in paths:
+            entries.append(BatchEntry(await run_in_threadpool(resolve_input_path, path), owns_file=False))
+        entries += [BatchEntry(path) for path in form.paths("files")]
+        for entry in entries:
+            entry.key, entry.content_hash = await audio_key(entry.audio_path)
+        batch = get_job_manager().submit_batch(entries, priority)
+    except BaseException as e:
+        # Nothing was queued: drop the files uploaded with the batch
+        form.remove_files()
+        if isinstance(e, QueueFullError):
+            raise queue_full(e)
+        raise
+    return {"batch_id": batch.id, "job_ids": [job.id for job in batch.jobs]}
+
+#GET endpoint returning the jobs of a batch and its throughput
+@router.get("/batches/{batch_id}")
+async def get_report_batch(batch_id: str):
+    batch = get_job_manager().get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired batch.")
+    return batch.to_dict()
+
+#Function to turn an upload session error into an HTTP error
+def upload_error(e: Exception) -> HTTPException:
+    if isinstance(e, UploadNotFoundError):
+        return HTTPException(status_code=404, detail="Unknown or expired upload.")
+    if isinstance(e, UploadConflictError):
+        return HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    if isinstance(e, UploadRangeError):
+        return HTTPException(status_code=400, detail=str(e))
+    return HTTPException(status_code=413, detail=str(e))
+
+#POST endpoint opening a resumable upload (total size in Upload-Length if known)
+@router.post("/uploads", status_code=201)
+async def create_upload(response: Response, upload_length: Optional[int] = Header(None)):
+    try:
+        session = get_upload_store().create(upload_length)
+    except UploadTooLargeError as e:
+        raise upload_error(e)
+    response.headers["Location"] = f"{router.prefix}/uploads/{session['upload_id']}"
+    return session
+
+#GET/HEAD endpoint returning the offset to resume an upload from
+@router.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"])
+async def get_upload(upload_id: str, response: Response):
+    try:
+        session = get_upload_store().status(upload_id)
+    except UploadNotFoundError as e:
+        raise upload_error(e)
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+#PUT endpoint appending one byte range ("Content-Range: bytes start-end/total"),
+#the request body being written to the upload file as it arrives. The body
+#must be exactly the range, the first total sent becomes the upload size
+@router.put("/uploads/{upload_id}")
+async def put_upload_range(upload_id: str, request: Request, response: Response,
+                           content_range: str = Header(...)):
+    try:
+        start, end, total = parse_content_range(content_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length != str(end - start + 1):
+        raise HTTPException(status_code=400, detail=f"Body length does not match range {start}-{end}.")
+    store = get_upload_store()
+    try:
+        with store.writer(upload_id, start, total, end) as write:
+            async for chunk in request.stream():
+                if chunk:
+                    await run_in_threadpool(write, chunk)
+        session = store.status(upload_id)
+    except ClientDisconnect:
+        # What arrived is kept: the client resumes from the new offset
+        return Response(status_code=400)
+    except (UploadNotFoundError, UploadConflictError, UploadTooLargeError, UploadRangeError) as e:
+        raise upload_error(e)
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+#POST endpoint closing a complete upload and queuing its report job
+@router.post("/uploads/{upload_id}/finalize", status_code=202)
+async def finalize_resumable_upload(upload_id: str):
+    try:
+        audio_path = await run_in_threadpool(finalize_upload, get_upload_store(), upload_id)
+    except (UploadNotFoundError, UploadConflictError) as e:
+        raise upload_error(e)
+    job = await submit_job(audio_path)
+    return {"job_id": job.id, "status": job.status}
+
+#DELETE endpoint aborting an upload
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str):
+    try:
+        get_upload_store().delete(upload_id)
+    except UploadNotFoundError as e:
+        raise upload_error(e)
+
+#WebSocket endpoint for live meetings: the client sends 16 kHz mono 16-bit PCM
+#as binary frames and "stop" when the meeting ends; the server sends JSON
+#messages: "segment" (transcribed text), "summary" (a chunk summary), then
+#"report" (final summary and PDFs) or "error"
+@router.websocket("/live")
+async def live_meeting(websocket: WebSocket):
+    await websocket.accept()
+    session = LiveSession(websocket.query_params.get("language"))
+    outbox = asyncio.Queue()
+    summary_tasks = set()
+    processing = None
+
+    # Single writer: messages come from the transcription and summary tasks
+    async def send_messages():
+        while (message := await outbox.get()) is not None:
+            await websocket.send_json(message)
+
+    async def forward_summary(chunk: int, future):
+        summary = await asyncio.wrap_future(future)
+        if summary is not None:
+            await outbox.put({"type": "summary", "chunk": chunk, "summary": summary})
+
+    async def process(final: bool = False):
+        try:
+            segments, submitted = await run_in_threadpool(session.process, final)
+        except Exception as e:
+            print(f"Live transcription error: {e}", flush=True)
+            await outbox.put({"type": "error", "detail": "Transcription failed."})
+            return
+        for segment in segments:
+            await outbox.put({"type": "segment", **segment})
+        for chunk, future in submitted:
+            task = asyncio.create_task(forward_summary(chunk, future))
+            summary_tasks.add(task)
+            task.add_done_callback(summary_tasks.discard)
+
+    sender = asyncio.create_task(send_messages())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                session.transcriber.add_pcm(message["bytes"])
+            elif message.get("text", "").strip().lower() == "stop":
+                break
+            # One transcription pass at a time, frames keep arriving meanwhile
+            if session.transcriber.ready() and (processing is None or processing.done()):
+                processing = asyncio.create_task(process())
+
+        if processing is not None:
+            await processing
+        await process(final=True)
+        await asyncio.gather(*summary_tasks)
+        report = await run_in_threadpool(session.finish)
+        if "error" in report:
+            await outbox.put({"type": "error", "detail": report["error"]})
+        else:
+            await outbox.put({"type": "report", **report})
+        await outbox.put(None)
+        await sender
+        await websocket.close()
     finally:
-        if tmp and os.path.exists(tmp.name):
-            try:
-                os.remove(tmp.name)
-            except Exception as cleanup_err:
-                print(f"Could not remove temporary file: {cleanup_err}", flush=True)
\ No newline at end of file
+        sender.cancel()
+        if processing is not None:
+            processing.cancel()
+        for task in summary_tasks:
+            task.cancel()
+        session.close()
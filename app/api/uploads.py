@@ -0,0 +1,378 @@
+"""
+Audio upload handling: format detection, size limit and off-loop disk writes.
+
+Multipart bodies are parsed as they arrive and each file is written once,
+straight to its temporary file.
+"""
+
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.services.upload_service import UploadSessionStore
+
+if TYPE_CHECKING:
+    from python_multipart.multipart import MultipartCallbacks
+
+# Bytes needed to recognise every supported container
+HEADER_BYTES = 12
+SUPPORTED_FORMATS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+# Largest form field other than a file (batch paths, options)
+MAX_FIELD_BYTES = 64 * 1024
+
+
+def detect_audio_format(header: bytes) -> Optional[str]:
+    """Return the file suffix of the audio container starting with `header`."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return ".wav"
+    if header[:3] == b"ID3" or (
+        len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0
+    ):
+        return ".mp3"
+    if header[4:8] == b"ftyp":
+        return ".m4a"
+    if header[:4] == b"OggS":
+        return ".ogg"
+    if header[:4] == b"fLaC":
+        return ".flac"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return ".webm"
+    return None
+
+
+def too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload larger than {settings.UPLOAD_MAX_BYTES} bytes.",
+    )
+
+
+def unsupported_format() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unsupported audio format. Supported formats: {', '.join(SUPPORTED_FORMATS)}",
+    )
+
+
+class _FilePart:
+    """A file of a multipart body, written to disk as its data arrives."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pending = bytearray()
+        self.size = 0
+        self.ended = False
+        self.out: Optional[BinaryIO] = None
+
+
+@dataclass
+class UploadForm:
+    """A multipart form whose files were written to temporary files."""
+
+    # (field name, path) of the files, (field name, value) of the other fields
+    files: List[Tuple[str, str]] = field(default_factory=list)
+    fields: List[Tuple[str, str]] = field(default_factory=list)
+
+    def paths(self, name: str) -> List[str]:
+        return [path for key, path in self.files if key == name]
+
+    def values(self, name: str) -> List[str]:
+        return [value for key, value in self.fields if key == name]
+
+    def remove_files(self) -> None:
+        for _, path in self.files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.files.clear()
+
+
+class _FormParser:
+    """python-multipart callbacks collecting one form (see receive_form)."""
+
+    def __init__(self, file_field: str, max_files: int, max_bytes: int):
+        self.file_field = file_field
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.form = UploadForm()
+        # File parts with data not written yet or a file still open
+        self.parts: List[_FilePart] = []
+        self._file_count = 0
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part: Optional[_FilePart] = None
+        self._field: Optional[Tuple[str, bytearray]] = None
+
+    def callbacks(self) -> "MultipartCallbacks":
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers, self._part, self._field = {}, None, None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def on_headers_finished(self) -> None:
+        disposition = self._headers.get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._field = (name, bytearray())
+        elif filename:  # An empty file input is sent without a file name
+            if name != self.file_field:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f'Unexpected file in form field "{name}".',
+                )
+            self._file_count += 1
+            if self._file_count > self.max_files:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"At most {self.max_files} files per request.",
+                )
+            self._part = _FilePart(name)
+            self.parts.append(self._part)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part is not None:
+            self._part.size += end - start
+            if self._part.size > self.max_bytes:
+                raise too_large()
+            self._part.pending += data[start:end]
+        elif self._field is not None:
+            self._field[1].extend(data[start:end])
+            if len(self._field[1]) > MAX_FIELD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Form field {self._field[0]} is too large.",
+                )
+
+    def on_part_end(self) -> None:
+        if self._part is not None:
+            self._part.ended = True
+        elif self._field is not None:
+            name, value = self._field
+            self.form.fields.append((name, value.decode("utf-8", "replace")))
+
+    async def write_files(self) -> None:
+        """Write the file data received so far, off the event loop."""
+        for part in self.parts:
+            if part.out is None:
+                if len(part.pending) < HEADER_BYTES and not part.ended:
+                    continue
+                suffix = detect_audio_format(bytes(part.pending[:HEADER_BYTES]))
+                if suffix is None:
+                    raise unsupported_format()
+                fd, path = tempfile.mkstemp(suffix=suffix)
+                part.out = os.fdopen(fd, "wb")
+                self.form.files.append((part.name, path))
+            if part.pending:
+                data, part.pending = bytes(part.pending), bytearray()
+                await run_in_threadpool(part.out.write, data)
+            if part.ended:
+                part.out.close()
+        self.parts = [part for part in self.parts if not part.ended]
+
+    def discard(self) -> None:
+        """Close and remove every file written for the form."""
+        for part in self.parts:
+            if part.out is not None:
+                part.out.close()
+        self.form.remove_files()
+
+
+async def receive_form(
+    request: Request,
+    file_field: str,
+    max_files: int = 1,
+    max_bytes: Optional[int] = None,
+) -> UploadForm:
+    """Parse a multipart body, writing each file straight to a temporary file.
+
+    Request.form() spools the files to temporary files that would then be
+    copied again; here each file is written once, in chunks off the event
+    loop, named after the format detected from its first bytes. Files are only
+    accepted in `file_field`; a file elsewhere, in an unknown format or larger
+    than `max_bytes`, or more than `max_files` files, reject the form and every
+    file written for it is removed.
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data body.",
+        )
+
+    parser = _FormParser(file_field, max_files, max_bytes)
+    body = MultipartParser(params[b"boundary"], parser.callbacks())
+    try:
+        async for chunk in request.stream():
+            body.write(chunk)
+            await parser.write_files()
+        body.finalize()
+        await parser.write_files()
+        if parser.parts:
+            raise ValueError("body ends inside a file")
+    except ValueError as e:  # python-multipart parse errors
+        parser.discard()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid multipart body: {e}",
+        )
+    except BaseException:
+        parser.discard()
+        raise
+    return parser.form
+
+
+async def receive_upload(request: Request, max_bytes: Optional[int] = None) -> str:
+    """Write the audio file of a form (field "file") to a temporary file.
+
+    The file is named after its real format; see receive_form.
+    """
+    form = await receive_form(request, "file", max_bytes=max_bytes)
+    paths = form.paths("file")
+    if not paths:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No audio file given (form field "file").',
+        )
+    return paths[0]
+
+
+def resolve_input_path(path: str) -> str:
+    """Return the real path of an audio file named in a batch.
+
+    Only files under BATCH_INPUT_DIR can be named; they are read in place
+    and never removed.
+    """
+    if not settings.BATCH_INPUT_DIR:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch paths are disabled (BATCH_INPUT_DIR is not set).",
+        )
+    root = os.path.realpath(settings.BATCH_INPUT_DIR)
+    real_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, real_path]) != root or not os.path.isfile(real_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No file {path} in the batch input directory.",
+        )
+    with open(real_path, "rb") as f:
+        if detect_audio_format(f.read(HEADER_BYTES)) is None:
+            raise unsupported_format()
+    return real_path
+
+
+def finalize_upload(store: UploadSessionStore, upload_id: str) -> str:
+    """Move a complete resumable upload to a temporary file named after its format."""
+    suffix = detect_audio_format(store.read_header(upload_id, HEADER_BYTES))
+    if suffix is None:
+        raise unsupported_format()
+    # Same directory as the part file, so the move is a rename
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=settings.UPLOAD_DIR)
+    os.close(fd)
+    try:
+        store.finalize(upload_id, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def body_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request body larger than {max_bytes} bytes.",
+    )
+
+
+class MaxBodySizeMiddleware:
+    """Reject request bodies larger than `max_bytes` before they are parsed.
+
+    `route_limits` sets another limit for the given paths (e.g. requests
+    uploading several files). A declared Content-Length over the limit is
+    answered with 413 (400 when it is not a valid length) without reading
+    the body; bodies without one (chunked transfer) are counted while they
+    arrive.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_bytes: int,
+        route_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.route_limits = route_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.route_limits.get(scope["path"], self.max_bytes)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = -1
+            if declared < 0:
+                response = JSONResponse(
+                    {"detail": "Invalid Content-Length header."},
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+                await response(scope, receive, send)
+                return
+            if declared > max_bytes:
+                response = JSONResponse(
+                    {"detail": body_too_large(max_bytes).detail},
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise body_too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
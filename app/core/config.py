@@ -27,6 +27,97 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # Speech models
+    WHISPER_MODEL: str = "small"
+    WHISPER_DEVICE: str = "auto"  # "auto", "cpu" or "cuda"
+    WHISPER_COMPUTE_TYPE: str = "default"
+    DIARIZATION_MODEL: str = "pyannote/speaker-diarization-3.1"
+    WARMUP_MODELS: bool = True
+
+    # Run transcription and diarization at the same time, each stage with its
+    # own CPU-thread budget (0 = half of the cores each when concurrent)
+    PIPELINE_CONCURRENT: bool = True
+    WHISPER_CPU_THREADS: int = 0
+    DIARIZATION_CPU_THREADS: int = 0
+
+    # Stream segments into speaker assignment, chunking and summarization while
+    # the audio is still being transcribed
+    PIPELINE_STREAMING: bool = False
+
+    # Long recordings (CPU only) are split at silences found by VAD and the
+    # pieces are transcribed in a process pool (0 workers = half of the cores)
+    LONG_AUDIO_MIN_SECONDS: int = 1800
+    LONG_AUDIO_PIECE_SECONDS: int = 600
+    LONG_AUDIO_WORKERS: int = 0
+
+    # Local caches (transcription/diarization results keyed by audio content)
+    CACHE_DIR: str = ".cache"
+    TRANSCRIPT_CACHE_ENABLED: bool = True
+    TRANSCRIPT_CACHE_MAX_ENTRIES: int = 200
+    TRANSCRIPT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # LLM responses keyed by system prompt, prompt, model and max_tokens
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 5000
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Groq LLM: model, account rate limits and chunk summaries run in parallel
+    GROQ_MODEL: str = "llama-3.1-8b-instant"
+    GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"
+    GROQ_MAX_CONNECTIONS: int = 10
+    # The token budget sets the summarization throughput: a chunk call costs
+    # about CHUNK_MAX_TOKENS plus 1000 completion tokens, so the free tier
+    # limits below (6000 tokens per minute) allow one call at a time
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    # Share the rate limit budget between worker processes (SQLite in CACHE_DIR)
+    GROQ_RATE_LIMIT_SHARED: bool = True
+    # LLM calls in flight at once; 0 runs as many as the token budget allows
+    # per minute (1 with the limits above), up to GROQ_MAX_CONNECTIONS
+    SUMMARY_CONCURRENCY: int = 0
+    # Token budget of the transcript in one chunk prompt (whole speaker turns)
+    CHUNK_MAX_TOKENS: int = 3000
+    # Partial summaries merged per request in the tree reduction of the final report
+    MERGE_FAN_IN: int = 6
+    # Drop low-information transcript lines (TF-IDF, per speaker) before chunking
+    EXTRACTIVE_REDUCTION: bool = False
+    EXTRACTIVE_KEEP_RATIO: float = 0.6
+
+    # Background report jobs: pipelines run at once, jobs waiting or running
+    # before submissions are refused, and how long finished jobs are kept.
+    # POST /report/generate also runs through these jobs: one pipeline already
+    # uses every core, so uploads of different audio wait their turn (identical
+    # ones share a job) and are answered 503 beyond JOB_MAX_PENDING
+    JOB_WORKERS: int = 1
+    JOB_MAX_PENDING: int = 64
+    JOB_TTL_SECONDS: int = 3600
+    # Batch jobs (nightly processing) wait behind interactive ones and have
+    # their own pending limit; batches may name files under BATCH_INPUT_DIR
+    # instead of uploading them (empty: uploads only)
+    BATCH_MAX_PENDING: int = 500
+    BATCH_INPUT_DIR: str = ""
+    # Files uploaded in one batch request (its body limit scales with it)
+    BATCH_MAX_FILES: int = 20
+
+    # Uploads: largest accepted audio file and size of the chunks written to disk
+    UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    # Resumable upload sessions (partial files) and how long they are kept
+    UPLOAD_DIR: str = ".uploads"
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600
+    # Report PDFs (one directory per report) and how long they are kept
+    ARTIFACT_DIR: str = ".reports"
+    ARTIFACT_TTL_SECONDS: int = 7 * 24 * 3600
+    # Processes rendering the summary and transcription PDFs side by side
+    PDF_WORKERS: int = 2
+    # Render the PDFs when a report is generated instead of on first download
+    REPORT_EAGER_PDF: bool = False
+
+    # Live meetings (WebSocket PCM): new audio between two transcription passes,
+    # end of window re-decoded with the next pass, longest pending window
+    LIVE_STEP_SECONDS: float = 5.0
+    LIVE_TAIL_SECONDS: float = 1.5
+    LIVE_MAX_WINDOW_SECONDS: float = 30.0
+
     # CORS
     CORS_ORIGINS: List[str] = ["*"]
 
@@ -0,0 +1,114 @@
+"""
+Report artifacts.
+
+Every report is stored in a directory of its own, `<report_id>/` under
+ARTIFACT_DIR, so concurrent reports never overwrite each other and the files
+can be served by id. The report data (summary, transcript, participants) is
+saved as JSON; the PDFs are rendered from it when first requested. Artifacts
+are removed ARTIFACT_TTL_SECONDS after they were created.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+REPORT_PDF = "report.pdf"
+TRANSCRIPTION_PDF = "transcription.pdf"
+ARTIFACT_NAMES = (REPORT_PDF, TRANSCRIPTION_PDF)
+REPORT_DATA = "report.json"
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ArtifactStore:
+    """Report directories stored in `directory`, expired after `ttl_seconds`."""
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self._directory = directory
+        self._ttl = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self) -> Tuple[str, str]:
+        """Create the directory of a new report: (report id, directory path)."""
+        self.prune()
+        report_id = uuid.uuid4().hex
+        path = os.path.join(self._directory, report_id)
+        os.makedirs(path)
+        return report_id, path
+
+    def directory(self, report_id: str) -> Optional[str]:
+        """Return the directory of a report, None if unknown or expired."""
+        if not _ID_RE.match(report_id):
+            return None
+        path = os.path.join(self._directory, report_id)
+        return path if os.path.isdir(path) else None
+
+    def path(self, report_id: str, name: str) -> Optional[str]:
+        """Return the path of an artifact, None if unknown or not written."""
+        directory = self.directory(report_id)
+        if directory is None or name not in ARTIFACT_NAMES:
+            return None
+        path = os.path.join(directory, name)
+        return path if os.path.isfile(path) else None
+
+    def save(self, report_id: str, name: str, data: bytes) -> str:
+        """Write an artifact atomically (readers never see a partial file)."""
+        directory = self.directory(report_id)
+        if directory is None:
+            raise FileNotFoundError(report_id)
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def save_data(self, report_id: str, data: Dict[str, Any]) -> None:
+        """Store the report data the PDFs are rendered from."""
+        self.save(
+            report_id, REPORT_DATA, json.dumps(data, ensure_ascii=False).encode("utf-8")
+        )
+
+    def load_data(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Return the report data, None if unknown or expired."""
+        directory = self.directory(report_id)
+        if directory is None:
+            return None
+        try:
+            with open(os.path.join(directory, REPORT_DATA), encoding="utf-8") as f:
+                data: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data
+
+    def prune(self) -> None:
+        """Remove the report directories older than the time-to-live."""
+        now = time.time()
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            try:
+                expired = (
+                    _ID_RE.match(name) and now - os.path.getmtime(path) > self._ttl
+                )
+            except OSError:
+                continue
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+_artifact_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore(
+            settings.ARTIFACT_DIR, settings.ARTIFACT_TTL_SECONDS
+        )
+    return _artifact_store
@@ -0,0 +1,108 @@
+"""
+Token-aware chunking of "[SPEAKER] text" transcripts.
+
+Consecutive lines of the same speaker are merged into one turn, and whole
+turns are packed into chunks up to a token budget, so speaker tags are never
+lost at chunk edges and no utterance is cut in the middle. Only a turn larger
+than the whole budget is split (at line, then word boundaries), each piece
+keeping its speaker tag.
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from app.services.summarizer_service import estimate_tokens
+
+_LINE_RE = re.compile(r"^\[([^\]]+)\]\s?(.*)$", re.DOTALL)
+
+
+def parse_line(line: str) -> Tuple[Optional[str], str]:
+    """Split a "[SPEAKER] text" line into (speaker, text)."""
+    match = _LINE_RE.match(line)
+    if match is None:
+        return None, line.strip()
+    return match.group(1), match.group(2).strip()
+
+
+class TranscriptChunker:
+    """Incremental chunker: feed lines with `add`, collect chunks as they fill."""
+
+    def __init__(self, max_tokens: int):
+        self._max_tokens = max_tokens
+        self._speaker: Optional[str] = None
+        self._turn: List[str] = []
+        self._turn_tokens = 0
+        self._chunk: List[str] = []
+        self._chunk_tokens = 0
+
+    def add(self, line: str) -> List[str]:
+        """Add one transcript line, return the chunks completed by it."""
+        speaker, text = parse_line(line)
+        if not text:
+            return []
+        done: List[str] = []
+        if speaker != self._speaker or (
+            self._turn_tokens + estimate_tokens(text) > self._max_tokens
+        ):
+            done += self._close_turn()
+            self._speaker = speaker
+            self._turn_tokens = estimate_tokens(self._format(""))
+        self._turn.append(text)
+        self._turn_tokens += estimate_tokens(text)
+        return done
+
+    def flush(self) -> List[str]:
+        """Return the remaining chunk, if any."""
+        done = self._close_turn()
+        if self._chunk:
+            done.append("\n".join(self._chunk))
+            self._chunk, self._chunk_tokens = [], 0
+        return done
+
+    def _format(self, text: str) -> str:
+        return f"[{self._speaker}] {text}" if self._speaker is not None else text
+
+    def _close_turn(self) -> List[str]:
+        done: List[str] = []
+        if self._turn:
+            for piece in self._split(" ".join(self._turn)):
+                done += self._pack(piece)
+        self._turn, self._turn_tokens = [], 0
+        return done
+
+    def _split(self, text: str) -> List[str]:
+        """Split a single oversized utterance at word boundaries."""
+        turn = self._format(text)
+        if estimate_tokens(turn) <= self._max_tokens:
+            return [turn]
+        pieces: List[str] = []
+        words: List[str] = []
+        for word in text.split():
+            # Sized with the speaker tag each piece is written with
+            piece = self._format(" ".join(words + [word]))
+            if words and estimate_tokens(piece) > self._max_tokens:
+                pieces.append(self._format(" ".join(words)))
+                words = []
+            words.append(word)
+        if words:
+            pieces.append(self._format(" ".join(words)))
+        return pieces
+
+    def _pack(self, turn: str) -> List[str]:
+        done = []
+        tokens = estimate_tokens(turn) + 1
+        if self._chunk and self._chunk_tokens + tokens > self._max_tokens:
+            done.append("\n".join(self._chunk))
+            self._chunk, self._chunk_tokens = [], 0
+        self._chunk.append(turn)
+        self._chunk_tokens += tokens
+        return done
+
+
+def chunk_transcript(lines: Iterable[str], max_tokens: int) -> List[str]:
+    """Pack a whole transcript into chunks of at most `max_tokens` tokens."""
+    chunker = TranscriptChunker(max_tokens)
+    chunks: List[str] = []
+    for line in lines:
+        chunks += chunker.add(line)
+    return chunks + chunker.flush()
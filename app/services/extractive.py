@@ -0,0 +1,82 @@
+"""
+Extractive pre-reduction of "[SPEAKER] text" transcripts.
+
+Every line is scored with TF-IDF over the whole meeting: greetings,
+back-channel ("yeah", "ok") and phrases repeated all meeting long are made of
+frequent words and score low. The lowest-scoring lines of each speaker are
+dropped before chunking, so fewer and smaller prompts reach the LLM while
+every speaker keeps their most informative lines.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.chunker import parse_line
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def sentence_scores(texts: Sequence[str]) -> np.ndarray:
+    """Return the TF-IDF information score of every text (0 without words).
+
+    The score sums (1 + log tf) * idf over the distinct words of a text,
+    divided by the square root of their number so long lines are not
+    favoured linearly.
+    """
+    vocabulary: Dict[str, int] = {}
+    doc_ids: List[int] = []
+    term_ids: List[int] = []
+    for i, text in enumerate(texts):
+        for word in _WORD_RE.findall(text.lower()):
+            term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+            doc_ids.append(i)
+
+    n_docs, n_terms = len(texts), len(vocabulary)
+    scores = np.zeros(n_docs)
+    if not term_ids:
+        return scores
+
+    # Distinct (text, word) pairs with their term frequency
+    pairs, tf = np.unique(
+        np.asarray(doc_ids, dtype=np.int64) * n_terms + np.asarray(term_ids),
+        return_counts=True,
+    )
+    pair_docs, pair_terms = np.divmod(pairs, n_terms)
+    df = np.bincount(pair_terms, minlength=n_terms)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+
+    weights = (1 + np.log(tf)) * idf[pair_terms]
+    totals = np.bincount(pair_docs, weights=weights, minlength=n_docs)
+    distinct = np.bincount(pair_docs, minlength=n_docs)
+    np.divide(totals, np.sqrt(distinct), out=scores, where=distinct > 0)
+    return scores
+
+
+def reduce_transcript(lines: Sequence[str], keep_ratio: float) -> List[str]:
+    """Keep the `keep_ratio` best-scoring lines of each speaker, in order.
+
+    Every speaker keeps at least one line; lines without any word are
+    always dropped.
+    """
+    if keep_ratio >= 1 or not lines:
+        return list(lines)
+
+    parsed = [parse_line(line) for line in lines]
+    scores = sentence_scores([text for _, text in parsed])
+
+    by_speaker: Dict[Optional[str], List[int]] = {}
+    for i, (speaker, _) in enumerate(parsed):
+        by_speaker.setdefault(speaker, []).append(i)
+
+    keep = np.zeros(len(lines), dtype=bool)
+    for indices in by_speaker.values():
+        idx = np.asarray(indices)
+        count = max(1, math.ceil(keep_ratio * len(idx)))
+        # Highest scores first, the earliest line winning ties
+        keep[idx[np.argsort(-scores[idx], kind="stable")[:count]]] = True
+    keep &= scores > 0
+
+    return [line for line, kept in zip(lines, keep) if kept]
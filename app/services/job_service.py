@@ -0,0 +1,454 @@
+"""
+Background report jobs.
+
+A submission returns a job id at once; the report pipeline runs in a bounded
+thread pool (the speech models are shared by the threads of the worker), so
+a long meeting no longer blocks the event loop. Finished jobs are kept for
+JOB_TTL_SECONDS.
+
+Jobs submitted with the key of a job still pending (same audio content and
+report options) attach to it instead of running the pipeline again.
+
+Queued jobs run by priority: interactive requests before batch jobs, each in
+submission order, so the files of a batch run back to back in the same
+worker threads (the speech models and the Groq connection pool are loaded
+once per process and reused). A batch reports the throughput of its jobs.
+
+Every stage update is also appended to the event log of its job, which
+clients can follow as it grows (e.g. over Server-Sent Events).
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.report_service import generate_report
+
+PENDING_STATUSES = ("queued", "running")
+FINAL_EVENTS = ("done", "error")
+# Scheduling order of the job priorities (lowest first)
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class QueueFullError(Exception):
+    """Raised when the pending limit of the job priority is reached."""
+
+
+@dataclass
+class Job:
+    """State of one report job, updated by the worker thread running it."""
+
+    id: str
+    audio_path: str
+    key: Optional[str] = None
+    # Content hash of the audio, passed on so the pipeline does not hash it again
+    content_hash: Optional[str] = None
+    priority: str = "interactive"
+    # Uploads are removed once processed, files named in a batch are kept
+    owns_file: bool = True
+    # Pipeline of this job, instead of the one of the manager
+    runner: Optional[Callable[..., Dict[str, Any]]] = field(default=None, repr=False)
+    status: str = "queued"  # queued, running, done or failed
+    stage: Optional[str] = None
+    done: Optional[int] = None
+    total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = field(
+        default_factory=list, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the public status of the job."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "stage": self.stage,
+            "progress": {"done": self.done, "total": self.total},
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def add_event(self, event: str, **data: Any) -> None:
+        """Append an event to the log and wake up the clients following it."""
+        with self._lock:
+            self.events.append({"id": len(self.events) + 1, "event": event, **data})
+            waiters = list(self._waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+
+    async def wait(self) -> None:
+        """Wait until the job is done or failed."""
+        async for _ in self.iter_events():
+            pass
+
+    async def iter_events(
+        self, after: int = 0, keepalive: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield the events after id `after`, then new ones until the job ends.
+
+        None is yielded after `keepalive` seconds without events, so the
+        caller can keep an idle connection open.
+        """
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._lock:
+            self._waiters.append(entry)
+        try:
+            while True:
+                # Cleared before reading: an event added meanwhile sets it again
+                waiter.clear()
+                for event in self.events[after:]:
+                    after = event["id"]
+                    yield event
+                    if event["event"] in FINAL_EVENTS:
+                        return
+                try:
+                    await asyncio.wait_for(waiter.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._waiters.remove(entry)
+
+
+@dataclass
+class BatchEntry:
+    """One file of a batch submission."""
+
+    audio_path: str
+    key: Optional[str] = None
+    owns_file: bool = True
+    content_hash: Optional[str] = None
+    runner: Optional[Callable[..., Dict[str, Any]]] = field(default=None, repr=False)
+
+
+@dataclass
+class Batch:
+    """Jobs submitted together, followed as a whole."""
+
+    id: str
+    jobs: List[Job]
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def finished_at(self) -> Optional[float]:
+        """Time the last job finished, None while some are pending."""
+        if any(job.finished_at is None for job in self.jobs):
+            return None
+        return max(
+            (job.finished_at or 0.0 for job in self.jobs), default=self.created_at
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the status of the jobs and the throughput of the batch.
+
+        Throughput is measured from the start of the first job to the end of
+        the last one (or now): finished jobs per hour and seconds of audio
+        transcribed per second.
+        """
+        # Identical files of the batch share one job
+        jobs = list({job.id: job for job in self.jobs}.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        starts = [job.started_at for job in jobs if job.started_at is not None]
+        finished = [job for job in jobs if job.finished_at is not None]
+        end = self.finished_at or time.time()
+        elapsed = end - min(starts) if starts else 0.0
+        audio_seconds = sum(
+            job.result.get("duration") or 0.0
+            for job in finished
+            if job.result is not None
+        )
+        return {
+            "batch_id": self.id,
+            "status": "finished" if self.finished_at is not None else "pending",
+            "counts": counts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 3),
+                "jobs_per_hour": (
+                    round(len(finished) * 3600 / elapsed, 2) if elapsed else None
+                ),
+                "audio_seconds": round(audio_seconds, 3),
+                "realtime_factor": (
+                    round(audio_seconds / elapsed, 2) if elapsed else None
+                ),
+            },
+            "jobs": [job.to_dict() for job in jobs],
+        }
+
+
+class JobManager:
+    """Run report jobs in a bounded pool and keep track of their state."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        ttl_seconds: float,
+        runner: Callable[..., Dict[str, Any]] = generate_report,
+        max_pending_batch: Optional[int] = None,
+    ):
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="report-job"
+        )
+        self._max_pending = {
+            "interactive": max_pending,
+            "batch": max_pending if max_pending_batch is None else max_pending_batch,
+        }
+        self._ttl = ttl_seconds
+        self._runner = runner
+        self._jobs: Dict[str, Job] = {}
+        self._batches: Dict[str, Batch] = {}
+        self._inflight: Dict[str, Job] = {}
+        self._coalesced = 0
+        # Queued jobs: heap of (priority rank, submission number, job), each
+        # pool task runs the first one when a thread becomes free
+        self._queue: List[Tuple[int, int, Job]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        audio_path: str,
+        key: Optional[str] = None,
+        priority: str = "interactive",
+        content_hash: Optional[str] = None,
+        runner: Optional[Callable[..., Dict[str, Any]]] = None,
+    ) -> Job:
+        """Queue the report of `audio_path`; the job owns and removes the file.
+
+        If a job with the same `key` is pending, the file is removed and that
+        job is returned instead (moved up to `priority` if still queued).
+        `runner` replaces the pipeline of the manager for this job (the key
+        must then tell its result apart from the full report).
+        """
+        entry = BatchEntry(audio_path, key, content_hash=content_hash, runner=runner)
+        with self._lock:
+            job = self._attach(entry, priority)
+            if job is not None:
+                return job
+            self._prune()
+            self._check_capacity(priority, 1)
+            job = self._enqueue(entry, priority)
+        self._pool.submit(self._run_next)
+        return job
+
+    def submit_batch(self, entries: List[BatchEntry], priority: str = "batch") -> Batch:
+        """Queue the reports of several files at once (all or none of them)."""
+        with self._lock:
+            self._prune()
+            self._check_capacity(
+                priority,
+                sum(
+                    entry.key is None or entry.key not in self._inflight
+                    for entry in entries
+                ),
+            )
+            jobs, queued = [], 0
+            for entry in entries:
+                job = self._attach(entry, priority)
+                if job is None:
+                    job = self._enqueue(entry, priority)
+                    queued += 1
+                jobs.append(job)
+            batch = Batch(id=uuid.uuid4().hex, jobs=jobs)
+            self._batches[batch.id] = batch
+        for _ in range(queued):
+            self._pool.submit(self._run_next)
+        return batch
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        """Return the batch, or None if unknown or expired."""
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of jobs in each status and of coalesced requests."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            counts["coalesced"] = self._coalesced
+            return counts
+
+    def shutdown(self) -> None:
+        """Fail queued jobs; running ones finish in their threads.
+
+        The clients following a queued job get its final "error" event and
+        the uploads of these jobs are removed.
+        """
+        with self._lock:
+            queued = [job for _, _, job in sorted(self._queue)]
+            self._queue.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for job in queued:
+            job.error = "The server shut down before the job started."
+            self._finish(job)
+
+    def _check_capacity(self, priority: str, new_jobs: int) -> None:
+        pending = sum(
+            job.status in PENDING_STATUSES and job.priority == priority
+            for job in self._jobs.values()
+        )
+        if pending + new_jobs > self._max_pending[priority]:
+            raise QueueFullError(f"{pending} {priority} report jobs already pending")
+
+    def _attach(self, entry: BatchEntry, priority: str) -> Optional[Job]:
+        job = self._inflight.get(entry.key) if entry.key is not None else None
+        if job is None:
+            return None
+        self._coalesced += 1
+        print(f"Report request attached to pending job {job.id}", flush=True)
+        if entry.owns_file:
+            _remove_file(entry.audio_path)
+        if job.status == "queued" and PRIORITIES[priority] < PRIORITIES[job.priority]:
+            job.priority = priority
+            self._queue = [
+                (
+                    (PRIORITIES[priority], number, queued)
+                    if queued is job
+                    else (rank, number, queued)
+                )
+                for rank, number, queued in self._queue
+            ]
+            heapq.heapify(self._queue)
+        return job
+
+    def _enqueue(self, entry: BatchEntry, priority: str) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            audio_path=entry.audio_path,
+            key=entry.key,
+            content_hash=entry.content_hash,
+            priority=priority,
+            owns_file=entry.owns_file,
+            runner=entry.runner,
+        )
+        self._jobs[job.id] = job
+        if entry.key is not None:
+            self._inflight[entry.key] = job
+        heapq.heappush(self._queue, (PRIORITIES[priority], next(self._sequence), job))
+        job.add_event("status", status="queued")
+        return job
+
+    def _run_next(self) -> None:
+        with self._lock:
+            if not self._queue:
+                return
+            _, _, job = heapq.heappop(self._queue)
+        self._run(job)
+
+    def _prune(self) -> None:
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self._ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        for batch_id, batch in list(self._batches.items()):
+            finished_at = batch.finished_at
+            if finished_at is not None and now - finished_at > self._ttl:
+                del self._batches[batch_id]
+
+    def _progress(
+        self,
+        job: Job,
+        stage: str,
+        done: Optional[int] = None,
+        total: Optional[int] = None,
+        **details: Any,
+    ) -> None:
+        job.stage, job.done, job.total = stage, done, total
+        job.add_event("progress", stage=stage, done=done, total=total, **details)
+
+    def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        job.add_event("status", status="running")
+        options: Dict[str, Any] = {}
+        if job.content_hash is not None:
+            options["content_hash"] = job.content_hash
+        try:
+            result = (job.runner or self._runner)(
+                job.audio_path,
+                progress=lambda *args, **details: self._progress(job, *args, **details),
+                **options,
+            )
+            if "error" in result:
+                job.error = result["error"]
+            else:
+                job.result = result
+        except Exception as e:
+            print(f"Report job {job.id} failed: {e}", flush=True)
+            job.error = f"Internal error : {e}"
+        finally:
+            self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        if job.owns_file:
+            _remove_file(job.audio_path)
+        with self._lock:
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        job.finished_at = time.time()
+        if job.result is not None:
+            job.status = "done"
+            job.add_event("done", result=job.result)
+        else:
+            job.status = "failed"
+            job.add_event("error", error=job.error)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(
+            settings.JOB_WORKERS,
+            settings.JOB_MAX_PENDING,
+            settings.JOB_TTL_SECONDS,
+            max_pending_batch=settings.BATCH_MAX_PENDING,
+        )
+    return _job_manager
+
+
+def shutdown_job_manager() -> None:
+    global _job_manager
+    if _job_manager is not None:
+        _job_manager.shutdown()
+        _job_manager = None
@@ -0,0 +1,181 @@
+"""
+Live meeting transcription from a stream of 16 kHz mono 16-bit PCM.
+
+The audio is transcribed in rolling windows with the shared Whisper model.
+Segments ending close to the end of a window may be cut mid-word: they stay
+pending and are decoded again with the next window. Committed lines are
+packed into chunks that are summarized while the meeting goes on, so only
+the final merge and the PDFs are left when it ends.
+
+Speakers are not identified in this mode (the diarization pipeline needs the
+whole recording): every line is tagged UNKNOWN_SPEAKER.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.chunker import TranscriptChunker
+from app.services.model_registry import get_whisper_model
+from app.services.report_service import merge_summaries, save_report, summarize_chunk
+from app.services.speaker_alignment import UNKNOWN_SPEAKER
+from app.services.summarizer_service import SummaryError, summary_concurrency
+from app.services.whisper_service import SAMPLING_RATE
+
+Segment = Dict[str, Any]
+
+
+class LiveTranscriber:
+    """Rolling-window transcription of PCM frames fed with `add_pcm`.
+
+    Frames may be added while `transcribe` runs in another thread: they are
+    kept for the next window.
+    """
+
+    def __init__(
+        self,
+        language: Optional[str] = None,
+        step_seconds: float = settings.LIVE_STEP_SECONDS,
+        tail_seconds: float = settings.LIVE_TAIL_SECONDS,
+        max_window_seconds: float = settings.LIVE_MAX_WINDOW_SECONDS,
+    ):
+        self.language = language
+        self._step = int(step_seconds * SAMPLING_RATE)
+        self._tail = tail_seconds
+        self._max_window = max_window_seconds
+        # Audio not committed yet, starting at `_offset` seconds in the meeting
+        self._frames: List[np.ndarray] = []
+        self._pending = 0
+        self._new = 0
+        self._offset = 0.0
+        # Guards the frames and counters shared with `add_pcm`
+        self._lock = threading.Lock()
+
+    def add_pcm(self, data: bytes) -> None:
+        """Append little-endian int16 samples (an odd trailing byte is dropped)."""
+        samples = np.frombuffer(data[: len(data) // 2 * 2], dtype="<i2")
+        frame = samples.astype(np.float32) / 32768.0
+        with self._lock:
+            self._frames.append(frame)
+            self._pending += len(frame)
+            self._new += len(frame)
+
+    def ready(self) -> bool:
+        """True once enough new audio arrived for another window."""
+        with self._lock:
+            return self._new >= self._step
+
+    def transcribe(self, final: bool = False) -> List[Segment]:
+        """Decode the pending audio, return the segments committed by this pass.
+
+        With `final`, every segment is committed (end of the meeting).
+        """
+        with self._lock:
+            if not self._pending:
+                return []
+            # Frames added from now on belong to the next window
+            window_frames = len(self._frames)
+            audio = np.concatenate(self._frames)
+            self._new = 0
+        duration = len(audio) / SAMPLING_RATE
+
+        segments, info = get_whisper_model().transcribe(audio, language=self.language)
+        segments = list(segments)
+        if self.language is None:
+            self.language = info.language
+
+        if final or duration >= self._max_window:
+            committed = segments
+        else:
+            committed = [s for s in segments if s.end <= duration - self._tail]
+        if committed:
+            cut = committed[-1].end
+        elif not segments:
+            # Silence: only keep the tail, speech may be starting in it
+            cut = max(0.0, duration - self._tail)
+        else:
+            cut = 0.0
+        if final or (committed and duration >= self._max_window):
+            cut = duration
+
+        cut_samples = min(len(audio), int(cut * SAMPLING_RATE))
+        rest = audio[cut_samples:]
+        with self._lock:
+            later = self._frames[window_frames:]
+            self._frames = ([rest] if len(rest) else []) + later
+            self._pending = len(rest) + sum(len(frame) for frame in later)
+        offset, self._offset = self._offset, self._offset + cut_samples / SAMPLING_RATE
+        return [
+            {"start": offset + s.start, "end": offset + s.end, "text": s.text.strip()}
+            for s in committed
+            if s.text.strip()
+        ]
+
+
+class LiveSession:
+    """A live meeting: transcription, running chunk summaries, final report."""
+
+    def __init__(self, language: Optional[str] = None):
+        self.transcriber = LiveTranscriber(language)
+        self.transcript: List[str] = []
+        self._chunker = TranscriptChunker(settings.CHUNK_MAX_TOKENS)
+        self._chunks = 0
+        self._summaries: List[Future] = []
+        self._pool = ThreadPoolExecutor(
+            max_workers=summary_concurrency(), thread_name_prefix="live-summarizer"
+        )
+
+    def process(
+        self, final: bool = False
+    ) -> Tuple[List[Segment], List[Tuple[int, Future]]]:
+        """Transcribe the pending audio and summarize the chunks it completes.
+
+        Returns the new segments and the (chunk number, summary future) of the
+        chunks submitted.
+        """
+        segments = self.transcriber.transcribe(final)
+        chunks: List[str] = []
+        for segment in segments:
+            line = f"[{UNKNOWN_SPEAKER}] {segment['text']}"
+            self.transcript.append(line)
+            chunks += self._chunker.add(line)
+        if final:
+            chunks += self._chunker.flush()
+
+        language = self.transcriber.language or "unknown"
+        submitted = []
+        for chunk in chunks:
+            self._chunks += 1
+            future = self._pool.submit(
+                summarize_chunk, self._chunks, chunk, [], language
+            )
+            self._summaries.append(future)
+            submitted.append((self._chunks, future))
+        return segments, submitted
+
+    def finish(self) -> Dict[str, Any]:
+        """Merge the chunk summaries into the final report (after `process(final=True)`)."""
+        summaries = [s for s in (f.result() for f in self._summaries) if s is not None]
+        if not self.transcript:
+            return {"error": "No transcription detected."}
+        if not summaries:
+            return {"error": "No summaries generated."}
+        language = self.transcriber.language or "unknown"
+        try:
+            final_summary = merge_summaries(summaries, [], language)
+        except SummaryError as e:
+            print(f"Error during final summary merge: {e}", flush=True)
+            return {"error": "Failed to merge summaries."}
+        stored = save_report(final_summary, self.transcript, [], language)
+        return {
+            **stored,
+            "summary": final_summary,
+            "participants": [],
+            "language": language,
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,140 @@
+"""
+Process-wide registry of speech models.
+
+Whisper and pyannote models are loaded once per worker process and shared by
+every request, so the per-request cost is only inference.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import torch
+from faster_whisper import WhisperModel
+from pyannote.audio import Pipeline
+
+from app.core.config import settings
+
+_lock = threading.Lock()
+_whisper_models: Dict[Tuple[str, str, str, int], WhisperModel] = {}
+_pipelines: Dict[Tuple[str, str], Pipeline] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def _timing_key(kind: str, key: Tuple[Any, ...]) -> str:
+    return f"{kind}:{'/'.join(str(k) for k in key)}"
+
+
+def cpu_thread_budget() -> Tuple[int, int]:
+    """Return the (whisper, diarization) CPU-thread budgets.
+
+    When both stages run concurrently, unset budgets split the cores between
+    them so they do not oversubscribe the machine. 0 keeps library defaults.
+    """
+    whisper_threads = settings.WHISPER_CPU_THREADS
+    diarization_threads = settings.DIARIZATION_CPU_THREADS
+    if settings.PIPELINE_CONCURRENT:
+        cores = os.cpu_count() or 1
+        whisper_threads = whisper_threads or max(1, cores // 2)
+        diarization_threads = diarization_threads or max(1, cores - whisper_threads)
+    return whisper_threads, diarization_threads
+
+
+def resolve_device(device: str = settings.WHISPER_DEVICE) -> str:
+    """Resolve "auto" to the best available device."""
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def get_whisper_model(
+    name: str = settings.WHISPER_MODEL,
+    device: str = settings.WHISPER_DEVICE,
+    compute_type: str = settings.WHISPER_COMPUTE_TYPE,
+    cpu_threads: int | None = None,
+) -> WhisperModel:
+    """Return the shared Whisper model, loading it on first use."""
+    device = resolve_device(device)
+    if cpu_threads is None:
+        cpu_threads = cpu_thread_budget()[0]
+    key = (name, device, compute_type, cpu_threads)
+    model = _whisper_models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        if key not in _whisper_models:
+            print(f"Loading Whisper model {name} on {device.upper()}...", flush=True)
+            start = time.perf_counter()
+            _whisper_models[key] = WhisperModel(
+                name, device=device, compute_type=compute_type, cpu_threads=cpu_threads
+            )
+            _timings.setdefault(_timing_key("whisper", key), {})["load_seconds"] = (
+                time.perf_counter() - start
+            )
+        return _whisper_models[key]
+
+
+def get_diarization_pipeline(
+    name: str = settings.DIARIZATION_MODEL,
+    device: str = settings.WHISPER_DEVICE,
+) -> Pipeline:
+    """Return the shared pyannote pipeline, loading it on first use."""
+    device = resolve_device(device)
+    key = (name, device)
+    pipeline = _pipelines.get(key)
+    if pipeline is not None:
+        return pipeline
+    with _lock:
+        if key not in _pipelines:
+            print(
+                f"Loading diarization pipeline {name} on {device.upper()}...",
+                flush=True,
+            )
+            start = time.perf_counter()
+            diarization_threads = cpu_thread_budget()[1]
+            if diarization_threads:
+                torch.set_num_threads(diarization_threads)
+            pipeline = Pipeline.from_pretrained(name)
+            pipeline.to(torch.device(device))
+            _pipelines[key] = pipeline
+            _timings.setdefault(_timing_key("diarization", key), {})["load_seconds"] = (
+                time.perf_counter() - start
+            )
+        return _pipelines[key]
+
+
+def warmup_models() -> Dict[str, Any]:
+    """Load the default models and run them once on a short silent clip."""
+    silence = np.zeros(16000, dtype=np.float32)
+
+    model = get_whisper_model()
+    start = time.perf_counter()
+    segments, _ = model.transcribe(silence, language="en")
+    list(segments)
+    whisper_key = (
+        settings.WHISPER_MODEL,
+        resolve_device(),
+        settings.WHISPER_COMPUTE_TYPE,
+        cpu_thread_budget()[0],
+    )
+    _timings[_timing_key("whisper", whisper_key)]["warmup_seconds"] = (
+        time.perf_counter() - start
+    )
+
+    pipeline = get_diarization_pipeline()
+    start = time.perf_counter()
+    pipeline({"waveform": torch.from_numpy(silence).unsqueeze(0), "sample_rate": 16000})
+    pipeline_key = (settings.DIARIZATION_MODEL, resolve_device())
+    _timings[_timing_key("diarization", pipeline_key)]["warmup_seconds"] = (
+        time.perf_counter() - start
+    )
+
+    print(f"Models warmed up: {_timings}", flush=True)
+    return get_model_timings()
+
+
+def get_model_timings() -> Dict[str, Any]:
+    """Return load and warm-up timings (seconds) of every loaded model."""
+    return {key: dict(values) for key, values in _timings.items()}
@@ -1,6 +1,46 @@
+import io
+import multiprocessing
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, islice
+from types import MappingProxyType
+from xml.sax.saxutils import escape
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from app.core.config import settings
+
+#Colors of the speaker labels, in order of first appearance
+SPEAKER_COLORS = ["#1f4e79", "#7b2c2c", "#2e6b30", "#6a3d9a", "#b15928", "#2b6f77", "#8c564b", "#555555"]
+#Flowables created ahead of the page being laid out
+FLOWABLE_BATCH = 64
+_TURN_RE = re.compile(r"^\[([^\]]+)\]\s?(.*)$")
+
+# Process pool rendering the PDFs of a report side by side, created on first use
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+#Function to build the paragraph styles of both documents. Built once per
+#process and shared by every document instead of each call customizing (and
+#mutating) a fresh sample style sheet. Only the mapping is read-only: the
+#ParagraphStyle objects must not be modified, derive a new style from one
+#(ParagraphStyle(name, parent=STYLES[...])) to change it
+def _build_styles():
+    sample = getSampleStyleSheet()
+    return MappingProxyType({
+        "report_title": ParagraphStyle("ReportTitle", parent=sample["Title"], fontSize=16, spaceAfter=20),
+        "transcription_title": ParagraphStyle("TranscriptionTitle", parent=sample["Title"], fontSize=18, spaceAfter=20),
+        "heading": ParagraphStyle("TranscriptionHeading", parent=sample["Heading2"], fontSize=14, spaceAfter=12),
+        "normal": ParagraphStyle("ReportNormal", parent=sample["Normal"]),
+        "speaker": ParagraphStyle(
+            "Speaker", parent=sample["BodyText"], fontName="Helvetica-Bold",
+            spaceBefore=8, spaceAfter=2, keepWithNext=1,
+        ),
+        "line": ParagraphStyle("TurnLine", parent=sample["BodyText"], leftIndent=12, spaceBefore=0, spaceAfter=2),
+    })
+
+STYLES = _build_styles()
 
 #Function to clean Markdown style text for proper PDF formatting
 def clean_markdown_for_pdf(text: str) -> str:
@@ -10,65 +50,130 @@ def clean_markdown_for_pdf(text: str) -> str:
     text = text.replace("\n", "<br/>")
     return text
 
-#Function to generate a PDF report
-def generate_pdf(summary: str, participants: list, pdf_path="report_output.pdf"):
-    
-    print("Generating PDF report...", flush=True)
-    # Create the PDF document and set up styles
-    doc = SimpleDocTemplate(pdf_path)
-    styles = getSampleStyleSheet()
-    
-    # Customize 
-    title_style = styles["Title"]
-    title_style.fontSize = 16
-    title_style.spaceAfter = 20
+#Function to lay out the summary report into `target` (a path or a binary file object)
+def build_report_pdf(target, summary: str, participants: list):
+    doc = SimpleDocTemplate(target)
     #The content of the PDF
     elements = [
-        Paragraph("MEETING REPORT", title_style),
+        Paragraph("MEETING REPORT", STYLES["report_title"]),
         Spacer(1, 12),
-        Paragraph(f"Participants: {', '.join(participants)}", styles["Normal"]),
+        Paragraph(f"Participants: {', '.join(participants)}", STYLES["normal"]),
         Spacer(1, 20),
-        Paragraph(clean_markdown_for_pdf(summary), styles["Normal"]),
+        Paragraph(clean_markdown_for_pdf(summary), STYLES["normal"]),
     ]
-    
     doc.build(elements)
-    print("Report generated :", pdf_path, flush=True)
-    return pdf_path
-
-
-
-def generate_transcription_pdf(transcription: str, participants: list, pdf_path="transcription_output.pdf"):
-    """Generate a clean PDF containing only the full transcription with speakers"""
-    print("Generating transcription PDF...", flush=True)
-    
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    doc = SimpleDocTemplate(pdf_path)
-    styles = getSampleStyleSheet()
-    
-    # Styles
-    title_style = styles["Title"]
-    title_style.fontSize = 18
-    title_style.spaceAfter = 20
-    
-    heading_style = styles["Heading2"]
-    heading_style.fontSize = 14
-    heading_style.spaceAfter = 12
-    
-    # Clean transcription text for PDF
-    clean_text = transcription.replace("\n", "<br/>")
-    
-    elements = [
-        Paragraph("MEETING TRANSCRIPTION", title_style),
+
+
+class _FlowableStream(list):
+    """List view of a flowable iterator, filled `batch` items at a time.
+
+    doc.build only works on the head of its list (and pushes split parts
+    back onto it), so a long document never exists as flowables at once.
+    This relies on how doc.build consumes its list, checked with ReportLab
+    4.2.5 (the pinned version) and 5.0.1: the test comparing the output with
+    a plain list layout guards it on upgrades.
+    """
+
+    def __init__(self, flowables, batch: int = FLOWABLE_BATCH):
+        super().__init__()
+        self._source = iter(flowables)
+        self._batch = batch
+
+    def __len__(self):
+        # Keep a window ahead of the head for keepWithNext look-ahead
+        if super().__len__() < self._batch:
+            self.extend(islice(self._source, self._batch))
+        return super().__len__()
+
+
+#Generator: one speaker label per turn (consecutive lines of the same speaker)
+#followed by one paragraph per line, lines being "[SPEAKER] text"
+def transcript_flowables(lines, speaker_style: ParagraphStyle, line_style: ParagraphStyle):
+    colors, current = {}, None
+    for line in lines:
+        match = _TURN_RE.match(line)
+        speaker, text = match.groups() if match else (current, line)
+        if speaker != current and speaker is not None:
+            color = colors.setdefault(speaker, SPEAKER_COLORS[len(colors) % len(SPEAKER_COLORS)])
+            yield Paragraph(f'<font color="{color}">{escape(speaker)}</font>', speaker_style)
+            current = speaker
+        if text.strip():
+            yield Paragraph(escape(text), line_style)
+
+
+#Function to lay out the transcription into `target` (a path or a binary file object),
+#`transcript` being an iterable of "[SPEAKER] text" lines laid out turn by turn
+#(the render time grows linearly with the transcript length)
+def build_transcription_pdf(target, transcript, participants: list):
+    doc = SimpleDocTemplate(target)
+    header = [
+        Paragraph("MEETING TRANSCRIPTION", STYLES["transcription_title"]),
         Spacer(1, 12),
-        Paragraph(f"<b>Participants:</b> {', '.join(participants)}", styles["Normal"]),
+        Paragraph(f"<b>Participants:</b> {escape(', '.join(participants))}", STYLES["normal"]),
         Spacer(1, 30),
-        Paragraph("FULL TRANSCRIPT", heading_style),
+        Paragraph("FULL TRANSCRIPT", STYLES["heading"]),
         Spacer(1, 10),
-        Paragraph(clean_text, styles["BodyText"]),
     ]
-    
-    doc.build(elements)
-    print(f"Transcription PDF generated: {pdf_path}", flush=True)
-    return pdf_path
\ No newline at end of file
+    turns = transcript_flowables(transcript, STYLES["speaker"], STYLES["line"])
+    doc.build(_FlowableStream(chain(header, turns)))
+
+
+#Process pool task: render the summary report in memory
+def render_report_pdf(summary: str, participants: list) -> bytes:
+    buffer = io.BytesIO()
+    build_report_pdf(buffer, summary, participants)
+    return buffer.getvalue()
+
+#Process pool task: render the transcription in memory
+def render_transcription_pdf(transcript: list, participants: list) -> bytes:
+    buffer = io.BytesIO()
+    build_transcription_pdf(buffer, transcript, participants)
+    return buffer.getvalue()
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=max(1, settings.PDF_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pdf_pool
+
+#Function to stop the PDF workers (on application shutdown)
+def shutdown_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+#Documents of a report, in the order render_report_pdfs returns them by default
+DOCUMENTS = ("summary", "transcription")
+
+#Function to render the summary and transcription PDFs of a report (or only
+#the `documents` asked for) at the same time in the PDF process pool: their
+#bytes in the order asked, None for a failed one
+def render_report_pdfs(summary: str, transcript: list, participants: list, documents=DOCUMENTS):
+    global _pdf_pool
+    pool = _get_pdf_pool()
+    futures = []
+    for name in documents:
+        if name == "summary":
+            futures.append((name, pool.submit(render_report_pdf, summary, participants)))
+        else:
+            futures.append((name, pool.submit(render_transcription_pdf, list(transcript), participants)))
+    results = []
+    for name, future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"Error generating {name} PDF: {e}", flush=True)
+            if isinstance(e, BrokenProcessPool):
+                with _pdf_pool_lock:
+                    if _pdf_pool is pool:
+                        # A worker died: the next report starts a new pool
+                        _pdf_pool = None
+            results.append(None)
+    return tuple(results)
@@ -0,0 +1,218 @@
+"""
+Client-side rate limiting for the Groq API.
+"""
+
+import asyncio
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Mapping, Optional
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)?")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, None: 1.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse "7.66s", "2m59.56s", "120ms" or "30" into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value.strip())
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit or None] for number, unit in parts)
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 30.0) -> float:
+    """Exponential backoff with jitter, so retrying workers do not stampede."""
+    delay = min(cap, base * 2.0**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute token buckets.
+
+    Both buckets refill continuously; a call waits until one request and the
+    estimated number of tokens are available. The budget is also aligned with
+    the rate-limit headers returned by the API and paused after a 429.
+    Thread-safe, so concurrent chunk summaries share the same budget.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._rpm = float(requests_per_minute)
+        self._tpm = float(tokens_per_minute)
+        self._clock = clock
+        self._state = self._full_state()
+        self._lock = threading.Lock()
+
+    def _full_state(self) -> Dict[str, float]:
+        return {
+            "requests": self._rpm,
+            "tokens": self._tpm,
+            "updated": self._clock(),
+            "blocked_until": 0.0,
+        }
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Dict[str, float]]:
+        with self._lock:
+            yield self._state
+
+    def _refill(self, state: Dict[str, float], now: float) -> None:
+        elapsed = max(0.0, now - state["updated"])
+        state["updated"] = now
+        state["requests"] = min(self._rpm, state["requests"] + elapsed * self._rpm / 60)
+        state["tokens"] = min(self._tpm, state["tokens"] + elapsed * self._tpm / 60)
+
+    def try_acquire(self, tokens: int) -> float:
+        """Take the budget of one request if available.
+
+        Returns 0 on success, otherwise the number of seconds to wait before
+        the budget can be available.
+        """
+        # A request larger than the whole bucket only waits for a full bucket
+        tokens = min(tokens, int(self._tpm))
+        with self._transaction() as state:
+            now = self._clock()
+            self._refill(state, now)
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+            if state["requests"] >= 1 and state["tokens"] >= tokens:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0.0
+            wait_requests = max(0.0, 1 - state["requests"]) * 60 / self._rpm
+            wait_tokens = max(0.0, tokens - state["tokens"]) * 60 / self._tpm
+            return max(wait_requests, wait_tokens)
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request of `tokens` tokens fits in the budget."""
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def atry_acquire(self, tokens: int) -> float:
+        """`try_acquire` for coroutines (the in-memory buckets never block)."""
+        return self.try_acquire(tokens)
+
+    async def aacquire(self, tokens: int) -> None:
+        """Wait without blocking the event loop for the budget of one request."""
+        while (wait := await self.atry_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Align the budget with the x-ratelimit-* headers of an API response."""
+        remaining_requests = _header_float(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_float(headers, "x-ratelimit-remaining-tokens")
+        reset_requests = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        reset_tokens = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        with self._transaction() as state:
+            now = self._clock()
+            self._refill(state, now)
+            # The server count is authoritative when it is lower than ours
+            if remaining_tokens is not None:
+                state["tokens"] = min(state["tokens"], remaining_tokens)
+            if (
+                remaining_requests is not None
+                and remaining_requests < 1
+                and reset_requests
+            ):
+                state["blocked_until"] = max(
+                    state["blocked_until"], now + reset_requests
+                )
+            if remaining_tokens is not None and remaining_tokens < 1 and reset_tokens:
+                state["blocked_until"] = max(state["blocked_until"], now + reset_tokens)
+
+    def penalize(self, seconds: float) -> None:
+        """Pause every caller for `seconds` (e.g. the retry-after of a 429)."""
+        with self._transaction() as state:
+            state["blocked_until"] = max(
+                state["blocked_until"], self._clock() + seconds
+            )
+
+
+class SharedRateLimiter(TokenBucketLimiter):
+    """Token buckets stored in SQLite, shared by every worker process of a host.
+
+    Each operation runs in an immediate transaction, so uvicorn workers
+    consume one budget and all pause together after a 429 instead of
+    stampeding the API on their own.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        name: str = "groq",
+    ):
+        self._path = path
+        self._name = name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "name TEXT PRIMARY KEY, requests REAL, tokens REAL, "
+                "updated REAL, blocked_until REAL)"
+            )
+        conn.close()
+        # Wall clock: monotonic clocks are not comparable between processes
+        super().__init__(requests_per_minute, tokens_per_minute, clock=time.time)
+
+    async def atry_acquire(self, tokens: int) -> float:
+        """Run `try_acquire` in a thread, off the event loop.
+
+        Its transaction may wait up to 30 s for the database lock held by
+        another worker process.
+        """
+        return await asyncio.to_thread(self.try_acquire, tokens)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Dict[str, float]]:
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT requests, tokens, updated, blocked_until "
+                "FROM rate_limits WHERE name = ?",
+                (self._name,),
+            ).fetchone()
+            if row is None:
+                state = self._full_state()
+            else:
+                state = dict(
+                    zip(("requests", "tokens", "updated", "blocked_until"), row)
+                )
+            yield state
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?)",
+                (
+                    self._name,
+                    state["requests"],
+                    state["tokens"],
+                    state["updated"],
+                    state["blocked_until"],
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,131 @@
+"""
+Text renderings of a report: JSON sections, Markdown and HTML.
+
+The final summary follows the numbered structure asked by MERGE_PROMPT
+(overview, discussion points, decisions, action items, next steps). The
+section headers are translated with the report, so they are recognised by
+their number and upper-case title rather than by their wording.
+"""
+
+import html
+import re
+from typing import Any, Dict, List, Optional
+
+# Sections of MERGE_PROMPT, in order
+SECTION_KEYS = ("overview", "discussion", "decisions", "actions", "next_steps")
+# Sections written as prose (the others are lists)
+PROSE_SECTIONS = ("overview", "next_steps")
+
+_HEADER_RE = re.compile(r"^[#*\s]*([1-9])\s*[.)]\s*(.+?)[*:\s]*$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+def _is_header(line: str, number: int) -> Optional[str]:
+    """Return the title if `line` is the header of section `number`."""
+    match = _HEADER_RE.match(line)
+    if match is None or int(match.group(1)) != number:
+        return None
+    title = match.group(2).strip()
+    return title if title == title.upper() and len(title) <= 80 else None
+
+
+def parse_sections(summary: str) -> Dict[str, Any]:
+    """Split a final summary into its MERGE_PROMPT sections.
+
+    Each section found has its title, its text and its non-empty lines as
+    items (list markers removed). Text before the first header, or the
+    whole summary if it does not follow the structure, is kept as "preamble".
+    """
+    sections: Dict[str, Any] = {}
+    preamble: List[str] = []
+    current: Optional[List[str]] = None
+    for line in summary.splitlines():
+        number = len(sections) + 1
+        title = _is_header(line, number) if number <= len(SECTION_KEYS) else None
+        if title is not None:
+            current = []
+            sections[SECTION_KEYS[number - 1]] = {"title": title, "lines": current}
+        elif current is not None:
+            current.append(line)
+        else:
+            preamble.append(line)
+
+    result: Dict[str, Any] = {}
+    if "\n".join(preamble).strip():
+        result["preamble"] = "\n".join(preamble).strip()
+    for key, section in sections.items():
+        lines = section.pop("lines")
+        section["text"] = "\n".join(lines).strip()
+        section["items"] = [
+            _BULLET_RE.sub("", line).strip() for line in lines if line.strip()
+        ]
+        result[key] = section
+    return result
+
+
+def to_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the report as JSON: summary, its sections and metadata."""
+    summary = result.get("summary", "")
+    return {
+        "report_id": result.get("report_id"),
+        "language": result.get("language", "unknown"),
+        "participants": result.get("participants", []),
+        "summary": summary,
+        "sections": parse_sections(summary),
+    }
+
+
+def to_markdown(result: Dict[str, Any]) -> str:
+    """Return the report as a Markdown document."""
+    sections = parse_sections(result.get("summary", ""))
+    parts = ["# Meeting report", ""]
+    participants = result.get("participants") or []
+    if participants:
+        parts += [f"**Participants:** {', '.join(participants)}", ""]
+    if "preamble" in sections:
+        parts += [sections["preamble"], ""]
+    for number, key in enumerate(SECTION_KEYS, 1):
+        if key not in sections:
+            continue
+        parts += [f"## {number}. {sections[key]['title']}", ""]
+        if key in PROSE_SECTIONS:
+            parts.append(sections[key]["text"])
+        else:
+            parts += [f"- {item}" for item in sections[key]["items"]]
+        parts.append("")
+    return "\n".join(parts)
+
+
+def to_html(result: Dict[str, Any]) -> str:
+    """Return the report as a standalone HTML page."""
+    sections = parse_sections(result.get("summary", ""))
+    language = html.escape(str(result.get("language") or "en"))
+    body = ["<h1>Meeting report</h1>"]
+    participants = result.get("participants") or []
+    if participants:
+        body.append(
+            f"<p><strong>Participants:</strong> {html.escape(', '.join(participants))}</p>"
+        )
+    if "preamble" in sections:
+        preamble = html.escape(sections["preamble"]).replace("\n", "<br>")
+        body.append(f"<p>{preamble}</p>")
+    for number, key in enumerate(SECTION_KEYS, 1):
+        if key not in sections:
+            continue
+        body.append(
+            f'<section id="{key}"><h2>{number}. {html.escape(sections[key]["title"])}</h2>'
+        )
+        if key in PROSE_SECTIONS:
+            text = html.escape(sections[key]["text"]).replace("\n", "<br>")
+            body.append(f"<p>{text}</p></section>")
+        else:
+            items = "".join(
+                f"<li>{html.escape(item)}</li>" for item in sections[key]["items"]
+            )
+            body.append(f"<ul>{items}</ul></section>")
+    return (
+        f'<!DOCTYPE html>\n<html lang="{language}"><head><meta charset="utf-8">'
+        f"<title>Meeting report</title></head>\n<body>\n"
+        + "\n".join(body)
+        + "\n</body></html>\n"
+    )
@@ -1,17 +1,73 @@
-import time
 import os
-from textwrap import wrap
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, count
 import subprocess
-from app.services.whisper_service import transcribe_and_diarize
-from app.services.summarizer_service import CHUNK_PROMPT, MERGE_PROMPT, llama_summarize
-from app.services.pdf_service import generate_pdf, generate_transcription_pdf
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from app.core.config import settings
+from app.services.chunker import TranscriptChunker, chunk_transcript
+from app.services.extractive import reduce_transcript
+from app.services.whisper_service import diarize, stream_transcription, transcribe_and_diarize
+from app.services.summarizer_service import (
+    CHUNK_PROMPT, MERGE_PROMPT, SummaryError, estimate_tokens, is_failure, llama_summarize, llama_summarize_stream,
+    summary_concurrency,
+)
+from app.services.artifact_service import ARTIFACT_NAMES, REPORT_PDF, TRANSCRIPTION_PDF, get_artifact_store
+from app.services.pdf_service import render_report_pdfs
+from app.services.speaker_alignment import UNKNOWN_SPEAKER, assign_speakers, iter_assign_speakers
+from app.utils.disk_cache import DiskCache, hash_file, hash_parts
+
+# Transcription + diarization results keyed by audio content and model settings
+_transcript_cache = None
+
+def get_transcript_cache() -> DiskCache:
+    global _transcript_cache
+    if _transcript_cache is None:
+        _transcript_cache = DiskCache(
+            os.path.join(settings.CACHE_DIR, "transcripts"),
+            max_entries=settings.TRANSCRIPT_CACHE_MAX_ENTRIES,
+            max_bytes=settings.TRANSCRIPT_CACHE_MAX_BYTES,
+        )
+    return _transcript_cache
+
+#Function to hash the content of an audio file (shared by the keys below, so a
+#report hashes its upload once)
+def audio_hash(audio_path: str) -> str:
+    return hash_file(audio_path)
+
+#Function to build the cache key of an audio file (content hash + model settings)
+def transcript_cache_key(audio_path: str, content_hash: Optional[str] = None) -> str:
+    return hash_parts(
+        content_hash or audio_hash(audio_path),
+        settings.WHISPER_MODEL, settings.WHISPER_COMPUTE_TYPE, settings.DIARIZATION_MODEL,
+    )
+
+#Function to build the key of a whole report: audio content + every setting
+#changing its result (identical concurrent requests share one pipeline run)
+def report_key(audio_path: str, content_hash: Optional[str] = None) -> str:
+    return hash_parts(
+        content_hash or audio_hash(audio_path),
+        settings.WHISPER_MODEL, settings.WHISPER_COMPUTE_TYPE, settings.DIARIZATION_MODEL,
+        settings.GROQ_MODEL, settings.CHUNK_MAX_TOKENS, settings.MERGE_FAN_IN,
+        settings.PIPELINE_STREAMING, settings.EXTRACTIVE_REDUCTION, settings.EXTRACTIVE_KEEP_RATIO,
+    )
+
+#Document rendered into each report PDF
+PDF_DOCUMENTS = {REPORT_PDF: "summary", TRANSCRIPTION_PDF: "transcription"}
+# Locks of the reports whose PDFs are being rendered: report id -> [lock, users]
+_report_locks = {}
+_report_locks_guard = threading.Lock()
 
 #Function to ensure the audio file is in WAV format(best format for whisper)
 def ensure_wav(audio_path: str) -> str:
     if audio_path.lower().endswith(".wav"):
         return audio_path# Already in WAV format
 
-    wav_path = os.path.splitext(audio_path)[0] + ".wav"
+    # Converted next to the other temporary files, never beside the source
+    fd, wav_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
     try:
         print(f"Converting {audio_path} → {wav_path}", flush=True)
         # Run ffmpeg command to convert the file into a single-channel 16kHz WAV file
@@ -23,103 +79,397 @@ def ensure_wav(audio_path: str) -> str:
         )
         return wav_path
     except Exception as e:
+        os.remove(wav_path)
         print(f" Audio conversion error : {e}", flush=True)
         raise RuntimeError(f"WAV conversion failed for {audio_path}")
 
-#Main pipeline: Transcription → Summarization → PDF generation
-def generate_report(audio_path: str):
+#Default progress callback: progress(stage, done=None, total=None, **details)
+#reports the pipeline stage being run, its advancement when known and partial
+#results (e.g. the summary of a chunk)
+def _no_progress(stage: str, done=None, total=None, **details):
+    pass
+
+#Function to extract the list of participants(speakers)
+def get_participants(speaker_segments: list) -> list:
+    return sorted(set(s["speaker"] for s in speaker_segments if s["speaker"] != UNKNOWN_SPEAKER))
+
+#Function to summarize one chunk of the transcript (None on failure)
+def summarize_chunk(i: int, chunk: str, participants: list, language: str, total=None):
     try:
-        # Step 1: Convert to WAV format if needed
-        audio_path = ensure_wav(audio_path)
-        # Step 2: Transcribe the audio and detect speakers + language
-        whisper_segments, speaker_segments, detected_language, _ = transcribe_and_diarize(audio_path)
+        # Prepare the summarization prompt with the chunk content
+        prompt = CHUNK_PROMPT.format(
+            chunk=chunk,
+            participants=', '.join(participants),
+            language=language
+        )
+        print(f"Processing chunk {i}/{total or '?'}", flush=True)
+        # Call the LLM to summarize the current chunk
+        summary = llama_summarize(prompt)
+        if is_failure(summary):
+            raise SummaryError(summary)
+        return summary
     except Exception as e:
-        print(f"Error during transcription/diarization : {e}", flush=True)
-        return {"error": "Transcription or diarization failed."}
+        print(f"Error summarizing chunk {i} : {e}", flush=True)
+        return None
+
+#Function to summarize all chunks concurrently, the rate limiter of
+#llama_summarize spacing the calls (results keep the chunk order, failures are dropped)
+def summarize_chunks(chunks: list, participants: list, language: str, progress=None) -> list:
+    progress = progress or _no_progress
+    completed = count(1)
+
+    def run(item):
+        summary = summarize_chunk(item[0], item[1], participants, language, len(chunks))
+        progress("summarization", next(completed), len(chunks), chunk=item[0], summary=summary)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=summary_concurrency(), thread_name_prefix="summarizer") as pool:
+        summaries = pool.map(run, enumerate(chunks, 1))
+        return [s for s in summaries if s is not None]
+
+#Function to build the prompt merging one group of partial summaries into a single report
+def build_merge_prompt(summaries: list, participants: list, language: str) -> str:
+    joined_parts = "\n\n".join([f"--- Partie {i+1} ---\n{s}" for i, s in enumerate(summaries)])
+    return MERGE_PROMPT.format(
+        participants=', '.join(participants),
+        parts=joined_parts,
+        language=language
+    )
+
+#Function to merge one group of partial summaries into a single report
+#(SummaryError when the model returned a failure message instead)
+def merge_group(summaries: list, participants: list, language: str) -> str:
+    merged = llama_summarize(build_merge_prompt(summaries, participants, language))
+    if is_failure(merged):
+        raise SummaryError(merged)
+    return merged
+
+#Function to split summaries into groups of at most `fan_in` items and about
+#`max_tokens` tokens (at least two per group, so every level shrinks)
+def group_summaries(summaries: list, fan_in: int, max_tokens: int) -> list:
+    groups, group, tokens = [], [], 0
+    for summary in summaries:
+        size = estimate_tokens(summary)
+        if len(group) >= fan_in or (len(group) >= 2 and tokens + size > max_tokens):
+            groups.append(group)
+            group, tokens = [], 0
+        group.append(summary)
+        tokens += size
+    if group:
+        groups.append(group)
+    return groups
+
+#Function to reduce partial summaries with a tree reduction: groups are merged in
+#parallel and the results grouped again until one last group remains. A group
+#whose merge failed is skipped (SummaryError if every merge of a level failed)
+def reduce_summaries(summaries: list, participants: list, language: str,
+                     fan_in: int = settings.MERGE_FAN_IN) -> list:
+    fan_in = max(2, fan_in)
+    level, depth = summaries, 1
+
+    def merge(group):
+        # A leftover single summary goes up to the next level unchanged
+        if len(group) == 1:
+            return group[0]
+        try:
+            return merge_group(group, participants, language)
+        except SummaryError as e:
+            print(f"Skipping a group of {len(group)} summaries at merge level {depth}: {e}", flush=True)
+            return None
+
+    while True:
+        groups = group_summaries(level, fan_in, settings.CHUNK_MAX_TOKENS)
+        if len(groups) == 1:
+            print(f"Merging {len(level)} summaries (merge tree depth: {depth})", flush=True)
+            return groups[0]
+        print(f"Merge level {depth}: {len(level)} summaries in {len(groups)} groups", flush=True)
+        with ThreadPoolExecutor(max_workers=summary_concurrency(), thread_name_prefix="merger") as pool:
+            level = [s for s in pool.map(merge, groups) if s is not None]
+        if not level:
+            raise SummaryError(f"Every merge of level {depth} failed.")
+        depth += 1
+
+#Function to merge partial summaries into one final report
+def merge_summaries(summaries: list, participants: list, language: str,
+                    fan_in: int = settings.MERGE_FAN_IN) -> str:
+    return merge_group(reduce_summaries(summaries, participants, language, fan_in), participants, language)
+
+#Generator: yields "[SPEAKER] text" lines as soon as segments are decoded and
+#the diarization result is available
+def iter_speaker_lines(whisper_segments, diarization_future):
+    whisper_segments = iter(whisper_segments)
+    # Buffer the decoded segments until the speaker turns are known
+    pending = []
+    for ws in whisper_segments:
+        pending.append(ws)
+        if diarization_future.done():
+            break
+    speaker_segments = diarization_future.result()
+    # Then align the buffer and every following segment in a single sweep
+    for ws, speaker in iter_assign_speakers(chain(pending, whisper_segments), speaker_segments):
+        yield f"[{speaker}] {ws['text']}"
+
+#Generator: packs whole speaker turns into chunks, yielding each one as soon as it is full
+def iter_chunks(lines, max_tokens: int = settings.CHUNK_MAX_TOKENS):
+    chunker = TranscriptChunker(max_tokens)
+    for line in lines:
+        yield from chunker.add(line)
+    yield from chunker.flush()
+
+#Streaming pipeline: each chunk is sent to the LLM as soon as it is full, so the
+#summarization runs while the rest of the audio is still being transcribed
+def stream_transcript_and_summaries(audio_path: str, progress=None):
+    progress = progress or _no_progress
+    progress("transcription", 0, 1)
+    progress("diarization", 0, 1)
+    whisper_stream, detected_language, _ = stream_transcription(audio_path)
+    whisper_segments, transcript = [], []
+
+    def decoded_segments():
+        for ws in whisper_stream:
+            whisper_segments.append(ws)
+            yield ws
+
+    def transcript_lines():
+        for line in iter_speaker_lines(decoded_segments(), diarization_future):
+            transcript.append(line)
+            yield line
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarization") as diarization_pool, \
+            ThreadPoolExecutor(max_workers=summary_concurrency(), thread_name_prefix="summarizer") as summary_pool:
+        diarization_future = diarization_pool.submit(diarize, audio_path)
+        diarization_future.add_done_callback(lambda _: progress("diarization", 1, 1))
+        summary_futures, completed = [], count(1)
+
+        def report_summary(i, future):
+            progress("summarization", next(completed), None, chunk=i, summary=future.result())
+
+        for i, chunk in enumerate(iter_chunks(transcript_lines()), 1):
+            participants = get_participants(diarization_future.result())
+            future = summary_pool.submit(summarize_chunk, i, chunk, participants, detected_language)
+            future.add_done_callback(lambda f, i=i: report_summary(i, f))
+            summary_futures.append(future)
+        progress("transcription", 1, 1)
+        speaker_segments = diarization_future.result()
+        summaries = [f.result() for f in summary_futures]
+
+    summaries = [s for s in summaries if s is not None]
+    return whisper_segments, speaker_segments, detected_language, transcript, summaries
+
+#Pipeline up to the partial summaries: Transcription → Speakers → Chunk summaries
+#(`content_hash`: audio_hash of the file when the caller already computed it)
+def prepare_report(audio_path: str, streaming: bool = settings.PIPELINE_STREAMING, progress=None,
+                   content_hash: Optional[str] = None):
+    progress = progress or _no_progress
+    # Step 1: Look up the transcription/diarization of this exact audio content
+    cache_key, cached = None, None
+    if settings.TRANSCRIPT_CACHE_ENABLED:
+        try:
+            cache_key = transcript_cache_key(audio_path, content_hash)
+            cached = get_transcript_cache().get(cache_key)
+        except Exception as e:
+            print(f"Transcript cache unavailable: {e}", flush=True)
+
+    final_transcript, summaries = None, None
+    if cached is not None:
+        print("Transcript cache hit, skipping transcription and diarization", flush=True)
+        whisper_segments = cached["whisper_segments"]
+        speaker_segments = cached["speaker_segments"]
+        detected_language = cached["language"]
+    else:
+        wav_path = audio_path
+        try:
+            # Step 2: Convert to WAV format if needed
+            progress("conversion")
+            wav_path = ensure_wav(audio_path)
+            # Step 3: Transcribe the audio and detect speakers + language
+            if streaming:
+                # Speaker merge and chunk summaries overlap with the transcription
+                whisper_segments, speaker_segments, detected_language, final_transcript, summaries = \
+                    stream_transcript_and_summaries(wav_path, progress)
+            else:
+                whisper_segments, speaker_segments, detected_language, _ = \
+                    transcribe_and_diarize(wav_path, progress=progress)
+        except Exception as e:
+            print(f"Error during transcription/diarization : {e}", flush=True)
+            return {"error": "Transcription or diarization failed."}
+        finally:
+            # The converted copy is only needed by the speech models
+            if wav_path != audio_path and os.path.exists(wav_path):
+                os.remove(wav_path)
+
+        if cache_key and whisper_segments:
+            try:
+                get_transcript_cache().put(cache_key, {
+                    "whisper_segments": whisper_segments,
+                    "speaker_segments": speaker_segments,
+                    "language": detected_language,
+                })
+            except Exception as e:
+                print(f"Could not cache transcript: {e}", flush=True)
 
     if not whisper_segments:
         return {"error": "No transcription detected."}
 
-    # Step 3: Merge transcribed text with detected speakers
-    print("Merging transcriptions with speakers..", flush=True)
-    final_transcript = []
-    try:
-        for ws in whisper_segments:
-            #Find speakers 
-            speakers = [s["speaker"] for s in speaker_segments
-                        if not (ws["end"] < s["start"] or ws["start"] > s["end"])]
-            speaker = speakers[0] if speakers else "Unknown"
-            final_transcript.append(f"[{speaker}] {ws['text']}")
-    except Exception as e:
-        print(f"Error while merging text and speaker segments: {e}", flush=True)
-        return {"error": "Failed to merge text and speakers."}
-    # Combine all lines into a single transcript string
-    transcription_text = "\n".join(final_transcript)
+    # Step 4: Merge transcribed text with detected speakers
+    if final_transcript is None:
+        progress("speakers")
+        print("Merging transcriptions with speakers..", flush=True)
+        try:
+            speakers = assign_speakers(whisper_segments, speaker_segments)
+            final_transcript = [f"[{speaker}] {ws['text']}"
+                                for ws, speaker in zip(whisper_segments, speakers)]
+        except Exception as e:
+            print(f"Error while merging text and speaker segments: {e}", flush=True)
+            return {"error": "Failed to merge text and speakers."}
     # Extract the list of participants(speakers)
-    participants = sorted(set(s["speaker"] for s in speaker_segments if s["speaker"] != "Unknown"))
+    participants = get_participants(speaker_segments)
+
+    # Step 5: Summarization in chunks
+    if summaries is None:
+        print(f"Summarizing in {detected_language}...", flush=True)
+        lines = final_transcript
+        if settings.EXTRACTIVE_REDUCTION:
+            # Drop filler lines before they cost LLM tokens
+            lines = reduce_transcript(final_transcript, settings.EXTRACTIVE_KEEP_RATIO)
+            print(f"Extractive reduction kept {len(lines)}/{len(final_transcript)} lines", flush=True)
+        # Pack whole speaker turns into chunks up to the model token budget
+        chunks = chunk_transcript(lines, settings.CHUNK_MAX_TOKENS)
+        progress("summarization", 0, len(chunks))
+        summaries = summarize_chunks(chunks, participants, detected_language, progress)
 
     if not participants:
         print("No participants detected.", flush=True)
-
-    # Step 4: Summarization in chunks
-    print(f"Summarizing in {detected_language}...", flush=True)
-    # Split long transcripts into smaller parts for better summarization performance
-    chunks = wrap(transcription_text, 1500 if len(transcription_text) > 4000 else 4000)
-    summaries = []
-    
-    for i, chunk in enumerate(chunks, 1):
-        try:
-            # Prepare the summarization prompt with the chunk content
-            prompt = CHUNK_PROMPT.format(
-                chunk=chunk, 
-                participants=', '.join(participants),
-                language=detected_language
-            )
-            print(f"Processing chunk {i}/{len(chunks)}", flush=True)
-            # Call the LLM to summarize the current chunk
-            summaries.append(llama_summarize(prompt))
-            # delay to avoid overloading the model or API
-            if i < len(chunks):
-                time.sleep(2)
-        except Exception as e:
-            print(f"Error summarizing chunk {i} : {e}", flush=True)
     # If no summaries were successfully generated, return an error
     if not summaries:
         return {"error": "No summaries generated."}
 
-    # Step 5: Merge all partial summaries into a single final summary
+    return {
+        "transcript": final_transcript,
+        "summaries": summaries,
+        "participants": participants,
+        "language": detected_language,
+        # Seconds of audio transcribed (end of the last segment)
+        "duration": whisper_segments[-1]["end"],
+    }
+
+#Function to render PDFs of a report (all of them or `names`) in parallel, in
+#memory, and store them in its artifact directory: their paths in the order
+#asked, None for a failed one
+def write_report_pdfs(report_id: str, report: dict, names=ARTIFACT_NAMES):
+    print(f"Generating {', '.join(names)}...", flush=True)
+    rendered = render_report_pdfs(
+        report["summary"], report["transcript"], report["participants"],
+        [PDF_DOCUMENTS[name] for name in names],
+    )
+    paths = []
+    for data, name in zip(rendered, names):
+        path = None
+        if data is not None:
+            try:
+                path = get_artifact_store().save(report_id, name, data)
+            except OSError as e:
+                print(f"Could not store {name}: {e}", flush=True)
+        paths.append(path)
+    return paths
+
+#Function to store a finished report (in a new artifact directory unless
+#`report_id` is given): its data is saved, the PDFs are rendered now only with
+#REPORT_EAGER_PDF, else on first download
+def save_report(final_summary: str, transcript: list, participants: list, language: str,
+                report_id: Optional[str] = None, progress=None):
+    progress = progress or _no_progress
+    store = get_artifact_store()
+    if report_id is None:
+        report_id, _ = store.create()
+    report = {"summary": final_summary, "transcript": transcript,
+              "participants": participants, "language": language}
     try:
-        joined_parts = "\n\n".join([f"--- Partie {i+1} ---\n{s}" for i, s in enumerate(summaries)])
-        merged_prompt = MERGE_PROMPT.format(
-            participants=', '.join(participants),
-            parts=joined_parts,
-            language=detected_language
-        )
-        final_summary = llama_summarize(merged_prompt)
-    except Exception as e:
-        print(f" Error during final summary merge: {e}", flush=True)
-        return {"error": "Failed to merge summaries."}
+        store.save_data(report_id, report)
+    except OSError as e:
+        print(f"Could not store report {report_id}: {e}", flush=True)
+
+    pdf_path, transcription_pdf_path = None, None
+    if settings.REPORT_EAGER_PDF:
+        progress("pdf")
+        pdf_path, transcription_pdf_path = write_report_pdfs(report_id, report)
+    return {"report_id": report_id, "pdf_path": pdf_path, "transcription_pdf_path": transcription_pdf_path}
 
-    # Step 6: Generate the final PDF report
+#Context manager holding the lock of one report while its PDFs are rendered
+#(entries are dropped once no request uses them)
+@contextmanager
+def _report_lock(report_id: str):
+    with _report_locks_guard:
+        entry = _report_locks.setdefault(report_id, [threading.Lock(), 0])
+        entry[1] += 1
     try:
-        transcription_pdf_path = generate_transcription_pdf(
-            transcription_text, 
-            participants, 
-            pdf_path="transcription_report.pdf"
-        )
-    except Exception as e:
-        print(f"Error generating transcription PDF: {e}", flush=True)
+        with entry[0]:
+            yield
+    finally:
+        with _report_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _report_locks[report_id]
 
+#Function to get the path of a report PDF, rendering it on its first request
+#(None for an unknown or expired report); concurrent first downloads of a
+#report wait for one rendering instead of each starting their own
+def ensure_report_pdf(report_id: str, name: str):
+    store = get_artifact_store()
+    path = store.path(report_id, name)
+    if path is not None or name not in PDF_DOCUMENTS:
+        return path
+    with _report_lock(report_id):
+        path = store.path(report_id, name)
+        if path is None:
+            report = store.load_data(report_id)
+            if report is not None:
+                path = write_report_pdfs(report_id, report, (name,))[0]
+    return path
+
+#Main pipeline: Transcription → Summarization → PDF generation
+def generate_report(audio_path: str, streaming: bool = settings.PIPELINE_STREAMING, progress=None,
+                    content_hash: Optional[str] = None):
+    progress = progress or _no_progress
+    prepared = prepare_report(audio_path, streaming, progress, content_hash)
+    if "error" in prepared:
+        return prepared
+    participants, detected_language = prepared["participants"], prepared["language"]
+
+    # Step 6: Merge all partial summaries into a single final summary
+    progress("merge")
     try:
-        pdf_path = generate_pdf(final_summary, participants)
-        
+        final_summary = merge_summaries(prepared["summaries"], participants, detected_language)
     except Exception as e:
-        print(f" Error generating PDF: {e}", flush=True)
-        pdf_path = None
+        print(f" Error during final summary merge: {e}", flush=True)
+        return {"error": "Failed to merge summaries."}
+
+    # Step 7: Store the report (the PDFs are only rendered when requested)
+    stored = save_report(final_summary, prepared["transcript"], participants, detected_language,
+                         progress=progress)
 
     return {
+        **stored,
         "summary": final_summary,
-        "pdf_path": pdf_path,
         "participants": participants,
-        "language": detected_language
-    }
\ No newline at end of file
+        "language": detected_language,
+        "duration": prepared["duration"],
+    }
+
+#Generator: streams the final summary of a prepared report token by token,
+#the report being stored under `report_id` once the whole summary has arrived.
+#A failed merge raises SummaryError (the response is aborted, not ended as if
+#complete) and nothing is stored
+def stream_report_summary(prepared: dict, report_id: str):
+    participants, detected_language = prepared["participants"], prepared["language"]
+    parts = []
+    try:
+        # Intermediate merge levels (if any) run first, only the last merge is streamed
+        group = reduce_summaries(prepared["summaries"], participants, detected_language)
+        for token in llama_summarize_stream(build_merge_prompt(group, participants, detected_language)):
+            parts.append(token)
+            yield token
+    except SummaryError as e:
+        print(f"Error during final summary merge of report {report_id}: {e}", flush=True)
+        raise
+    save_report("".join(parts), prepared["transcript"], participants, detected_language, report_id)
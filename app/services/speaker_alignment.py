@@ -0,0 +1,58 @@
+"""
+Alignment of transcribed segments with diarization speaker turns.
+
+Both sides are swept once in start order, so the cost is
+O((N + M) log M + N * K) where K is the number of turns overlapping a segment
+(a handful in practice), instead of the O(N * M) scan of every turn.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+UNKNOWN_SPEAKER = "Unknown"
+
+Segment = Dict[str, Any]
+
+
+def iter_assign_speakers(
+    whisper_segments: Iterable[Segment], speaker_segments: List[Segment]
+) -> Iterator[Tuple[Segment, str]]:
+    """Yield (segment, speaker) with the speaker overlapping the segment most.
+
+    `whisper_segments` must come in start order (as Whisper decodes them) and
+    may be a lazy iterator. Touching intervals count as a zero-length overlap,
+    ties go to the earliest turn.
+    """
+    turns = sorted(speaker_segments, key=lambda s: s["start"])
+    active: List[Segment] = []
+    next_turn = 0
+    for ws in whisper_segments:
+        # Turns starting before the end of the segment become candidates...
+        while next_turn < len(turns) and turns[next_turn]["start"] <= ws["end"]:
+            active.append(turns[next_turn])
+            next_turn += 1
+        # ...and stay candidates until they end before a segment starts
+        active = [t for t in active if t["end"] >= ws["start"]]
+
+        overlaps: Dict[str, float] = {}
+        for turn in active:
+            overlap = min(ws["end"], turn["end"]) - max(ws["start"], turn["start"])
+            if overlap >= 0:
+                overlaps[turn["speaker"]] = overlaps.get(turn["speaker"], 0.0) + overlap
+        speaker = (
+            max(overlaps, key=overlaps.__getitem__) if overlaps else UNKNOWN_SPEAKER
+        )
+        yield ws, speaker
+
+
+def assign_speakers(
+    whisper_segments: List[Segment], speaker_segments: List[Segment]
+) -> List[str]:
+    """Return the speaker of every segment, in the order of `whisper_segments`."""
+    order = sorted(
+        range(len(whisper_segments)), key=lambda i: whisper_segments[i]["start"]
+    )
+    speakers = [UNKNOWN_SPEAKER] * len(whisper_segments)
+    pairs = iter_assign_speakers((whisper_segments[i] for i in order), speaker_segments)
+    for i, (_, speaker) in zip(order, pairs):
+        speakers[i] = speaker
+    return speakers
@@ -1,12 +1,50 @@
+import asyncio
+import json
 import os
 import time
-import requests
+import httpx
 from app.core.config import settings
+from app.services.rate_limiter import SharedRateLimiter, TokenBucketLimiter, backoff_delay, parse_duration
+from app.utils.disk_cache import DiskCache, hash_parts
 
 
 # Load the Groq API key and base URL from configuration
 GROQ_API_KEY = settings.GROQ_API_KEY
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL = f"{settings.GROQ_BASE_URL}/chat/completions"
+
+# Pooled keep-alive HTTP clients, created at app startup (or on first use)
+_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+
+# Persistent cache of LLM responses (retries, re-runs and repeated chunks)
+_response_cache: DiskCache | None = None
+
+# Requests/tokens per minute budget, shared by every concurrent call (and by
+# every worker process when GROQ_RATE_LIMIT_SHARED is set)
+_rate_limiter: TokenBucketLimiter | None = None
+
+# Largest completion of one call, counted in its rate limit budget
+COMPLETION_MAX_TOKENS = 1000
+
+# Texts returned by llama_summarize instead of a completion when it fails
+MISSING_KEY_ERROR = " Error: Missing GROQ API key."
+EMPTY_PROMPT_ERROR = "Error: Empty prompt."
+EMPTY_RESPONSE_ERROR = "Empty response from Groq model."
+RETRIES_ERROR = "Groq error after multiple attempts."
+FAILURE_MESSAGES = frozenset((MISSING_KEY_ERROR, EMPTY_PROMPT_ERROR, EMPTY_RESPONSE_ERROR, RETRIES_ERROR))
+
+
+class SummaryError(RuntimeError):
+    """A summary could not be generated (its text must not be used)."""
+
+
+#Function to tell a failure message of llama_summarize from a summary
+def is_failure(text: str) -> bool:
+    return text in FAILURE_MESSAGES
+
+#Function to estimate the number of tokens of a text (about 4 characters per token)
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
 
 # PROMPTS for summarization
 SYSTEM_PROMPT = """You are an expert meeting summarization assistant. You ALWAYS preserve speaker identities ([SPEAKER_00], [SPEAKER_01], etc.).
@@ -78,58 +116,294 @@ CRITICAL INSTRUCTIONS:
 8. Prioritize DECISIONS and ACTIONS - these are the most important
 9. Respond in {language}"""
 
+#Function to get the number of LLM calls run at once: SUMMARY_CONCURRENCY, or
+#when 0 the number of full chunk calls the tokens per minute budget allows
+def summary_concurrency() -> int:
+    if settings.SUMMARY_CONCURRENCY > 0:
+        return settings.SUMMARY_CONCURRENCY
+    call_tokens = settings.CHUNK_MAX_TOKENS + estimate_tokens(SYSTEM_PROMPT + CHUNK_PROMPT) + COMPLETION_MAX_TOKENS
+    calls = min(settings.GROQ_TOKENS_PER_MINUTE // call_tokens, settings.GROQ_REQUESTS_PER_MINUTE)
+    return max(1, min(calls, settings.GROQ_MAX_CONNECTIONS))
 
-#Function to call the Groq model
-def llama_summarize(prompt: str, max_retries: int = 3) -> str:
-    """Appelle le modèle Groq avec retry automatique + gestion d’erreurs."""
-    if not GROQ_API_KEY:
-        return " Error: Missing GROQ API key."
-    if not prompt:
-        return "Error: Empty prompt."
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
+#Functions to manage the shared HTTP clients (connection pooling + keep-alive)
+def _client_options() -> dict:
+    return {
+        "headers": {"Authorization": f"Bearer {GROQ_API_KEY}"},
+        "timeout": 25,
+        "limits": httpx.Limits(
+            max_connections=settings.GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GROQ_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
     }
-    payload = {
-        "model": "llama-3.1-8b-instant",  # Groq model (llama) used for summarization
+
+def get_http_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        _client = httpx.Client(**_client_options())
+    return _client
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+def init_http_clients():
+    get_http_client()
+    get_async_http_client()
+
+async def close_http_clients():
+    global _client, _async_client
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def get_response_cache() -> DiskCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = DiskCache(
+            os.path.join(settings.CACHE_DIR, "llm"),
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+        )
+    return _response_cache
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        if settings.GROQ_RATE_LIMIT_SHARED:
+            _rate_limiter = SharedRateLimiter(
+                os.path.join(settings.CACHE_DIR, "ratelimit.sqlite3"),
+                settings.GROQ_REQUESTS_PER_MINUTE,
+                settings.GROQ_TOKENS_PER_MINUTE,
+            )
+        else:
+            _rate_limiter = TokenBucketLimiter(settings.GROQ_REQUESTS_PER_MINUTE, settings.GROQ_TOKENS_PER_MINUTE)
+    return _rate_limiter
+
+#Function to look up a cached response: (cache key, cached content or None)
+def _cached_response(payload: dict):
+    if not settings.LLM_CACHE_ENABLED:
+        return None, None
+    messages = payload["messages"]
+    key = hash_parts(messages[0]["content"], messages[1]["content"], payload["model"], payload["max_tokens"])
+    cached = get_response_cache().get(key)
+    return key, cached["content"] if cached is not None else None
+
+#Function to build the chat completion request
+def _build_payload(prompt: str) -> dict:
+    return {
+        "model": settings.GROQ_MODEL,  # Groq model (llama) used for summarization
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        "max_tokens": 1000, # Limit response length
+        "max_tokens": COMPLETION_MAX_TOKENS, # Limit response length
     }
+
+#Function to interpret a Groq response: (content, None) on success,
+#(None, seconds to wait before the next attempt) otherwise
+def _handle_response(response: httpx.Response, attempt: int, max_retries: int, cache_key=None):
+    # Keep the shared budget in line with what the API reports as remaining
+    get_rate_limiter().observe(response.headers)
+    # Handle rate limiting (HTTP 429): every caller pauses for retry-after,
+    # this one also backs off with jitter so retries do not fire together
+    if response.status_code == 429:
+        retry_after = parse_duration(response.headers.get("retry-after"))
+        if retry_after:
+            get_rate_limiter().penalize(retry_after)
+        wait_time = backoff_delay(attempt)
+        print(f"Rate limit reached, retry after {retry_after or 0:.1f}s + {wait_time:.1f}s... "
+              f"(tentative {attempt+1}/{max_retries})", flush=True)
+        return None, wait_time
+    # Success: valid response
+    if response.status_code == 200:
+        data = response.json()
+        if "choices" not in data or not data["choices"]:
+            return EMPTY_RESPONSE_ERROR, None
+        content = data["choices"][0]["message"]["content"]
+        if cache_key is not None:
+            get_response_cache().put(cache_key, {"content": content})
+        return content, None
+
+    wait_time = backoff_delay(attempt)
+    print(f"HTTP Error {response.status_code}, retry dans {wait_time:.1f}s...", flush=True)
+    return None, wait_time
+
+#Function to call the Groq model
+def llama_summarize(prompt: str, max_retries: int = 3) -> str:
+    """Appelle le modèle Groq avec retry automatique + gestion d’erreurs."""
+    if not GROQ_API_KEY:
+        return MISSING_KEY_ERROR
+    if not prompt:
+        return EMPTY_PROMPT_ERROR
+
+    payload = _build_payload(prompt)
+    # Identical request already answered: no network round-trip
+    cache_key, cached = _cached_response(payload)
+    if cached is not None:
+        return cached
+    # Budget of one call: prompt tokens + maximum completion tokens
+    call_tokens = estimate_tokens(SYSTEM_PROMPT + prompt) + payload["max_tokens"]
     # Try sending the request multiple times
     for attempt in range(max_retries):
+        # Wait for the shared rate limit budget instead of sleeping blindly
+        get_rate_limiter().acquire(call_tokens)
         try:
-            response = requests.post(GROQ_URL, headers=headers, json=payload, timeout=25)
-        except requests.exceptions.Timeout:
-            # Handle timeout and retry after short wait
+            response = get_http_client().post(GROQ_URL, json=payload)
+        except httpx.TimeoutException:
+            # Handle timeout and retry after a jittered backoff
             print(f"Request timeout (attempt {attempt+1}/{max_retries})", flush=True)
-            time.sleep(3)
+            time.sleep(backoff_delay(attempt))
             continue
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Network error: {e}", flush=True)
-            time.sleep(2)
+            time.sleep(backoff_delay(attempt))
             continue
-        # Handle rate limiting (HTTP 429)
-        if response.status_code == 429:
-            try:
-                 # Try to extract wait time from the API message
-                wait_time = float(response.json()["error"]["message"].split("try again in ")[1].split("s")[0])
-            except Exception:
-                wait_time = 5 # Default wait time
-            print(f"Rate limit reached, waiting {wait_time:.1f}s... (tentative {attempt+1}/{max_retries})", flush=True)
-            time.sleep(wait_time + 1)
-            continue
-        # Success: valid response
-        if response.status_code == 200:
-            data = response.json()
-            if "choices" not in data or not data["choices"]:
-                return "Empty response from Groq model."
-            return data["choices"][0]["message"]["content"]
-        
-        print(f"HTTP Error {response.status_code}, retry dans 2s...", flush=True)
-        time.sleep(2)
+        content, wait_time = _handle_response(response, attempt, max_retries, cache_key)
+        if content is not None:
+            return content
+        time.sleep(wait_time)
     # All retries failed
-    return "Groq error after multiple attempts."
+    return RETRIES_ERROR
+
+#Async version of llama_summarize: does not block the event loop while waiting
+async def allama_summarize(prompt: str, max_retries: int = 3) -> str:
+    if not GROQ_API_KEY:
+        return MISSING_KEY_ERROR
+    if not prompt:
+        return EMPTY_PROMPT_ERROR
+
+    payload = _build_payload(prompt)
+    # The response cache is on disk: off the event loop
+    cache_key, cached = await asyncio.to_thread(_cached_response, payload)
+    if cached is not None:
+        return cached
+    call_tokens = estimate_tokens(SYSTEM_PROMPT + prompt) + payload["max_tokens"]
+    for attempt in range(max_retries):
+        await get_rate_limiter().aacquire(call_tokens)
+        try:
+            response = await get_async_http_client().post(GROQ_URL, json=payload)
+        except httpx.TimeoutException:
+            print(f"Request timeout (attempt {attempt+1}/{max_retries})", flush=True)
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        except httpx.HTTPError as e:
+            print(f"Network error: {e}", flush=True)
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        # The shared budget and the response cache are on disk: off the event loop
+        content, wait_time = await asyncio.to_thread(_handle_response, response, attempt, max_retries, cache_key)
+        if content is not None:
+            return content
+        await asyncio.sleep(wait_time)
+    return RETRIES_ERROR
+
+#Function to extract the text delta of one line of a streamed completion
+#(server-sent events: "data: {json}" lines, ended by "data: [DONE]")
+def _stream_delta(line: str):
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        choices = json.loads(data).get("choices") or []
+    except ValueError:
+        return None
+    return choices[0].get("delta", {}).get("content") if choices else None
+
+#Generator version of llama_summarize: yields the completion piece by piece as
+#the model generates it (a request is only retried before its first piece).
+#Raises SummaryError when no complete summary can be generated, including when
+#the stream breaks after its first pieces: they must then be discarded
+def llama_summarize_stream(prompt: str, max_retries: int = 3):
+    if not GROQ_API_KEY:
+        raise SummaryError(MISSING_KEY_ERROR)
+    if not prompt:
+        raise SummaryError(EMPTY_PROMPT_ERROR)
+
+    payload = _build_payload(prompt)
+    cache_key, cached = _cached_response(payload)
+    if cached is not None:
+        yield cached
+        return
+    call_tokens = estimate_tokens(SYSTEM_PROMPT + prompt) + payload["max_tokens"]
+    for attempt in range(max_retries):
+        get_rate_limiter().acquire(call_tokens)
+        parts, wait_time = [], None
+        try:
+            with get_http_client().stream("POST", GROQ_URL, json={**payload, "stream": True}) as response:
+                if response.status_code != 200:
+                    response.read()
+                    _, wait_time = _handle_response(response, attempt, max_retries)
+                else:
+                    get_rate_limiter().observe(response.headers)
+                    for line in response.iter_lines():
+                        delta = _stream_delta(line)
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+        except httpx.HTTPError as e:
+            print(f"Streaming error (attempt {attempt+1}/{max_retries}): {e}", flush=True)
+            if parts:
+                # Pieces were already yielded: the summary is cut off
+                raise SummaryError(f"Stream interrupted: {e}") from e
+            time.sleep(backoff_delay(attempt))
+            continue
+        if wait_time is not None:
+            time.sleep(wait_time)
+            continue
+        if cache_key is not None and parts:
+            get_response_cache().put(cache_key, {"content": "".join(parts)})
+        return
+    raise SummaryError(RETRIES_ERROR)
+
+#Async version of llama_summarize_stream
+async def allama_summarize_stream(prompt: str, max_retries: int = 3):
+    if not GROQ_API_KEY:
+        raise SummaryError(MISSING_KEY_ERROR)
+    if not prompt:
+        raise SummaryError(EMPTY_PROMPT_ERROR)
+
+    payload = _build_payload(prompt)
+    # The response cache is on disk: off the event loop
+    cache_key, cached = await asyncio.to_thread(_cached_response, payload)
+    if cached is not None:
+        yield cached
+        return
+    call_tokens = estimate_tokens(SYSTEM_PROMPT + prompt) + payload["max_tokens"]
+    for attempt in range(max_retries):
+        await get_rate_limiter().aacquire(call_tokens)
+        parts, wait_time = [], None
+        try:
+            async with get_async_http_client().stream("POST", GROQ_URL, json={**payload, "stream": True}) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    _, wait_time = await asyncio.to_thread(_handle_response, response, attempt, max_retries)
+                else:
+                    await asyncio.to_thread(get_rate_limiter().observe, response.headers)
+                    async for line in response.aiter_lines():
+                        delta = _stream_delta(line)
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+        except httpx.HTTPError as e:
+            print(f"Streaming error (attempt {attempt+1}/{max_retries}): {e}", flush=True)
+            if parts:
+                # Pieces were already yielded: the summary is cut off
+                raise SummaryError(f"Stream interrupted: {e}") from e
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        if wait_time is not None:
+            await asyncio.sleep(wait_time)
+            continue
+        if cache_key is not None and parts:
+            await asyncio.to_thread(get_response_cache().put, cache_key, {"content": "".join(parts)})
+        return
+    raise SummaryError(RETRIES_ERROR)
@@ -0,0 +1,253 @@
+"""
+Resumable uploads.
+
+An upload session is a `<id>.part` file appended to as byte ranges arrive,
+next to a `<id>.json` file with its declared size. The size of the part file
+is the upload offset, so a session survives restarts and is shared by every
+worker process; a range interrupted mid-way is simply resumed from there.
+"""
+
+import fcntl
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadNotFoundError(Exception):
+    """Raised for an unknown, expired or finalized upload session."""
+
+
+class UploadConflictError(Exception):
+    """Raised when a range does not start at the current offset."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload would exceed its declared or maximum size."""
+
+
+class UploadRangeError(Exception):
+    """Raised when a body does not match the length of its Content-Range."""
+
+
+def parse_content_range(value: str) -> Tuple[int, int, Optional[int]]:
+    """Parse "bytes start-end/total" (total may be "*") into integers."""
+    match = _CONTENT_RANGE_RE.match(value.strip())
+    if match is None or int(match.group(1)) > int(match.group(2)):
+        raise ValueError(f"Invalid Content-Range: {value}")
+    total = None if match.group(3) == "*" else int(match.group(3))
+    if total is not None and int(match.group(2)) >= total:
+        raise ValueError(f"Invalid Content-Range: {value}")
+    return int(match.group(1)), int(match.group(2)), total
+
+
+class UploadSessionStore:
+    """Upload sessions stored in `directory`, expired after `ttl_seconds`."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        if not _ID_RE.match(upload_id):
+            raise UploadNotFoundError(upload_id)
+        base = os.path.join(self._directory, upload_id)
+        return base + ".part", base + ".json"
+
+    def _meta(self, upload_id: str) -> Dict[str, Any]:
+        _, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            raise UploadNotFoundError(upload_id)
+        return meta
+
+    def _save_meta(self, upload_id: str, meta: Dict[str, Any]) -> None:
+        _, meta_path = self._paths(upload_id)
+        tmp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _open_locked(self, upload_id: str, offset: int) -> IO[bytes]:
+        """Open the part file of a live session with its exclusive lock."""
+        part_path, _ = self._paths(upload_id)
+        try:
+            # Never created here: a finalized session stays finalized
+            f = open(part_path, "r+b")
+        except FileNotFoundError:
+            raise UploadNotFoundError(upload_id)
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise UploadConflictError("Another range is being written.", offset)
+        try:
+            # Finalized (moved) while this call waited for the file
+            self._meta(upload_id)
+        except UploadNotFoundError:
+            f.close()
+            raise
+        return f
+
+    def create(self, size: Optional[int] = None) -> Dict[str, Any]:
+        """Open a session for a file of `size` bytes (None if not known yet)."""
+        if size is not None and size > self._max_bytes:
+            raise UploadTooLargeError(f"Upload larger than {self._max_bytes} bytes.")
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, "wb").close()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size, "created_at": time.time()}, f)
+        return {"upload_id": upload_id, "offset": 0, "size": size}
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """Return the current offset and declared size of a session."""
+        meta = self._meta(upload_id)
+        part_path, _ = self._paths(upload_id)
+        try:
+            offset = os.path.getsize(part_path)
+        except OSError:
+            raise UploadNotFoundError(upload_id)
+        return {"upload_id": upload_id, "offset": offset, "size": meta["size"]}
+
+    @contextmanager
+    def writer(
+        self,
+        upload_id: str,
+        start: int,
+        total: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[Callable[[bytes], None]]:
+        """Append a range starting at `start`; yields a `write(chunk)` function.
+
+        Only one writer per session at a time (across processes): a second
+        one gets an UploadConflictError. The first range received with the
+        `total` size of a session opened without one records it. With `end`, a body
+        that is not exactly the range `start`-`end` raises UploadRangeError
+        and nothing of it is kept.
+        """
+        self._meta(upload_id)
+        with self._open_locked(upload_id, start) as f:
+            meta = self._meta(upload_id)
+            size = meta["size"]
+            if total is not None and size is None:
+                if total > self._max_bytes:
+                    raise UploadTooLargeError(
+                        f"Upload larger than {self._max_bytes} bytes."
+                    )
+                size = total
+            if total is not None and size != total:
+                raise UploadConflictError(f"Declared size is {size} bytes.", start)
+            limit = min(size, self._max_bytes) if size is not None else self._max_bytes
+            offset = f.seek(0, os.SEEK_END)
+            if start != offset:
+                raise UploadConflictError(f"Expected offset {offset}.", offset)
+            written = offset
+
+            def write(chunk: bytes) -> None:
+                nonlocal written
+                if end is not None and written + len(chunk) > end + 1:
+                    raise UploadRangeError(f"Body longer than range {start}-{end}.")
+                if written + len(chunk) > limit:
+                    raise UploadTooLargeError(f"Upload larger than {limit} bytes.")
+                f.write(chunk)
+                written += len(chunk)
+
+            try:
+                yield write
+                if end is not None and written != end + 1:
+                    raise UploadRangeError(
+                        f"Body of {written - start} bytes for range {start}-{end}."
+                    )
+            except UploadRangeError:
+                # Drop the whole range, the client sends it again
+                f.truncate(start)
+                raise
+            f.flush()
+            if meta["size"] != size:
+                meta["size"] = size
+                self._save_meta(upload_id, meta)
+
+    def read_header(self, upload_id: str, size: int) -> bytes:
+        """Return the first `size` bytes received for a session."""
+        self._meta(upload_id)
+        part_path, _ = self._paths(upload_id)
+        with open(part_path, "rb") as f:
+            return f.read(size)
+
+    def finalize(self, upload_id: str, destination: str) -> None:
+        """Move a complete upload to `destination` and close the session.
+
+        Takes the writer lock, so a range still being written is never moved;
+        the upload is only known complete once its size was sent.
+        """
+        status = self.status(upload_id)
+        with self._open_locked(upload_id, status["offset"]):
+            status = self.status(upload_id)
+            if status["size"] is None:
+                raise UploadConflictError(
+                    "Upload size unknown: send it in Upload-Length or Content-Range.",
+                    status["offset"],
+                )
+            if status["offset"] != status["size"]:
+                raise UploadConflictError(
+                    f"Upload incomplete: {status['offset']}/{status['size']} bytes.",
+                    status["offset"],
+                )
+            part_path, meta_path = self._paths(upload_id)
+            os.replace(part_path, destination)
+            os.remove(meta_path)
+
+    def delete(self, upload_id: str) -> None:
+        """Abort a session and remove its data."""
+        self._meta(upload_id)
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self) -> None:
+        """Remove the sessions older than the time-to-live."""
+        now = time.time()
+        for name in os.listdir(self._directory):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[: -len(".json")]
+            try:
+                expired = now - self._meta(upload_id)["created_at"] > self._ttl
+            except UploadNotFoundError:
+                continue
+            if expired:
+                self.delete(upload_id)
+
+
+_upload_store: Optional[UploadSessionStore] = None
+
+
+def get_upload_store() -> UploadSessionStore:
+    global _upload_store
+    if _upload_store is None:
+        _upload_store = UploadSessionStore(
+            settings.UPLOAD_DIR,
+            settings.UPLOAD_MAX_BYTES,
+            settings.UPLOAD_SESSION_TTL_SECONDS,
+        )
+    return _upload_store
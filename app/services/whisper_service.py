@@ -1,34 +1,177 @@
-import torch
-from faster_whisper import WhisperModel
-from pyannote.audio import Pipeline
+import multiprocessing
+import os
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from app.core.config import settings
+from app.services.model_registry import (
+    cpu_thread_budget, get_diarization_pipeline, get_whisper_model, resolve_device
+)
 
-#Function to transcribe speech and identify speakers in an audio file
-def transcribe_and_diarize(audio_path: str):
-    """Transcrit et segmente les locuteurs depuis un fichier audio."""
-    print("Transcribing audio with Whispe...", flush=True)
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device.upper()}", flush=True)
+SAMPLING_RATE = 16000
+
+# Process pool for long recordings, created on first use and kept alive so each
+# worker loads its Whisper model only once
+_long_audio_pool = None
+_long_audio_pool_lock = threading.Lock()
+
+#Function to get the duration of a WAV file in seconds (0 if it cannot be read)
+def audio_duration(audio_path: str) -> float:
+    try:
+        with wave.open(audio_path, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except Exception:
+        return 0.0
+
+#Function to split decoded audio into pieces of about `piece_seconds`, cutting
+#only in the middle of silences detected by the VAD
+def split_on_silence(audio, piece_seconds: int = settings.LONG_AUDIO_PIECE_SECONDS):
+    piece_samples = piece_seconds * SAMPLING_RATE
+    speech = get_speech_timestamps(
+        audio,
+        VadOptions(min_silence_duration_ms=500, max_speech_duration_s=piece_seconds),
+    )
+    pieces, piece_start, previous_end = [], 0, 0
+    for chunk in speech:
+        if chunk["end"] - piece_start > piece_samples and previous_end > piece_start:
+            cut = (previous_end + chunk["start"]) // 2
+            pieces.append((piece_start, cut))
+            piece_start = cut
+        previous_end = chunk["end"]
+    pieces.append((piece_start, len(audio)))
+    return pieces
+
+#Function to share the transcription CPU budget between the pool workers
+def _long_audio_budget():
+    cores = cpu_thread_budget()[0] or os.cpu_count() or 1
+    workers = settings.LONG_AUDIO_WORKERS or max(1, cores // 2)
+    return workers, max(1, cores // workers)
+
+#Process pool initializer: load the worker's Whisper model once
+def _init_long_audio_worker(cpu_threads: int):
+    get_whisper_model(cpu_threads=cpu_threads)
+
+#Process pool task: transcribe one piece and shift its timestamps to the full recording
+def _transcribe_piece(audio, offset: float, language: str, cpu_threads: int):
+    model = get_whisper_model(cpu_threads=cpu_threads)
+    segments, _ = model.transcribe(audio, language=language)
+    return [
+        {"start": s.start + offset, "end": s.end + offset, "text": s.text.strip()}
+        for s in segments
+    ]
+
+def _get_long_audio_pool():
+    global _long_audio_pool
+    if _long_audio_pool is None:
+        with _long_audio_pool_lock:
+            if _long_audio_pool is None:
+                workers, cpu_threads = _long_audio_budget()
+                _long_audio_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_long_audio_worker,
+                    initargs=(cpu_threads,),
+                )
+    return _long_audio_pool
+
+#Function to stop the long recording workers (on application shutdown)
+def shutdown_long_audio_pool():
+    global _long_audio_pool
+    with _long_audio_pool_lock:
+        pool, _long_audio_pool = _long_audio_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
 
+#Function to transcribe a long recording piece by piece across CPU cores
+def stream_long_transcription(audio_path: str):
+    print("Transcribing long audio in parallel pieces...", flush=True)
+    audio = decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+    # Detect the language once on the start of the recording (decoding of the
+    # returned segments is lazy, so only the encoder runs here)
+    _, info = get_whisper_model().transcribe(audio[: 30 * SAMPLING_RATE])
+    print(f"Detected language: : {info.language}", flush=True)
 
-    # Load a lightweight Whisper model for transcription
-    model = WhisperModel("small", device=device)
-    # Perform the transcription
+    pieces = split_on_silence(audio)
+    workers, cpu_threads = _long_audio_budget()
+    print(f"Split into {len(pieces)} pieces over {workers} workers", flush=True)
+    results = _get_long_audio_pool().map(
+        _transcribe_piece,
+        [audio[start:end] for start, end in pieces],
+        [start / SAMPLING_RATE for start, _ in pieces],
+        [info.language] * len(pieces),
+        [cpu_threads] * len(pieces),
+    )
+    # Pieces come back in order: segments keep their global chronological order
+    whisper_segments = (segment for piece in results for segment in piece)
+    return whisper_segments, info.language, info.language_probability
+
+#Function to transcribe speech lazily: segments are yielded as they are decoded
+def stream_transcription(audio_path: str):
+    # Long recordings on CPU are transcribed in parallel pieces
+    if resolve_device() == "cpu" and audio_duration(audio_path) >= settings.LONG_AUDIO_MIN_SECONDS:
+        return stream_long_transcription(audio_path)
+
+    print("Transcribing audio with Whisper...", flush=True)
+    print(f"Using device: {resolve_device().upper()}", flush=True)
+
+    # Shared Whisper model, loaded once per worker by the model registry
+    model = get_whisper_model()
+    # Language detection runs here, decoding only starts when segments are consumed
     segments, info = model.transcribe(audio_path)
 
-    detected_language = info.language
-    language_probability = info.language_probability
-    print(f"Detected language: : {detected_language}", flush=True)
+    print(f"Detected language: : {info.language}", flush=True)
     # Convert the transcription segments into a clean, structured format
-    whisper_segments = [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments]
+    whisper_segments = ({"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments)
+    return whisper_segments, info.language, info.language_probability
 
-    print("Initializing Pyannote speaker diarization pipeline...", flush=True)
-    pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization-3.1")
+#Function to transcribe speech with the shared Whisper model
+def transcribe(audio_path: str):
+    whisper_segments, detected_language, language_probability = stream_transcription(audio_path)
+    return list(whisper_segments), detected_language, language_probability
+
+#Function to detect speaker turns with the shared Pyannote pipeline
+def diarize(audio_path: str):
+    print("Running Pyannote speaker diarization pipeline...", flush=True)
+    pipeline = get_diarization_pipeline()
     # Run the diarization to detect speaker turns
     diarization = pipeline({"audio": audio_path})
     # Convert diarization results into a list of speaker segments
-    speaker_segments = [
+    return [
         {"start": turn.start, "end": turn.end, "speaker": speaker}
         for turn, _, speaker in diarization.itertracks(yield_label=True)
     ]
+
+#Function to transcribe speech and identify speakers in an audio file
+def transcribe_and_diarize(audio_path: str, concurrent: Optional[bool] = None, progress=None):
+    """Transcrit et segmente les locuteurs depuis un fichier audio.
+
+    `concurrent` defaults to settings.PIPELINE_CONCURRENT, read at each call.
+    """
+    progress = progress or (lambda stage, done=None, total=None, **details: None)
+    if concurrent is None:
+        concurrent = settings.PIPELINE_CONCURRENT
+
+    def run_diarization():
+        speaker_segments = diarize(audio_path)
+        progress("diarization", 1, 1)
+        return speaker_segments
+
+    progress("transcription", 0, 1)
+    progress("diarization", 0, 1)
+    if concurrent:
+        # Both stages read the file on their own: run them side by side and
+        # join before the speaker merge (wall-clock = max instead of sum)
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="speech") as pool:
+            diarization_future = pool.submit(run_diarization)
+            whisper_segments, detected_language, language_probability = transcribe(audio_path)
+            progress("transcription", 1, 1)
+            speaker_segments = diarization_future.result()
+    else:
+        whisper_segments, detected_language, language_probability = transcribe(audio_path)
+        progress("transcription", 1, 1)
+        speaker_segments = run_diarization()
     #Return the Whisper transcription and the Pyannote speaker segments
-    return whisper_segments, speaker_segments, detected_language, language_probability
\ No newline at end of file
+    return whisper_segments, speaker_segments, detected_language, language_probability
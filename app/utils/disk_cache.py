@@ -0,0 +1,122 @@
+"""
+Disk-backed JSON cache with LRU and size-bounded eviction.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from app.utils.lru_cache import LRUCache
+
+
+def hash_file(path: str, extra: Iterable[Any] = ()) -> str:
+    """Hash the content of a file together with extra settings."""
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256")
+    for part in extra:
+        digest.update(b"\0" + str(part).encode())
+    return digest.hexdigest()
+
+
+def hash_parts(*parts: Any) -> str:
+    """Hash a sequence of JSON-serialisable values."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+
+class DiskCache:
+    """JSON values stored one file per key, indexed by an in-memory LRU cache.
+
+    The index is rebuilt from the directory on start-up (least recently used
+    first, by modification time), so the cache survives restarts.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = LRUCache(max_entries, on_evict=self._remove)
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[: -len(".json")], stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._add(key, size)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def _remove(self, key: str, entry: Dict[str, Any]) -> None:
+        self._bytes -= entry["size"]
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _add(self, key: str, size: int) -> None:
+        old = self._index.pop(key, None)
+        if old is not None:
+            self._bytes -= old["size"]
+        self._index.put(key, {"size": size})
+        self._bytes += size
+        while self._bytes > self._max_bytes and len(self._index) > 1:
+            self._index.evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value, or None on a miss."""
+        with self._lock:
+            if self._index.get(key) is None:
+                self.misses += 1
+                return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value: Dict[str, Any] = json.load(f)
+            # Keep the recency on disk for the next start-up
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry is not None:
+                    self._remove(key, entry)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a JSON-serialisable value, evicting old entries if needed."""
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            # Atomic replace: concurrent readers never see a partial file
+            os.replace(tmp_path, self._path(key))
+            self._add(key, size)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        """Return entry count, size and hit/miss counters."""
+        return {
+            "entries": len(self._index),
+            "size_bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
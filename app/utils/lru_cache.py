@@ -3,7 +3,7 @@ LRU Cache implementation.
 """
 
 from collections import OrderedDict
-from typing import Any, Dict, Optional, TypeVar, Union, overload
+from typing import Any, Callable, Dict, Optional, TypeVar, Union, overload
 
 _T = TypeVar("_T")
 
@@ -11,9 +11,14 @@ _T = TypeVar("_T")
 class LRUCache(OrderedDict[str, Dict[str, Any]]):
     """Least Recently Used (LRU) cache."""
 
-    def __init__(self, capacity: int):
+    def __init__(
+        self,
+        capacity: int,
+        on_evict: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ):
         super().__init__()
         self._capacity = capacity
+        self._on_evict = on_evict
 
     @overload
     def get(self, key: str) -> Optional[Dict[str, Any]]: ...
@@ -34,4 +39,10 @@ class LRUCache(OrderedDict[str, Dict[str, Any]]):
         self[key] = value
         self.move_to_end(key)
         if len(self) > self._capacity:
-            self.popitem(last=False)
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used item."""
+        key, value = self.popitem(last=False)
+        if self._on_evict is not None:
+            self._on_evict(key, value)
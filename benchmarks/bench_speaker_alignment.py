@@ -0,0 +1,88 @@
+"""
+Micro-benchmark of the speaker alignment on synthetic meetings.
+
+Compares the previous nested scan (every speaker turn for every Whisper
+segment) with the sorted sweep of app.services.speaker_alignment.
+
+    python -m benchmarks.bench_speaker_alignment
+    python -m benchmarks.bench_speaker_alignment --sizes 1000 10000 --skip-naive
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.services.speaker_alignment import assign_speakers
+
+Segment = Dict[str, Any]
+
+
+def synthetic_meeting(n: int, seed: int = 0) -> Tuple[List[Segment], List[Segment]]:
+    """Build n Whisper segments and n speaker turns over the same timeline."""
+    rng = random.Random(seed)
+    whisper_segments, speaker_segments = [], []
+    t = 0.0
+    for _ in range(n):
+        duration = rng.uniform(1.0, 6.0)
+        whisper_segments.append({"start": t, "end": t + duration, "text": "..."})
+        t += duration + rng.uniform(0.0, 0.5)
+    t = 0.0
+    for _ in range(n):
+        duration = rng.uniform(1.0, 6.0)
+        speaker = f"SPEAKER_{rng.randrange(8):02d}"
+        # Occasional overlapping speech
+        start = max(0.0, t - rng.uniform(0.0, 1.0))
+        speaker_segments.append(
+            {"start": start, "end": t + duration, "speaker": speaker}
+        )
+        t += duration + rng.uniform(0.0, 0.5)
+    return whisper_segments, speaker_segments
+
+
+def naive_assign(
+    whisper_segments: List[Segment], speaker_segments: List[Segment]
+) -> List[str]:
+    """The O(N x M) merge loop previously inlined in generate_report."""
+    result = []
+    for ws in whisper_segments:
+        speakers = [
+            s["speaker"]
+            for s in speaker_segments
+            if not (ws["end"] < s["start"] or ws["start"] > s["end"])
+        ]
+        result.append(speakers[0] if speakers else "Unknown")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 2500, 5000, 10000]
+    )
+    parser.add_argument("--skip-naive", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        f"{'segments x turns':>18} {'naive (s)':>10} {'sweep (s)':>10} {'speed-up':>9}"
+    )
+    for n in args.sizes:
+        whisper_segments, speaker_segments = synthetic_meeting(n)
+
+        start = time.perf_counter()
+        assign_speakers(whisper_segments, speaker_segments)
+        sweep = time.perf_counter() - start
+
+        if args.skip_naive:
+            print(f"{f'{n} x {n}':>18} {'-':>10} {sweep:>10.4f} {'-':>9}")
+            continue
+        start = time.perf_counter()
+        naive_assign(whisper_segments, speaker_segments)
+        naive = time.perf_counter() - start
+        print(
+            f"{f'{n} x {n}':>18} {naive:>10.4f} {sweep:>10.4f} {naive / sweep:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the transcription PDF on synthetic transcripts.
+
+Compares the previous layout (the whole transcript in one Paragraph with
+<br/> separators) with the per-turn flowables of
+app.services.pdf_service.build_transcription_pdf. The time per line of
+the flowable layout stays flat as the transcript grows.
+
+    python -m benchmarks.bench_transcription_pdf
+    python -m benchmarks.bench_transcription_pdf --sizes 2000 20000 --skip-single
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from app.services.pdf_service import build_transcription_pdf
+
+WORDS = "we should ship the release next week once the budget review and the tests are done".split()
+
+
+def synthetic_transcript(n: int, seed: int = 0) -> List[str]:
+    """Build n "[SPEAKER] text" lines, speakers changing every few lines."""
+    rng = random.Random(seed)
+    lines, speaker = [], 0
+    for _ in range(n):
+        if rng.random() < 0.3:
+            speaker = rng.randrange(6)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30)))
+        lines.append(f"[SPEAKER_{speaker:02d}] {text}")
+    return lines
+
+
+def single_paragraph_pdf(lines: List[str], pdf_path: str) -> None:
+    """The previous layout: one Paragraph holding every line."""
+    doc = SimpleDocTemplate(pdf_path)
+    styles = getSampleStyleSheet()
+    doc.build(
+        [
+            Paragraph("MEETING TRANSCRIPTION", styles["Title"]),
+            Spacer(1, 30),
+            Paragraph("<br/>".join(lines), styles["BodyText"]),
+        ]
+    )
+
+
+def timed(
+    render: Callable[[List[str], str], object], lines: List[str], pdf_path: str
+) -> float:
+    start = time.perf_counter()
+    render(lines, pdf_path)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000])
+    parser.add_argument("--skip-single", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "transcription.pdf")
+        print(
+            f"{'lines':>7} {'single (s)':>11} {'turns (s)':>10} {'turns us/line':>14}"
+        )
+        for n in args.sizes:
+            lines = synthetic_transcript(n)
+            turns = timed(
+                lambda lines, path: build_transcription_pdf(path, lines, []),
+                lines,
+                pdf_path,
+            )
+            single = (
+                "-"
+                if args.skip_single
+                else f"{timed(single_paragraph_pdf, lines, pdf_path):.3f}"
+            )
+            print(f"{n:>7} {single:>11} {turns:>10.3f} {turns / n * 1e6:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 
 
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import report_router
+from app.api.uploads import MULTIPART_OVERHEAD, MaxBodySizeMiddleware
 from app.core.config import settings
+from app.services.job_service import get_job_manager, shutdown_job_manager
+from app.services.model_registry import get_model_timings, warmup_models
+from app.services.pdf_service import shutdown_pdf_pool
+from app.services.report_service import get_transcript_cache
+from app.services.summarizer_service import close_http_clients, get_response_cache, init_http_clients
+from app.services.whisper_service import shutdown_long_audio_pool
 from fastapi import APIRouter
 
 health_router = APIRouter()
@@ -13,10 +22,45 @@ health_router = APIRouter()
 async def health():
     return {"status": "ok"}
 
+# Load and timings of the shared Whisper / Pyannote models
+@health_router.get("/health/models", tags=["system"])
+async def models_health():
+    return get_model_timings()
+
+# Size and hit/miss counters of the local caches
+@health_router.get("/health/caches", tags=["system"])
+async def caches_health():
+    return {
+        "transcripts": get_transcript_cache().stats(),
+        "llm": get_response_cache().stats(),
+    }
+
+# Number of report jobs in each status
+@health_router.get("/health/jobs", tags=["system"])
+async def jobs_health():
+    return get_job_manager().stats()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the speech models once per worker, before serving requests
+    if settings.WARMUP_MODELS:
+        try:
+            warmup_models()
+        except Exception as e:
+            print(f"Model warm-up failed, models will load on first request: {e}", flush=True)
+    # Pooled keep-alive connections to the Groq API, shared by every request
+    init_http_clients()
+    yield
+    shutdown_job_manager()
+    shutdown_long_audio_pool()
+    shutdown_pdf_pool()
+    await close_http_clients()
+
 app = FastAPI(
     title="Meeting Report Generator",
     description=settings.PROJECT_DESCRIPTION,
     version=settings.VERSION,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,6 +71,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Oversized uploads are refused before the multipart body is read (a batch
+# request may carry BATCH_MAX_FILES files of the largest size)
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    max_bytes=settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+    route_limits={
+        "/report/batches": settings.BATCH_MAX_FILES * (settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD),
+    },
+)
+
 # Inclure ton router
 app.include_router(report_router.router)
 app.include_router(health_router)
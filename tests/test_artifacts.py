@@ -0,0 +1,133 @@
+import os
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import report_router
+from app.services import artifact_service
+from app.services.artifact_service import REPORT_PDF, ArtifactStore
+
+
+def test_reports_get_their_own_directory(tmp_path: Any) -> None:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60)
+
+    first_id, first_dir = store.create()
+    second_id, second_dir = store.create()
+
+    assert first_id != second_id and first_dir != second_dir
+    assert store.path(first_id, REPORT_PDF) is None
+    with open(os.path.join(first_dir, REPORT_PDF), "wb") as f:
+        f.write(b"%PDF-1.4")
+    assert store.path(first_id, REPORT_PDF) == os.path.join(first_dir, REPORT_PDF)
+    assert store.path(second_id, REPORT_PDF) is None
+
+
+def test_only_known_artifacts_are_served(tmp_path: Any) -> None:
+    store = ArtifactStore(str(tmp_path / "reports"), ttl_seconds=60)
+    report_id, directory = store.create()
+    (tmp_path / "secret.pdf").write_bytes(b"%PDF-1.4")
+
+    assert store.path(report_id, "../../secret.pdf") is None
+    assert store.path("..", REPORT_PDF) is None
+
+
+def test_expired_reports_are_pruned(tmp_path: Any) -> None:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=-1)
+    report_id, directory = store.create()
+    with open(os.path.join(directory, REPORT_PDF), "wb") as f:
+        f.write(b"%PDF-1.4")
+
+    store.prune()
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+PDF = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60)
+    monkeypatch.setattr(artifact_service, "_artifact_store", store)
+    app = FastAPI()
+    app.include_router(report_router.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def report_id(client: TestClient) -> str:
+    store = artifact_service.get_artifact_store()
+    report_id, _ = store.create()
+    store.save(report_id, REPORT_PDF, PDF)
+    return report_id
+
+
+def test_download_is_revalidated_with_its_etag(
+    client: TestClient, report_id: str
+) -> None:
+    url = f"/report/files/{report_id}/{REPORT_PDF}"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        cached = client.get(url, headers={"If-None-Match": if_none_match})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_download_serves_byte_ranges(client: TestClient, report_id: str) -> None:
+    url = f"/report/files/{report_id}/{REPORT_PDF}"
+
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.content == PDF[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(PDF)}"
+    # The end of an interrupted download
+    tail = client.get(url, headers={"Range": "bytes=1000-"})
+    assert tail.status_code == 206
+    assert tail.content == PDF[1000:]
+
+
+def test_head_answers_headers_only(client: TestClient, report_id: str) -> None:
+    url = f"/report/files/{report_id}/{REPORT_PDF}"
+
+    response = client.head(url)
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(PDF))
+    assert response.headers["etag"] == client.get(url).headers["etag"]
+
+
+def test_unknown_download_is_not_found(client: TestClient, report_id: str) -> None:
+    assert client.get(f"/report/files/missing/{REPORT_PDF}").status_code == 404
+    assert client.get(f"/report/files/{report_id}/secret.pdf").status_code == 404
+
+
+def test_artifacts_and_report_data_are_saved(tmp_path: Any) -> None:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60)
+    report_id, directory = store.create()
+
+    path = store.save(report_id, REPORT_PDF, b"%PDF-1.4")
+    assert path == os.path.join(directory, REPORT_PDF)
+    assert store.path(report_id, REPORT_PDF) == path
+    # Written through a temporary file, which does not stay behind
+    assert os.listdir(directory) == [REPORT_PDF]
+
+    assert store.load_data(report_id) is None
+    store.save_data(report_id, {"summary": "Réunion", "participants": ["A"]})
+    assert store.load_data(report_id) == {"summary": "Réunion", "participants": ["A"]}
+    assert store.load_data("missing") is None
+    with pytest.raises(FileNotFoundError):
+        store.save("missing", REPORT_PDF, b"%PDF-1.4")
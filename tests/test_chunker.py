@@ -0,0 +1,57 @@
+from app.services.chunker import TranscriptChunker, chunk_transcript, parse_line
+from app.services.summarizer_service import estimate_tokens
+
+
+def test_parse_line() -> None:
+    assert parse_line("[SPEAKER_00] Hello there") == ("SPEAKER_00", "Hello there")
+    assert parse_line("no speaker") == (None, "no speaker")
+
+
+def test_merges_consecutive_lines_of_same_speaker() -> None:
+    lines = ["[SPEAKER_00] Hello.", "[SPEAKER_00] How are you?", "[SPEAKER_01] Fine."]
+
+    assert chunk_transcript(lines, max_tokens=1000) == [
+        "[SPEAKER_00] Hello. How are you?\n[SPEAKER_01] Fine."
+    ]
+
+
+def test_chunks_respect_budget_and_keep_whole_turns() -> None:
+    lines = [f"[SPEAKER_0{i % 2}] " + f"sentence number {i}. " * 10 for i in range(40)]
+
+    chunks = chunk_transcript(lines, max_tokens=200)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= 200
+        for turn in chunk.split("\n"):
+            assert turn.startswith("[SPEAKER_0")
+            assert turn.endswith(".")
+
+
+def test_oversized_turn_is_split_with_speaker_tag() -> None:
+    chunks = chunk_transcript(["[SPEAKER_00] " + "word " * 500], max_tokens=100)
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith("[SPEAKER_00] ") for chunk in chunks)
+    assert sum(chunk.count("word") for chunk in chunks) == 500
+
+
+def test_split_pieces_fit_the_budget_with_a_long_speaker_tag() -> None:
+    speaker = "Chairwoman of the quarterly budget review committee"
+    chunks = chunk_transcript([f"[{speaker}] " + "word " * 500], max_tokens=40)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith(f"[{speaker}] ")
+        assert estimate_tokens(chunk) <= 40
+    assert sum(chunk.count("word") for chunk in chunks) == 500
+
+
+def test_incremental_chunks_are_emitted_when_full() -> None:
+    chunker = TranscriptChunker(max_tokens=50)
+
+    assert chunker.add("[A] " + "a" * 120) == []
+    assert chunker.add("[B] " + "b" * 120) == []
+    # Closing the turn of B does not fit next to A: the chunk of A is complete
+    assert chunker.add("[C] " + "c" * 120) == ["[A] " + "a" * 120]
+    assert chunker.flush() == ["[B] " + "b" * 120, "[C] " + "c" * 120]
@@ -0,0 +1,60 @@
+import os
+
+from app.utils.disk_cache import DiskCache, hash_file
+
+
+def test_put_and_get(tmp_path: str) -> None:
+    cache = DiskCache(str(tmp_path), max_entries=10, max_bytes=10_000)
+    cache.put("a", {"language": "fr", "segments": [1, 2]})
+
+    assert cache.get("a") == {"language": "fr", "segments": [1, 2]}
+    assert cache.get("missing") is None
+
+
+def test_lru_eviction_by_count(tmp_path: str) -> None:
+    cache = DiskCache(str(tmp_path), max_entries=2, max_bytes=10_000)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert not os.path.exists(os.path.join(tmp_path, "b.json"))
+
+
+def test_eviction_by_size(tmp_path: str) -> None:
+    cache = DiskCache(str(tmp_path), max_entries=10, max_bytes=100)
+    cache.put("a", {"text": "x" * 60})
+    cache.put("b", {"text": "y" * 60})
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size_bytes <= 100
+
+
+def test_index_rebuilt_from_disk(tmp_path: str) -> None:
+    DiskCache(str(tmp_path), max_entries=10, max_bytes=10_000).put("a", {"v": 1})
+
+    cache = DiskCache(str(tmp_path), max_entries=10, max_bytes=10_000)
+    assert len(cache) == 1
+    assert cache.get("a") == {"v": 1}
+
+
+def test_hash_file_depends_on_content_and_settings(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "audio.wav")
+    with open(path, "wb") as f:
+        f.write(b"RIFF....WAVE")
+
+    assert hash_file(path, ("small",)) == hash_file(path, ("small",))
+    assert hash_file(path, ("small",)) != hash_file(path, ("medium",))
+
+
+def test_hit_and_miss_counters(tmp_path: str) -> None:
+    cache = DiskCache(str(tmp_path), max_entries=10, max_bytes=10_000)
+    cache.get("a")
+    cache.put("a", {"v": 1})
+    cache.get("a")
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,49 @@
+from app.services.extractive import reduce_transcript, sentence_scores
+
+
+def test_filler_scores_lower_than_content() -> None:
+    texts = [
+        "yeah",
+        "We decided to move the release to March because of the audit.",
+        "yeah",
+        "ok",
+        "The budget for the new hires must be approved by finance.",
+        "",
+    ]
+
+    scores = sentence_scores(texts)
+
+    assert scores[1] > scores[0]
+    assert scores[4] > scores[3]
+    assert scores[5] == 0
+
+
+def test_reduce_keeps_order_and_drops_filler() -> None:
+    lines = [
+        "[SPEAKER_00] Hello everyone.",
+        "[SPEAKER_00] We decided to move the release to March because of the audit.",
+        "[SPEAKER_01] yeah",
+        "[SPEAKER_01] Finance must approve the budget for two new hires first.",
+        "[SPEAKER_00] yeah",
+        "[SPEAKER_01] yeah",
+    ]
+
+    reduced = reduce_transcript(lines, keep_ratio=0.3)
+
+    assert reduced == [lines[1], lines[3]]
+
+
+def test_every_speaker_keeps_a_line() -> None:
+    lines = [f"[SPEAKER_00] point number {i} about the roadmap" for i in range(10)]
+    lines.append("[SPEAKER_01] agreed")
+
+    reduced = reduce_transcript(lines, keep_ratio=0.2)
+
+    assert "[SPEAKER_01] agreed" in reduced
+    assert len(reduced) == 3
+
+
+def test_full_ratio_keeps_everything() -> None:
+    lines = ["[SPEAKER_00] yeah", "[SPEAKER_01] ok"]
+
+    assert reduce_transcript(lines, keep_ratio=1.0) == lines
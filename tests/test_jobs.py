@@ -0,0 +1,461 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import report_router
+from app.services import artifact_service, job_service
+from app.services.artifact_service import ArtifactStore
+from app.services.job_service import BatchEntry, JobManager, QueueFullError
+
+
+def wait_for(predicate: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_reports_stages_and_result(tmp_path: Any) -> None:
+    audio = tmp_path / "meeting.wav"
+    audio.write_bytes(b"RIFF")
+    release = threading.Event()
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        progress("summarization", 1, 3)
+        release.wait(5)
+        progress("merge")
+        return {"summary": "done", "pdf_path": None}
+
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    job = manager.submit(str(audio))
+
+    wait_for(lambda: job.stage == "summarization")
+    status = manager.get(job.id).to_dict()  # type: ignore[union-attr]
+    assert status["status"] == "running"
+    assert status["progress"] == {"done": 1, "total": 3}
+
+    release.set()
+    wait_for(lambda: job.finished_at is not None)
+    assert job.status == "done"
+    assert job.result == {"summary": "done", "pdf_path": None}
+    # The job owns the uploaded file
+    assert not audio.exists()
+    manager.shutdown()
+
+
+def test_failed_job_keeps_error(tmp_path: Any) -> None:
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        return {"error": "No transcription detected."}
+
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    job = manager.submit(str(tmp_path / "missing.wav"))
+
+    wait_for(lambda: job.finished_at is not None)
+    assert job.status == "failed"
+    assert job.error == "No transcription detected."
+    manager.shutdown()
+
+
+def test_content_hash_is_passed_to_the_runner(tmp_path: Any) -> None:
+    hashes: List[str] = []
+
+    def runner(
+        path: str, progress: Callable[..., None], content_hash: str
+    ) -> Dict[str, Any]:
+        hashes.append(content_hash)
+        return {"summary": "done"}
+
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    job = manager.submit(str(tmp_path / "a.wav"), "key", content_hash="abc")
+    batch = manager.submit_batch(
+        [BatchEntry(str(tmp_path / "b.wav"), content_hash="def")]
+    )
+
+    wait_for(lambda: job.finished_at is not None)
+    wait_for(lambda: batch.finished_at is not None)
+    assert sorted(hashes) == ["abc", "def"]
+    manager.shutdown()
+
+
+def test_submissions_are_bounded(tmp_path: Any) -> None:
+    release = threading.Event()
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        release.wait(5)
+        return {"summary": ""}
+
+    manager = JobManager(workers=1, max_pending=2, ttl_seconds=60, runner=runner)
+    first = manager.submit(str(tmp_path / "a.wav"))
+    wait_for(lambda: first.status == "running")
+    manager.submit(str(tmp_path / "b.wav"))
+
+    with pytest.raises(QueueFullError):
+        manager.submit(str(tmp_path / "c.wav"))
+    assert manager.stats() == {"running": 1, "queued": 1, "coalesced": 0}
+    release.set()
+    manager.shutdown()
+
+
+def test_finished_jobs_expire(tmp_path: Any) -> None:
+    manager = JobManager(
+        workers=1, max_pending=4, ttl_seconds=0, runner=lambda path, progress: {}
+    )
+    job = manager.submit(str(tmp_path / "a.wav"))
+    wait_for(lambda: job.finished_at is not None)
+    time.sleep(0.01)
+
+    manager.submit(str(tmp_path / "b.wav"))
+
+    assert manager.get(job.id) is None
+    manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_events_follow_the_job(tmp_path: Any) -> None:
+    release = threading.Event()
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        progress("summarization", 1, 2, chunk=1, summary="first part")
+        release.wait(5)
+        progress("summarization", 2, 2, chunk=2, summary="second part")
+        return {"summary": "report"}
+
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    job = manager.submit(str(tmp_path / "a.wav"))
+
+    events = []
+    async for event in job.iter_events(keepalive=0.05):
+        if event is None:
+            # Idle keep-alive: let the job finish
+            release.set()
+            continue
+        events.append(event)
+
+    assert [e["event"] for e in events] == [
+        "status",
+        "status",
+        "progress",
+        "progress",
+        "done",
+    ]
+    assert [e["summary"] for e in events if e["event"] == "progress"] == [
+        "first part",
+        "second part",
+    ]
+    assert events[-1]["result"] == {"summary": "report"}
+    # Resuming after an id only replays the later events
+    replay = [e async for e in job.iter_events(after=4)]
+    assert len(replay) == 1 and replay[0] is not None
+    assert replay[0]["id"] == 5
+    manager.shutdown()
+
+
+def test_identical_pending_requests_share_one_job(tmp_path: Any) -> None:
+    release = threading.Event()
+    runs = []
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        runs.append(path)
+        release.wait(5)
+        return {"summary": "shared"}
+
+    manager = JobManager(workers=2, max_pending=4, ttl_seconds=60, runner=runner)
+    uploads = [tmp_path / f"{name}.wav" for name in "abc"]
+    for upload in uploads:
+        upload.write_bytes(b"RIFF")
+
+    first = manager.submit(str(uploads[0]), key="same-audio")
+    duplicate = manager.submit(str(uploads[1]), key="same-audio")
+    other = manager.submit(str(uploads[2]), key="other-audio")
+
+    assert duplicate is first
+    assert other is not first
+    # The duplicate upload is not needed anymore
+    assert not uploads[1].exists()
+    release.set()
+    wait_for(lambda: first.finished_at is not None and other.finished_at is not None)
+    assert len(runs) == 2
+    assert manager.stats()["coalesced"] == 1
+
+    # Once finished, the same key runs again
+    uploads[1].write_bytes(b"RIFF")
+    assert manager.submit(str(uploads[1]), key="same-audio") is not first
+    manager.shutdown()
+
+
+def test_interactive_jobs_run_before_queued_batch(tmp_path: Any) -> None:
+    release = threading.Event()
+    order = []
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        release.wait(5)
+        order.append(os.path.basename(path))
+        return {"summary": "", "duration": 60.0}
+
+    manager = JobManager(
+        workers=1, max_pending=2, ttl_seconds=60, runner=runner, max_pending_batch=4
+    )
+    blocker = manager.submit(str(tmp_path / "blocker.wav"))
+    wait_for(lambda: blocker.status == "running")
+    batch = manager.submit_batch(
+        [BatchEntry(str(tmp_path / f"night{i}.wav"), owns_file=False) for i in range(3)]
+    )
+    # Batch jobs have their own pending limit
+    manager.submit(str(tmp_path / "interactive.wav"))
+    with pytest.raises(QueueFullError):
+        manager.submit_batch(
+            [BatchEntry(str(tmp_path / f"more{i}.wav")) for i in range(2)]
+        )
+
+    release.set()
+    wait_for(lambda: batch.finished_at is not None)
+    assert order == [
+        "blocker.wav",
+        "interactive.wav",
+        "night0.wav",
+        "night1.wav",
+        "night2.wav",
+    ]
+    status = manager.get_batch(batch.id).to_dict()  # type: ignore[union-attr]
+    assert status["counts"] == {"done": 3}
+    assert status["throughput"]["audio_seconds"] == 180.0
+    assert status["throughput"]["jobs_per_hour"] > 0
+    manager.shutdown()
+
+
+def test_interactive_duplicate_promotes_queued_batch_job(tmp_path: Any) -> None:
+    release = threading.Event()
+    order = []
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        release.wait(5)
+        order.append(os.path.basename(path))
+        return {"summary": ""}
+
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    blocker = manager.submit(str(tmp_path / "blocker.wav"))
+    wait_for(lambda: blocker.status == "running")
+    batch = manager.submit_batch(
+        [
+            BatchEntry(str(tmp_path / "first.wav"), key="first", owns_file=False),
+            BatchEntry(str(tmp_path / "second.wav"), key="second", owns_file=False),
+        ]
+    )
+
+    job = manager.submit(str(tmp_path / "upload.wav"), key="second")
+
+    assert job is batch.jobs[1]
+    assert job.priority == "interactive"
+    release.set()
+    wait_for(lambda: batch.finished_at is not None)
+    assert order == ["blocker.wav", "second.wav", "first.wav"]
+    manager.shutdown()
+
+
+def test_shutdown_fails_queued_jobs_and_removes_their_uploads(tmp_path: Any) -> None:
+    release = threading.Event()
+
+    def runner(path: str, progress: Callable[..., None]) -> Dict[str, Any]:
+        release.wait(5)
+        return {"summary": ""}
+
+    for name in ("blocker.wav", "upload.wav", "named.wav"):
+        (tmp_path / name).write_bytes(b"RIFF")
+    manager = JobManager(workers=1, max_pending=4, ttl_seconds=60, runner=runner)
+    blocker = manager.submit(str(tmp_path / "blocker.wav"))
+    wait_for(lambda: blocker.status == "running")
+    upload = manager.submit(str(tmp_path / "upload.wav"), key="upload")
+    batch = manager.submit_batch(
+        [BatchEntry(str(tmp_path / "named.wav"), owns_file=False)]
+    )
+
+    manager.shutdown()
+
+    for job in (upload, batch.jobs[0]):
+        assert job.status == "failed"
+        assert job.finished_at is not None
+        assert job.events[-1]["event"] == "error"
+        # Clients waiting for the job are released
+        asyncio.run(asyncio.wait_for(job.wait(), 1))
+    assert not (tmp_path / "upload.wav").exists()
+    assert (tmp_path / "named.wav").exists()
+    assert batch.finished_at is not None
+    # The running job finishes in its thread
+    release.set()
+    wait_for(lambda: blocker.status == "done")
+
+
+WAV = b"RIFF\x00\x00\x00\x00WAVEfmt "
+
+
+@pytest.fixture
+def manager(monkeypatch: pytest.MonkeyPatch) -> Iterator[JobManager]:
+    """Job manager of the endpoints, with a pipeline returning at once."""
+
+    def runner(path: str, progress: Callable[..., None], **options: Any) -> Any:
+        return {"summary": os.path.basename(path), "duration": 60.0}
+
+    manager = JobManager(
+        workers=1, max_pending=4, ttl_seconds=60, runner=runner, max_pending_batch=2
+    )
+    monkeypatch.setattr(job_service, "_job_manager", manager)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def client(manager: JobManager) -> TestClient:
+    app = FastAPI()
+    app.include_router(report_router.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def temp_dir(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> Any:
+    """Directory receiving the uploads saved by the endpoints."""
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(directory))
+    return directory
+
+
+def test_batch_endpoint_queues_uploads_and_named_files(
+    client: TestClient, temp_dir: Any, tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "standup.wav").write_bytes(WAV + b"standup")
+    monkeypatch.setattr(report_router.settings, "BATCH_INPUT_DIR", str(inputs))
+
+    response = client.post(
+        "/report/batches",
+        files=[("files", ("monday.wav", WAV + b"monday", "audio/wav"))],
+        data={"paths": "standup.wav"},
+    )
+
+    assert response.status_code == 202
+    batch_id = response.json()["batch_id"]
+    assert len(response.json()["job_ids"]) == 2
+    wait_for(lambda: client.get(f"/report/batches/{batch_id}").json()["finished_at"])
+    status = client.get(f"/report/batches/{batch_id}").json()
+    assert status["status"] == "finished"
+    assert status["counts"] == {"done": 2}
+    assert status["throughput"]["audio_seconds"] == 120.0
+    assert [job["priority"] for job in status["jobs"]] == ["batch", "batch"]
+    # Uploads are removed once processed, named files are kept
+    assert list(temp_dir.iterdir()) == []
+    assert (inputs / "standup.wav").exists()
+
+
+def test_batch_endpoint_validates_priority_and_input(
+    client: TestClient, manager: JobManager
+) -> None:
+    upload = [("files", ("monday.wav", WAV, "audio/wav"))]
+
+    response = client.post("/report/batches", files=upload, data={"priority": "urgent"})
+    assert response.status_code == 400
+    assert "interactive" in response.json()["detail"]
+
+    assert client.post("/report/batches", data={"priority": "batch"}).status_code == 400
+    assert manager.stats() == {"coalesced": 0}
+
+
+def test_rejected_batch_removes_its_uploads(
+    client: TestClient, manager: JobManager, temp_dir: Any
+) -> None:
+    # A file in an unsupported format rejects the files uploaded before it
+    response = client.post(
+        "/report/batches",
+        files=[
+            ("files", ("monday.wav", WAV + b"monday", "audio/wav")),
+            ("files", ("notes.txt", b"not audio at all", "text/plain")),
+        ],
+    )
+    assert response.status_code == 400
+    assert list(temp_dir.iterdir()) == []
+
+    # Over the batch pending limit, none of the files is queued
+    response = client.post(
+        "/report/batches",
+        files=[
+            ("files", (f"day{i}.wav", WAV + str(i).encode(), "audio/wav"))
+            for i in range(3)
+        ],
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+    assert list(temp_dir.iterdir()) == []
+    assert manager.stats() == {"coalesced": 0}
+
+
+def test_unknown_batch_is_not_found(client: TestClient) -> None:
+    response = client.get("/report/batches/missing")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown or expired batch."
+
+
+def test_streamed_report_is_prepared_by_a_job(
+    client: TestClient,
+    manager: JobManager,
+    temp_dir: Any,
+    tmp_path: Any,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    threads: List[str] = []
+
+    def prepare_report(path: str, progress: Callable[..., None], **options: Any) -> Any:
+        threads.append(threading.current_thread().name)
+        return {
+            "summaries": ["a", "b"],
+            "transcript": ["[SPEAKER_00] hello"],
+            "participants": ["SPEAKER_00"],
+            "language": "en",
+        }
+
+    def stream_report_summary(prepared: Dict[str, Any], report_id: str) -> Any:
+        yield " + ".join(prepared["summaries"])
+
+    monkeypatch.setattr(report_router, "prepare_report", prepare_report)
+    monkeypatch.setattr(report_router, "stream_report_summary", stream_report_summary)
+    store = ArtifactStore(str(tmp_path / "reports"), ttl_seconds=60)
+    monkeypatch.setattr(artifact_service, "_artifact_store", store)
+
+    response = client.post(
+        "/report/generate/stream",
+        files={"file": ("monday.wav", WAV + b"monday", "audio/wav")},
+    )
+
+    assert response.status_code == 200
+    assert response.text == "a + b"
+    assert response.headers["X-Report-Language"] == "en"
+    # Run in the job pool, counted with the other reports
+    assert threads[0].startswith("report-job")
+    assert manager.stats() == {"done": 1, "coalesced": 0}
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_failed_stream_preparation_is_an_error(
+    client: TestClient, temp_dir: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        report_router,
+        "prepare_report",
+        lambda path, progress, **options: {"error": "No transcription detected."},
+    )
+
+    response = client.post(
+        "/report/generate/stream",
+        files={"file": ("monday.wav", WAV + b"monday", "audio/wav")},
+    )
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "No transcription detected."
+    assert list(temp_dir.iterdir()) == []
@@ -0,0 +1,227 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import report_router
+from app.services import live_service
+from app.services.live_service import LiveSession, LiveTranscriber
+from app.services.speaker_alignment import UNKNOWN_SPEAKER
+
+SAMPLING_RATE = 16000
+
+
+class FakeWhisper:
+    """One segment per `segment_seconds` of audio, text tagged by pass number."""
+
+    def __init__(self, segment_seconds: float = 2.0) -> None:
+        self.segment_seconds = segment_seconds
+        self.windows: List[float] = []
+
+    def transcribe(
+        self, audio: np.ndarray, language: Optional[str] = None
+    ) -> Tuple[Any, Any]:
+        duration = len(audio) / SAMPLING_RATE
+        self.windows.append(duration)
+        starts = np.arange(0, duration, self.segment_seconds)
+        segments = [
+            SimpleNamespace(
+                start=float(start),
+                end=float(min(start + self.segment_seconds, duration)),
+                text=f" pass{len(self.windows)} at {start:g}",
+            )
+            for start in starts
+        ]
+        return iter(segments), SimpleNamespace(language="en")
+
+
+@pytest.fixture
+def whisper(monkeypatch: pytest.MonkeyPatch) -> FakeWhisper:
+    model = FakeWhisper()
+    monkeypatch.setattr(live_service, "get_whisper_model", lambda: model)
+    return model
+
+
+def pcm(seconds: float) -> bytes:
+    return (np.ones(int(seconds * SAMPLING_RATE)) * 1000).astype("<i2").tobytes()
+
+
+def test_tail_stays_pending_until_next_window(whisper: FakeWhisper) -> None:
+    transcriber = LiveTranscriber(step_seconds=5, tail_seconds=1)
+
+    transcriber.add_pcm(pcm(3))
+    assert not transcriber.ready()
+    transcriber.add_pcm(pcm(2))
+    assert transcriber.ready()
+
+    first = transcriber.transcribe()
+    # 0-2 and 2-4 are committed, 4-5 ends in the tail and is decoded again
+    assert [(s["start"], s["end"]) for s in first] == [(0.0, 2.0), (2.0, 4.0)]
+    assert transcriber.language == "en"
+
+    transcriber.add_pcm(pcm(5))
+    second = transcriber.transcribe(final=True)
+    assert whisper.windows == [5.0, 6.0]
+    assert [(s["start"], s["end"]) for s in second] == [
+        (4.0, 6.0),
+        (6.0, 8.0),
+        (8.0, 10.0),
+    ]
+    assert second[0]["text"] == "pass2 at 0"
+
+
+def test_long_pending_window_is_committed(whisper: FakeWhisper) -> None:
+    whisper.segment_seconds = 100.0
+    transcriber = LiveTranscriber(
+        step_seconds=5, tail_seconds=1.5, max_window_seconds=12
+    )
+
+    transcriber.add_pcm(pcm(6))
+    assert transcriber.transcribe() == []
+    transcriber.add_pcm(pcm(6))
+    committed = transcriber.transcribe()
+
+    assert [(s["start"], s["end"]) for s in committed] == [(0.0, 12.0)]
+    assert transcriber.transcribe(final=True) == []
+
+
+def test_odd_trailing_byte_is_ignored(whisper: FakeWhisper) -> None:
+    transcriber = LiveTranscriber(step_seconds=1)
+
+    transcriber.add_pcm(pcm(1) + b"\x01")
+
+    assert transcriber.ready()
+
+
+class SlowWhisper(FakeWhisper):
+    """FakeWhisper whose first decode waits until `release` is set."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def transcribe(
+        self, audio: np.ndarray, language: Optional[str] = None
+    ) -> Tuple[Any, Any]:
+        if not self.windows:
+            self.started.set()
+            self.release.wait(5)
+        return super().transcribe(audio, language)
+
+
+def test_audio_added_during_a_pass_is_kept(monkeypatch: pytest.MonkeyPatch) -> None:
+    whisper = SlowWhisper()
+    monkeypatch.setattr(live_service, "get_whisper_model", lambda: whisper)
+    transcriber = LiveTranscriber(step_seconds=5, tail_seconds=1)
+    transcriber.add_pcm(pcm(5))
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(transcriber.transcribe)
+        assert whisper.started.wait(5)
+        # The meeting goes on while the window is decoded
+        transcriber.add_pcm(pcm(3))
+        assert not transcriber.ready()
+        whisper.release.set()
+        committed = first.result()
+
+    # 0-4 committed, the 4-5 tail and the 3 s received meanwhile stay pending
+    assert [(s["start"], s["end"]) for s in committed] == [(0.0, 2.0), (2.0, 4.0)]
+    transcriber.add_pcm(pcm(2))
+    assert transcriber.ready()
+    final = transcriber.transcribe(final=True)
+    assert whisper.windows == [5.0, 6.0]
+    assert [(s["start"], s["end"]) for s in final] == [
+        (4.0, 6.0),
+        (6.0, 8.0),
+        (8.0, 10.0),
+    ]
+
+
+@pytest.fixture
+def summaries(monkeypatch: pytest.MonkeyPatch) -> List[Any]:
+    """Stubbed LLM and storage, one chunk per transcript line."""
+    stored: List[Any] = []
+    monkeypatch.setattr(live_service.settings, "CHUNK_MAX_TOKENS", 8)
+    monkeypatch.setattr(
+        live_service,
+        "summarize_chunk",
+        lambda i, chunk, participants, language, total=None: f"summary {i}",
+    )
+    monkeypatch.setattr(
+        live_service,
+        "merge_summaries",
+        lambda summaries, participants, language: " + ".join(summaries),
+    )
+
+    def save_report(summary: str, transcript: List[str], *args: Any) -> Dict[str, Any]:
+        stored.append((summary, transcript))
+        return {"report_id": "r1", "pdf_path": None, "transcription_pdf_path": None}
+
+    monkeypatch.setattr(live_service, "save_report", save_report)
+    return stored
+
+
+def test_live_session_summarizes_chunks_and_merges(
+    whisper: FakeWhisper, summaries: List[Any]
+) -> None:
+    session = LiveSession()
+    session.transcriber.add_pcm(pcm(4))
+
+    segments, submitted = session.process(final=True)
+
+    assert [s["text"] for s in segments] == ["pass1 at 0", "pass1 at 2"]
+    assert [(chunk, future.result()) for chunk, future in submitted] == [
+        (1, "summary 1"),
+        (2, "summary 2"),
+    ]
+    report = session.finish()
+    session.close()
+    assert report["summary"] == "summary 1 + summary 2"
+    assert report["language"] == "en"
+    assert summaries == [
+        (
+            "summary 1 + summary 2",
+            [f"[{UNKNOWN_SPEAKER}] pass1 at 0", f"[{UNKNOWN_SPEAKER}] pass1 at 2"],
+        )
+    ]
+
+
+def test_live_session_without_audio_reports_an_error(summaries: List[Any]) -> None:
+    session = LiveSession()
+    session.process(final=True)
+
+    assert session.finish() == {"error": "No transcription detected."}
+    session.close()
+
+
+def test_live_websocket_streams_segments_summaries_and_report(
+    whisper: FakeWhisper, summaries: List[Any]
+) -> None:
+    app = FastAPI()
+    app.include_router(report_router.router)
+
+    with TestClient(app).websocket_connect("/report/live?language=fr") as websocket:
+        websocket.send_bytes(pcm(2))
+        websocket.send_bytes(pcm(2))
+        websocket.send_text("stop")
+        messages: List[Dict[str, Any]] = []
+        while not messages or messages[-1]["type"] not in ("report", "error"):
+            messages.append(websocket.receive_json())
+
+    assert [m["type"] for m in messages] == [
+        "segment",
+        "segment",
+        "summary",
+        "summary",
+        "report",
+    ]
+    assert [m["text"] for m in messages[:2]] == ["pass1 at 0", "pass1 at 2"]
+    assert sorted(m["chunk"] for m in messages[2:4]) == [1, 2]
+    assert messages[-1]["summary"] == "summary 1 + summary 2"
+    assert messages[-1]["language"] == "fr"
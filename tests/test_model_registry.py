@@ -0,0 +1,160 @@
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import model_registry
+
+
+class FakeWhisperModel:
+    loads: List[Dict[str, Any]] = []
+
+    def __init__(self, name: str, **kwargs: Any) -> None:
+        FakeWhisperModel.loads.append({"name": name, **kwargs})
+
+    def transcribe(self, audio: np.ndarray, language: str = "en") -> Any:
+        return iter([]), SimpleNamespace(language=language)
+
+
+class FakePipeline:
+    loads: List[str] = []
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    @classmethod
+    def from_pretrained(cls, name: str) -> "FakePipeline":
+        cls.loads.append(name)
+        return cls()
+
+    def to(self, device: Any) -> None:
+        pass
+
+    def __call__(self, inputs: Dict[str, Any]) -> None:
+        self.calls += 1
+
+
+class FakeTensor:
+    def unsqueeze(self, dim: int) -> "FakeTensor":
+        return self
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch: pytest.MonkeyPatch) -> None:
+    FakeWhisperModel.loads = []
+    FakePipeline.loads = []
+    monkeypatch.setattr(model_registry, "WhisperModel", FakeWhisperModel)
+    monkeypatch.setattr(model_registry, "Pipeline", FakePipeline)
+    monkeypatch.setattr(
+        model_registry,
+        "torch",
+        SimpleNamespace(
+            cuda=SimpleNamespace(is_available=lambda: False),
+            device=lambda name: name,
+            set_num_threads=lambda n: None,
+            from_numpy=lambda array: FakeTensor(),
+        ),
+    )
+    monkeypatch.setattr(model_registry, "_whisper_models", {})
+    monkeypatch.setattr(model_registry, "_pipelines", {})
+    monkeypatch.setattr(model_registry, "_timings", {})
+
+
+def test_models_are_loaded_once_per_configuration() -> None:
+    first = model_registry.get_whisper_model("small", "auto", "int8", cpu_threads=2)
+    again = model_registry.get_whisper_model("small", "cpu", "int8", cpu_threads=2)
+    other = model_registry.get_whisper_model("small", "cpu", "int8", cpu_threads=4)
+
+    # "auto" resolves to the CPU here, so the first two share the model
+    assert again is first
+    assert other is not first
+    assert [load["cpu_threads"] for load in FakeWhisperModel.loads] == [2, 4]
+
+    pipeline = model_registry.get_diarization_pipeline("diarization", "cpu")
+    assert model_registry.get_diarization_pipeline("diarization", "auto") is pipeline
+    assert FakePipeline.loads == ["diarization"]
+
+
+def test_concurrent_first_requests_share_one_load() -> None:
+    barrier = threading.Barrier(8)
+    models: List[Any] = []
+
+    def load() -> None:
+        barrier.wait()
+        models.append(model_registry.get_whisper_model("small", "cpu", "int8", 1))
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(FakeWhisperModel.loads) == 1
+    assert all(model is models[0] for model in models)
+
+
+def test_warmup_records_load_and_warmup_timings() -> None:
+    timings = model_registry.warmup_models()
+
+    assert len(FakeWhisperModel.loads) == 1
+    assert len(FakePipeline.loads) == 1
+    assert sorted(k.split(":")[0] for k in timings) == ["diarization", "whisper"]
+    for values in timings.values():
+        assert set(values) == {"load_seconds", "warmup_seconds"}
+    # A copy: callers cannot alter the registry timings
+    next(iter(timings.values()))["load_seconds"] = -1.0
+    assert -1.0 not in [
+        v["load_seconds"] for v in model_registry.get_model_timings().values()
+    ]
+
+
+def test_models_health_endpoint() -> None:
+    from main import app
+
+    model_registry.get_whisper_model("small", "cpu", "int8", cpu_threads=1)
+
+    response = TestClient(app).get("/health/models")
+
+    assert response.status_code == 200
+    assert list(response.json()) == ["whisper:small/cpu/int8/1"]
+    assert response.json()["whisper:small/cpu/int8/1"]["load_seconds"] >= 0
+
+
+@pytest.mark.parametrize(
+    "concurrent, whisper, diarization, expected",
+    [
+        # Unset budgets split the cores between the concurrent stages
+        (True, 0, 0, (4, 4)),
+        (True, 6, 0, (6, 2)),
+        (True, 0, 3, (4, 3)),
+        (True, 2, 3, (2, 3)),
+        # Run one after the other, each stage keeps its library default
+        (False, 0, 0, (0, 0)),
+        (False, 6, 2, (6, 2)),
+    ],
+)
+def test_cpu_thread_budget_splits_the_cores(
+    monkeypatch: pytest.MonkeyPatch,
+    concurrent: bool,
+    whisper: int,
+    diarization: int,
+    expected: Tuple[int, int],
+) -> None:
+    monkeypatch.setattr(model_registry.os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(model_registry.settings, "PIPELINE_CONCURRENT", concurrent)
+    monkeypatch.setattr(model_registry.settings, "WHISPER_CPU_THREADS", whisper)
+    monkeypatch.setattr(model_registry.settings, "DIARIZATION_CPU_THREADS", diarization)
+
+    assert model_registry.cpu_thread_budget() == expected
+
+
+def test_cpu_thread_budget_on_a_single_core(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(model_registry.os, "cpu_count", lambda: 1)
+    monkeypatch.setattr(model_registry.settings, "PIPELINE_CONCURRENT", True)
+    monkeypatch.setattr(model_registry.settings, "WHISPER_CPU_THREADS", 0)
+    monkeypatch.setattr(model_registry.settings, "DIARIZATION_CPU_THREADS", 0)
+
+    assert model_registry.cpu_thread_budget() == (1, 1)
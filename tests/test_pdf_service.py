@@ -0,0 +1,133 @@
+import threading
+from typing import Any, List
+
+import pytest
+from reportlab import rl_config
+from reportlab.lib.styles import getSampleStyleSheet
+
+from app.services import pdf_service
+from app.services.pdf_service import (
+    FLOWABLE_BATCH,
+    STYLES,
+    build_transcription_pdf,
+    render_report_pdf,
+    render_report_pdfs,
+    render_transcription_pdf,
+    shutdown_pdf_pool,
+    transcript_flowables,
+)
+
+
+def test_one_label_per_speaker_turn() -> None:
+    style = getSampleStyleSheet()["BodyText"]
+    lines = [
+        "[SPEAKER_00] Hello <team> & all",
+        "[SPEAKER_00] Second line",
+        "continued without a label",
+        "[SPEAKER_01] Reply",
+    ]
+
+    texts = [p.getPlainText() for p in transcript_flowables(lines, style, style)]
+
+    assert texts == [
+        "SPEAKER_00",
+        "Hello <team> & all",
+        "Second line",
+        "continued without a label",
+        "SPEAKER_01",
+        "Reply",
+    ]
+
+
+def test_long_transcript_spans_pages(tmp_path: Any) -> None:
+    lines = [f"[SPEAKER_0{i % 3}] line {i} " + "word " * 20 for i in range(600)]
+    pdf_path = str(tmp_path / "transcription.pdf")
+
+    build_transcription_pdf(pdf_path, iter(lines), ["SPEAKER_00"])
+    with open(pdf_path, "rb") as f:
+        assert f.read().count(b"/Type /Page\n") > 10
+
+
+def test_styles_are_shared_and_read_only() -> None:
+    render_report_pdf("# Summary", ["SPEAKER_00"])
+
+    assert STYLES["report_title"].fontSize == 16
+    # The sample style sheet is no longer customized in place
+    assert getSampleStyleSheet()["Title"].fontSize == 18
+    with pytest.raises(TypeError):
+        STYLES["report_title"] = STYLES["normal"]  # type: ignore[index]
+
+
+def test_both_pdfs_are_rendered_in_memory() -> None:
+    try:
+        summary_pdf, transcription_pdf = render_report_pdfs(
+            "# Summary\nDecisions",
+            ["[SPEAKER_00] Hello", "[SPEAKER_01] Hi"],
+            ["SPEAKER_00"],
+        )
+    finally:
+        shutdown_pdf_pool()
+
+    assert summary_pdf is not None and summary_pdf.startswith(b"%PDF")
+    assert transcription_pdf is not None and transcription_pdf.startswith(b"%PDF")
+
+
+def test_streamed_layout_matches_the_whole_list(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Reproducible and uncompressed output, so both layouts can be compared
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    monkeypatch.setattr(rl_config, "pageCompression", 0)
+    # Many batches of flowables, turns of several lines split across pages
+    lines = [
+        f"[SPEAKER_0{i // 7 % 3}] line {i} " + "word " * (i % 40)
+        for i in range(FLOWABLE_BATCH * 20)
+    ]
+    streamed = render_transcription_pdf(lines, ["SPEAKER_00"])
+    monkeypatch.setattr(pdf_service, "_FlowableStream", list)
+    whole = render_transcription_pdf(lines, ["SPEAKER_00"])
+
+    assert streamed.count(b"/Type /Page\n") > 20
+    assert streamed == whole
+    # The last lines are laid out, in order
+    before_last = streamed.index(f"(line {len(lines) - 2} ".encode())
+    assert before_last < streamed.index(f"(line {len(lines) - 1} ".encode())
+
+
+class FakePool:
+    created: List["FakePool"] = []
+
+    def __init__(self, **kwargs: Any) -> None:
+        FakePool.created.append(self)
+        self.stopped = False
+
+    def shutdown(self, cancel_futures: bool = False) -> None:
+        self.stopped = True
+
+
+def test_pdf_pool_is_created_once_and_shut_down(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    FakePool.created = []
+    monkeypatch.setattr(pdf_service, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(pdf_service, "_pdf_pool", None)
+    barrier = threading.Barrier(8)
+    pools: List[Any] = []
+
+    def get_pool() -> None:
+        barrier.wait()
+        pools.append(pdf_service._get_pdf_pool())
+
+    threads = [threading.Thread(target=get_pool) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(FakePool.created) == 1
+    assert all(pool is FakePool.created[0] for pool in pools)
+    shutdown_pdf_pool()
+    assert FakePool.created[0].stopped
+    assert pdf_service._pdf_pool is None
+    # Nothing to stop when no PDF was rendered
+    shutdown_pdf_pool()
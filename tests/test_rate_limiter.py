@@ -0,0 +1,147 @@
+import asyncio
+import os
+import random
+import sqlite3
+
+import pytest
+
+from app.services.rate_limiter import (
+    SharedRateLimiter,
+    TokenBucketLimiter,
+    backoff_delay,
+    parse_duration,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_requests_per_minute_budget() -> None:
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(
+        requests_per_minute=2, tokens_per_minute=10_000, clock=clock
+    )
+
+    assert limiter.try_acquire(10) == 0
+    assert limiter.try_acquire(10) == 0
+    assert limiter.try_acquire(10) == 30.0
+
+    clock.now = 30.0
+    assert limiter.try_acquire(10) == 0
+
+
+def test_tokens_per_minute_budget() -> None:
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(
+        requests_per_minute=100, tokens_per_minute=6000, clock=clock
+    )
+
+    assert limiter.try_acquire(5000) == 0
+    assert limiter.try_acquire(2000) == 10.0
+
+    clock.now = 10.0
+    assert limiter.try_acquire(2000) == 0
+
+
+def test_oversized_request_waits_for_full_bucket() -> None:
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(
+        requests_per_minute=100, tokens_per_minute=1000, clock=clock
+    )
+
+    assert limiter.try_acquire(5000) == 0
+    assert limiter.try_acquire(5000) == 60.0
+
+
+def test_parse_duration() -> None:
+    assert parse_duration("7.66s") == 7.66
+    assert parse_duration("2m59.56s") == 179.56
+    assert parse_duration("120ms") == 0.12
+    assert parse_duration("30") == 30.0
+    assert parse_duration(None) is None
+    assert parse_duration("") is None
+
+
+def test_backoff_delay_grows_with_jitter() -> None:
+    random.seed(0)
+    for attempt in range(6):
+        delay = backoff_delay(attempt, base=2.0, cap=30.0)
+        full = min(30.0, 2.0 * 2**attempt)
+        assert full / 2 <= delay <= full
+
+
+def test_headers_lower_the_budget() -> None:
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(
+        requests_per_minute=100, tokens_per_minute=6000, clock=clock
+    )
+
+    limiter.observe({"x-ratelimit-remaining-tokens": "600"})
+    assert limiter.try_acquire(1200) == 6.0
+
+    limiter.observe(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1m"}
+    )
+    assert limiter.try_acquire(10) == 60.0
+
+
+def test_penalize_pauses_callers() -> None:
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(
+        requests_per_minute=100, tokens_per_minute=6000, clock=clock
+    )
+
+    limiter.penalize(5.0)
+    assert limiter.try_acquire(10) == 5.0
+
+    clock.now = 5.0
+    assert limiter.try_acquire(10) == 0
+
+
+def test_shared_limiter_budget_spans_instances(tmp_path: str) -> None:
+    path = os.path.join(str(tmp_path), "ratelimit.sqlite3")
+    # Two instances on one file stand for two worker processes
+    first = SharedRateLimiter(path, requests_per_minute=2, tokens_per_minute=10_000)
+    second = SharedRateLimiter(path, requests_per_minute=2, tokens_per_minute=10_000)
+
+    assert first.try_acquire(10) == 0
+    assert second.try_acquire(10) == 0
+    assert first.try_acquire(10) > 0
+
+    second.penalize(60.0)
+    assert first.try_acquire(10) > 30.0
+
+
+@pytest.mark.asyncio
+async def test_shared_limiter_waits_for_the_lock_off_the_event_loop(
+    tmp_path: str,
+) -> None:
+    path = os.path.join(str(tmp_path), "ratelimit.sqlite3")
+    limiter = SharedRateLimiter(path, requests_per_minute=10, tokens_per_minute=10_000)
+    # Another worker process holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    acquire = asyncio.create_task(limiter.aacquire(10))
+    await asyncio.sleep(0.3)
+    assert not acquire.done()
+    # The loop kept running while the limiter waited for the lock
+    assert ticks >= 10
+
+    other.execute("COMMIT")
+    other.close()
+    await asyncio.wait_for(acquire, 5)
+    ticker.cancel()
@@ -0,0 +1,212 @@
+from typing import Any, Optional
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import report_router
+from app.api.report_router import negotiate_format
+from app.services import artifact_service, report_service
+from app.services.artifact_service import REPORT_PDF, ArtifactStore
+from app.services.report_formats import parse_sections, to_html, to_markdown
+
+SUMMARY = """1. MEETING OVERVIEW
+Weekly sync on the release.
+
+2. KEY DISCUSSION POINTS
+1. [SPEAKER_00] raised the budget
+2. [SPEAKER_01] asked about tests
+
+3. DECISIONS MADE
+- Decision: ship on Friday - Proposed by SPEAKER_00
+
+4. ACTION ITEMS
+Action: write notes - Assigned to: SPEAKER_01 - Deadline: Monday
+
+5. NEXT STEPS
+Meet again next week."""
+
+
+def test_sections_follow_merge_prompt_structure() -> None:
+    sections = parse_sections(SUMMARY)
+
+    assert list(sections) == [
+        "overview",
+        "discussion",
+        "decisions",
+        "actions",
+        "next_steps",
+    ]
+    assert sections["overview"]["text"] == "Weekly sync on the release."
+    # Numbered items inside a section are not section headers
+    assert sections["discussion"]["items"] == [
+        "[SPEAKER_00] raised the budget",
+        "[SPEAKER_01] asked about tests",
+    ]
+    assert sections["decisions"]["items"] == [
+        "Decision: ship on Friday - Proposed by SPEAKER_00"
+    ]
+
+
+def test_translated_headers_are_recognised() -> None:
+    summary = (
+        "**1. APERÇU DE LA RÉUNION**\nPoint hebdomadaire.\n## 2. POINTS CLÉS\n- Budget"
+    )
+
+    sections = parse_sections(summary)
+
+    assert sections["overview"] == {
+        "title": "APERÇU DE LA RÉUNION",
+        "text": "Point hebdomadaire.",
+        "items": ["Point hebdomadaire."],
+    }
+    assert sections["discussion"]["items"] == ["Budget"]
+
+
+def test_unstructured_summary_is_kept_whole() -> None:
+    assert parse_sections("Short meeting.\n1. nothing decided") == {
+        "preamble": "Short meeting.\n1. nothing decided"
+    }
+
+
+def test_text_renderings() -> None:
+    result = {
+        "summary": SUMMARY.replace("release", "<release>"),
+        "participants": ["SPEAKER_00"],
+    }
+
+    markdown = to_markdown(result)
+    page = to_html(result)
+
+    assert "## 4. ACTION ITEMS\n\n- Action: write notes" in markdown
+    assert "&lt;release&gt;" in page and "<release>" not in page
+    assert '<section id="decisions">' in page
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, "json"),
+        ("text/html", "html"),
+        ("text/markdown;q=0.5, application/pdf", "pdf"),
+        ("application/pdf;q=0.2, text/html;q=0.8", "html"),
+        # Equal quality: the first one listed
+        ("text/html, text/markdown", "html"),
+        ("text/*", "markdown"),
+        ("image/png, */*;q=0.1", "json"),
+        ("application/*", "json"),
+        # Unusable types and q=0 are skipped
+        ("image/png, text/html;q=0, text/markdown;q=0.3", "markdown"),
+        ("text/html;q=oops, application/pdf;q=0.1", "pdf"),
+    ],
+)
+def test_format_is_negotiated_from_accept(accept: Optional[str], expected: str) -> None:
+    assert negotiate_format(accept, None) == expected
+
+
+def test_format_parameter_wins_over_accept() -> None:
+    assert negotiate_format("application/pdf", "MD") == "markdown"
+    assert negotiate_format(None, "html") == "html"
+    with pytest.raises(HTTPException) as error:
+        negotiate_format(None, "docx")
+    assert error.value.status_code == 400
+
+
+def test_unservable_accept_is_not_acceptable() -> None:
+    for accept in ("image/png", "text/html;q=0", "application/xml"):
+        with pytest.raises(HTTPException) as error:
+            negotiate_format(accept, None)
+        assert error.value.status_code == 406
+
+
+@pytest.fixture
+def store(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> ArtifactStore:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60)
+    monkeypatch.setattr(artifact_service, "_artifact_store", store)
+    return store
+
+
+@pytest.fixture
+def client(store: ArtifactStore) -> TestClient:
+    app = FastAPI()
+    app.include_router(report_router.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def report_id(store: ArtifactStore) -> str:
+    report_id, _ = store.create()
+    store.save_data(
+        report_id,
+        {
+            "summary": SUMMARY,
+            "transcript": ["[SPEAKER_00] Hello"],
+            "participants": ["SPEAKER_00", "SPEAKER_01"],
+            "language": "fr",
+        },
+    )
+    return report_id
+
+
+def test_stored_report_as_json(client: TestClient, report_id: str) -> None:
+    response = client.get(f"/report/reports/{report_id}")
+
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept"
+    body = response.json()
+    assert body["report_id"] == report_id
+    assert body["language"] == "fr"
+    assert body["participants"] == ["SPEAKER_00", "SPEAKER_01"]
+    assert body["sections"]["overview"]["text"] == "Weekly sync on the release."
+    assert body["pdf_url"] == f"/report/files/{report_id}/report.pdf"
+
+
+def test_stored_report_in_text_formats(client: TestClient, report_id: str) -> None:
+    url = f"/report/reports/{report_id}"
+
+    markdown = client.get(url, headers={"Accept": "text/markdown"})
+    page = client.get(url, params={"format": "html"})
+
+    assert markdown.headers["content-type"] == "text/markdown; charset=utf-8"
+    assert markdown.text.startswith("# Meeting report")
+    assert page.headers["content-type"] == "text/html; charset=utf-8"
+    assert '<html lang="fr">' in page.text
+    assert markdown.headers["vary"] == page.headers["vary"] == "Accept"
+
+
+def test_stored_report_as_pdf(
+    client: TestClient,
+    report_id: str,
+    store: ArtifactStore,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        report_service,
+        "render_report_pdfs",
+        lambda summary, transcript, participants, documents: (b"%PDF summary",),
+    )
+    url = f"/report/reports/{report_id}"
+
+    response = client.get(url, headers={"Accept": "application/pdf"})
+
+    # Rendered on the first request, then served like a download
+    assert response.status_code == 200
+    assert response.content == b"%PDF summary"
+    assert response.headers["vary"] == "Accept"
+    assert store.path(report_id, REPORT_PDF) is not None
+    etag = response.headers["etag"]
+    cached = client.get(
+        url, headers={"Accept": "application/pdf", "If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.headers["vary"] == "Accept"
+
+
+def test_unknown_report_and_unacceptable_type(
+    client: TestClient, report_id: str
+) -> None:
+    assert client.get("/report/reports/missing").status_code == 404
+    response = client.get(
+        f"/report/reports/{report_id}", headers={"Accept": "image/png"}
+    )
+    assert response.status_code == 406
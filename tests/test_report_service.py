@@ -0,0 +1,300 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+from app.services import artifact_service, report_service
+from app.services.artifact_service import REPORT_PDF, ArtifactStore
+from app.services.summarizer_service import RETRIES_ERROR, SummaryError
+from app.utils.disk_cache import DiskCache
+
+# About 1750 tokens: two turns never share a 3000-token chunk
+FILLER = " ".join(["word"] * 1400)
+
+
+@pytest.fixture
+def pipeline(monkeypatch: pytest.MonkeyPatch) -> Dict[str, Any]:
+    """Fake speech models: four segments of alternating speakers."""
+    state: Dict[str, Any] = {
+        "diarized": threading.Event(),
+        "first_summary": threading.Event(),
+        "waited": None,
+        "events": [],
+    }
+    turns = [
+        {"start": float(i), "end": float(i + 1), "speaker": f"SPEAKER_0{i % 2}"}
+        for i in range(4)
+    ]
+
+    def diarize(audio_path: str) -> List[Dict[str, Any]]:
+        state["diarized"].set()
+        return turns
+
+    def segments() -> Iterator[Dict[str, Any]]:
+        state["diarized"].wait(5)
+        for i in range(4):
+            if i == 3:
+                # The first chunk is summarized while the audio is still decoded
+                state["waited"] = state["first_summary"].wait(5)
+            state["events"].append(f"segment {i}")
+            yield {"start": i + 0.1, "end": i + 0.9, "text": f"part{i} {FILLER}"}
+        state["events"].append("transcription done")
+
+    def stream_transcription(audio_path: str) -> Tuple[Any, str, float]:
+        return segments(), "en", 1.0
+
+    def llama_summarize(prompt: str, **kwargs: Any) -> str:
+        part = next(p for p in ("part0", "part1", "part2", "part3") if p in prompt)
+        state["events"].append(f"summarize {part}")
+        if part == "part0":
+            state["first_summary"].set()
+            # Finishes last: the summaries must keep the chunk order anyway
+            time.sleep(0.2)
+        return f"summary of {part}"
+
+    monkeypatch.setattr(report_service, "diarize", diarize)
+    monkeypatch.setattr(report_service, "stream_transcription", stream_transcription)
+    monkeypatch.setattr(report_service, "llama_summarize", llama_summarize)
+    monkeypatch.setattr(report_service.settings, "SUMMARY_CONCURRENCY", 4)
+    return state
+
+
+def test_chunks_are_summarized_while_transcribing(pipeline: Dict[str, Any]) -> None:
+    progress: List[Tuple[str, Any]] = []
+
+    def record(stage: str, done: Any = None, total: Any = None, **details: Any) -> None:
+        progress.append((stage, details.get("summary")))
+
+    whisper_segments, speakers, language, transcript, summaries = (
+        report_service.stream_transcript_and_summaries("meeting.wav", progress=record)
+    )
+
+    assert pipeline["waited"] is True
+    events = pipeline["events"]
+    assert events.index("summarize part0") < events.index("segment 3")
+    assert events.index("summarize part0") < events.index("transcription done")
+
+    assert summaries == [f"summary of part{i}" for i in range(4)]
+    assert language == "en"
+    assert len(whisper_segments) == 4
+    assert [line.split()[0] for line in transcript] == [
+        "[SPEAKER_00]",
+        "[SPEAKER_01]",
+        "[SPEAKER_00]",
+        "[SPEAKER_01]",
+    ]
+    # Summaries are reported as they complete, part0 last
+    reported = [summary for stage, summary in progress if stage == "summarization"]
+    assert sorted(reported) == summaries
+    assert reported[-1] == "summary of part0"
+
+
+def test_iter_chunks_yields_each_chunk_when_full() -> None:
+    consumed: List[int] = []
+
+    def lines() -> Iterator[str]:
+        for i in range(3):
+            consumed.append(i)
+            yield f"[SPEAKER_0{i % 2}] part{i} {FILLER}"
+
+    chunks = report_service.iter_chunks(lines(), max_tokens=3000)
+
+    # The third line closes the second turn, which no longer fits the first chunk
+    assert next(chunks).startswith("[SPEAKER_00] part0")
+    assert consumed == [0, 1, 2]
+    assert [chunk[:18] for chunk in chunks] == [
+        "[SPEAKER_01] part1",
+        "[SPEAKER_00] part2",
+    ]
+
+
+def merged_parts(prompt: str) -> List[str]:
+    """The partial summaries of a merge prompt."""
+    return re.findall(
+        r"--- Partie \d+ ---\n(.*?)(?=\n\n--- Partie|\n\nCreate ONE)", prompt, re.S
+    )
+
+
+@pytest.fixture
+def merges(monkeypatch: pytest.MonkeyPatch) -> List[List[str]]:
+    """Stubbed merge calls: "(a+b)" for parts a and b, failing on "bad"."""
+    calls: List[List[str]] = []
+    lock = threading.Lock()
+
+    def llama_summarize(prompt: str, **kwargs: Any) -> str:
+        parts = merged_parts(prompt)
+        with lock:
+            calls.append(parts)
+        if "bad" in parts:
+            return RETRIES_ERROR
+        return "(" + "+".join(parts) + ")"
+
+    monkeypatch.setattr(report_service, "llama_summarize", llama_summarize)
+    monkeypatch.setattr(report_service.settings, "CHUNK_MAX_TOKENS", 3000)
+    return calls
+
+
+def test_group_summaries_respects_fan_in_and_token_budget() -> None:
+    summaries = [f"s{i}" for i in range(7)]
+    assert report_service.group_summaries(summaries, fan_in=3, max_tokens=3000) == [
+        ["s0", "s1", "s2"],
+        ["s3", "s4", "s5"],
+        ["s6"],
+    ]
+
+    long = "x" * 400  # 101 tokens
+    groups = report_service.group_summaries([long] * 5, fan_in=6, max_tokens=250)
+    assert [len(group) for group in groups] == [2, 2, 1]
+    # A group always takes two summaries, even over the budget
+    assert [len(g) for g in report_service.group_summaries([long] * 3, 6, 50)] == [2, 1]
+
+
+def test_reduce_summaries_builds_a_tree_in_order(merges: List[List[str]]) -> None:
+    summaries = [f"s{i}" for i in range(9)]
+
+    group = report_service.reduce_summaries(summaries, [], "en", fan_in=2)
+
+    # Level 1: 5 groups (s8 alone), level 2: 3 groups, level 3: 2 groups
+    assert group == ["(((s0+s1)+(s2+s3))+((s4+s5)+(s6+s7)))", "s8"]
+    assert len(merges) == 4 + 2 + 1
+
+
+def test_reduce_summaries_returns_small_input_unmerged(
+    merges: List[List[str]],
+) -> None:
+    assert report_service.reduce_summaries(["a", "b", "c"], [], "en", fan_in=6) == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert merges == []
+
+
+def test_failed_merge_skips_its_group(merges: List[List[str]]) -> None:
+    summaries = ["a", "b", "bad", "c", "d", "e"]
+
+    group = report_service.reduce_summaries(summaries, [], "en", fan_in=2)
+
+    # The failure message never reaches the next level
+    assert group == ["(a+b)", "(d+e)"]
+    assert RETRIES_ERROR not in "".join(group)
+    assert ["bad", "c"] in merges
+
+
+def test_every_failed_merge_raises(merges: List[List[str]]) -> None:
+    with pytest.raises(SummaryError):
+        report_service.reduce_summaries(["bad", "a", "bad", "b"], [], "en", 2)
+    # The final merge fails too
+    with pytest.raises(SummaryError):
+        report_service.merge_summaries(["bad", "a"], [], "en")
+
+
+def test_failed_chunk_summary_is_dropped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(report_service, "llama_summarize", lambda prompt: "summary")
+    assert report_service.summarize_chunk(1, "chunk", [], "en") == "summary"
+
+    monkeypatch.setattr(report_service, "llama_summarize", lambda prompt: RETRIES_ERROR)
+    assert report_service.summarize_chunk(1, "chunk", [], "en") is None
+
+
+def test_keys_reuse_a_computed_content_hash(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    audio = tmp_path / "meeting.wav"
+    audio.write_bytes(b"RIFF")
+    content_hash = report_service.audio_hash(str(audio))
+    transcript_key = report_service.transcript_cache_key(str(audio))
+    key = report_service.report_key(str(audio))
+
+    def rehash(path: str) -> str:
+        raise AssertionError("the audio is hashed again")
+
+    monkeypatch.setattr(report_service, "audio_hash", rehash)
+    assert report_service.report_key(str(audio), content_hash) == key
+    assert report_service.transcript_cache_key(str(audio), content_hash) == (
+        transcript_key
+    )
+    assert key != transcript_key
+
+
+def test_cached_transcript_skips_the_speech_models(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    audio = tmp_path / "meeting.wav"
+    audio.write_bytes(b"RIFF\x00\x00\x00\x00WAVEfmt ")
+    calls: List[str] = []
+
+    def transcribe_and_diarize(
+        wav_path: str, progress: Any = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], str, float]:
+        calls.append(wav_path)
+        whisper_segments = [{"start": 0.0, "end": 2.0, "text": "hello"}]
+        speaker_segments = [{"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00"}]
+        return whisper_segments, speaker_segments, "en", 2.0
+
+    monkeypatch.setattr(
+        report_service, "transcribe_and_diarize", transcribe_and_diarize
+    )
+    monkeypatch.setattr(report_service, "llama_summarize", lambda prompt: "summary")
+    monkeypatch.setattr(report_service.settings, "TRANSCRIPT_CACHE_ENABLED", True)
+    monkeypatch.setattr(
+        report_service,
+        "_transcript_cache",
+        DiskCache(str(tmp_path / "cache"), max_entries=10, max_bytes=100_000),
+    )
+
+    first = report_service.prepare_report(str(audio), streaming=False)
+    second = report_service.prepare_report(str(audio), streaming=False)
+
+    assert len(calls) == 1
+    assert first == second
+    assert first["transcript"] == ["[SPEAKER_00] hello"]
+
+    # Another model gives another transcript: the entry no longer applies
+    monkeypatch.setattr(report_service.settings, "WHISPER_MODEL", "tiny-test")
+    report_service.prepare_report(str(audio), streaming=False)
+
+    assert len(calls) == 2
+
+
+def test_report_pdf_is_rendered_once(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = ArtifactStore(str(tmp_path), ttl_seconds=60)
+    monkeypatch.setattr(artifact_service, "_artifact_store", store)
+    monkeypatch.setattr(report_service.settings, "REPORT_EAGER_PDF", False)
+    rendered: List[List[str]] = []
+
+    def render_report_pdfs(
+        summary: str, transcript: List[str], participants: List[str], documents: Any
+    ) -> Tuple[bytes, ...]:
+        rendered.append(documents)
+        time.sleep(0.1)
+        return tuple(b"%PDF " + name.encode() for name in documents)
+
+    monkeypatch.setattr(report_service, "render_report_pdfs", render_report_pdfs)
+    stored = report_service.save_report("summary", ["[A] hi"], ["A"], "en")
+    report_id = stored["report_id"]
+    assert stored["pdf_path"] is None
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        paths = list(
+            pool.map(
+                lambda _: report_service.ensure_report_pdf(report_id, REPORT_PDF),
+                range(4),
+            )
+        )
+
+    # Concurrent first downloads share one rendering
+    assert rendered == [["summary"]]
+    assert paths == [store.path(report_id, REPORT_PDF)] * 4
+    with open(paths[0], "rb") as f:
+        assert f.read() == b"%PDF summary"
+    assert report_service._report_locks == {}
+    # Unknown reports and files are not rendered
+    assert report_service.ensure_report_pdf("missing", REPORT_PDF) is None
+    assert report_service.ensure_report_pdf(report_id, "secret.pdf") is None
+    assert rendered == [["summary"]]
@@ -0,0 +1,85 @@
+import random
+from typing import Any, Dict, List
+
+from app.services.speaker_alignment import assign_speakers, iter_assign_speakers
+
+
+def brute_force(
+    whisper_segments: List[Dict[str, Any]], speaker_segments: List[Dict[str, Any]]
+) -> List[str]:
+    result = []
+    for ws in whisper_segments:
+        overlaps: Dict[str, float] = {}
+        for s in sorted(speaker_segments, key=lambda s: s["start"]):
+            overlap = min(ws["end"], s["end"]) - max(ws["start"], s["start"])
+            if overlap >= 0:
+                overlaps[s["speaker"]] = overlaps.get(s["speaker"], 0.0) + overlap
+        result.append(
+            max(overlaps, key=overlaps.__getitem__) if overlaps else "Unknown"
+        )
+    return result
+
+
+def test_picks_speaker_with_largest_overlap() -> None:
+    whisper_segments = [{"start": 0.0, "end": 10.0, "text": "hello"}]
+    speaker_segments = [
+        {"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00"},
+        {"start": 2.0, "end": 10.0, "speaker": "SPEAKER_01"},
+    ]
+
+    assert assign_speakers(whisper_segments, speaker_segments) == ["SPEAKER_01"]
+
+
+def test_unknown_when_no_turn_overlaps() -> None:
+    whisper_segments = [{"start": 20.0, "end": 21.0, "text": "hello"}]
+    speaker_segments = [{"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00"}]
+
+    assert assign_speakers(whisper_segments, speaker_segments) == ["Unknown"]
+
+
+def test_keeps_input_order_for_unsorted_segments() -> None:
+    whisper_segments = [
+        {"start": 5.0, "end": 6.0, "text": "b"},
+        {"start": 0.0, "end": 1.0, "text": "a"},
+    ]
+    speaker_segments = [
+        {"start": 4.0, "end": 7.0, "speaker": "SPEAKER_01"},
+        {"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00"},
+    ]
+
+    assert assign_speakers(whisper_segments, speaker_segments) == [
+        "SPEAKER_01",
+        "SPEAKER_00",
+    ]
+
+
+def test_streaming_sweep_yields_segments_lazily() -> None:
+    segments = iter([{"start": 0.0, "end": 1.0, "text": "a"}])
+    pairs = list(
+        iter_assign_speakers(segments, [{"start": 0.0, "end": 1.0, "speaker": "S"}])
+    )
+
+    assert pairs == [({"start": 0.0, "end": 1.0, "text": "a"}, "S")]
+
+
+def test_matches_brute_force_with_overlapping_speech() -> None:
+    rng = random.Random(42)
+    whisper_segments, speaker_segments = [], []
+    t = 0.0
+    for _ in range(300):
+        duration = rng.uniform(0.5, 5.0)
+        whisper_segments.append({"start": t, "end": t + duration, "text": "x"})
+        t += duration + rng.uniform(0.0, 1.0)
+    for _ in range(200):
+        start = rng.uniform(0.0, t)
+        speaker_segments.append(
+            {
+                "start": start,
+                "end": start + rng.uniform(0.5, 8.0),
+                "speaker": f"SPEAKER_{rng.randrange(4):02d}",
+            }
+        )
+
+    assert assign_speakers(whisper_segments, speaker_segments) == brute_force(
+        whisper_segments, speaker_segments
+    )
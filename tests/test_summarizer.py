@@ -0,0 +1,329 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Generator, List, Set, cast
+
+import pytest
+
+from app.services import report_service, summarizer_service
+from app.services.rate_limiter import TokenBucketLimiter
+from app.services.summarizer_service import SummaryError
+from app.utils.disk_cache import DiskCache
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = cast(StandInServer, self.server)
+        server.requests.append(body)
+        server.client_ports.add(self.client_address[1])
+        if server.rate_limited:
+            server.rate_limited -= 1
+            self.send_response(429)
+            self.send_header("retry-after", "0.2")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        prompt = body["messages"][-1]["content"]
+        if body.get("stream"):
+            self._send_stream(f"summary of {prompt}", drop="drop" in prompt)
+            return
+        data = json.dumps(
+            {
+                "choices": [
+                    {
+                        "message": {
+                            "role": "assistant",
+                            "content": f"summary of {prompt}",
+                        }
+                    }
+                ]
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("x-ratelimit-remaining-tokens", "500")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content: str, drop: bool = False) -> None:
+        events = [
+            {"choices": [{"delta": {"content": word}}]}
+            for word in content.split(" ")[:1]
+            + [" " + word for word in content.split(" ")[1:]]
+        ]
+        data = "".join(f"data: {json.dumps(e)}\n\n" for e in events)
+        data += "data: [DONE]\n\n"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(data.encode())))
+        self.end_headers()
+        if drop:
+            # The connection breaks after the first two pieces
+            self.wfile.write(
+                "".join(f"data: {json.dumps(e)}\n\n" for e in events[:2]).encode()
+            )
+            self.wfile.flush()
+            time.sleep(0.1)
+            self.close_connection = True
+            return
+        self.wfile.write(data.encode())
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Stand-in Groq API recording the requests it receives."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requests: List[Dict[str, Any]] = []
+        self.client_ports: Set[int] = set()
+        # Number of upcoming requests answered with a 429
+        self.rate_limited = 0
+
+
+@pytest.fixture
+def stand_in_server(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: str
+) -> Generator[StandInServer, None, None]:
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        summarizer_service,
+        "GROQ_URL",
+        f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions",
+    )
+    monkeypatch.setattr(summarizer_service, "GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(
+        summarizer_service,
+        "_response_cache",
+        DiskCache(str(tmp_path), max_entries=100, max_bytes=1_000_000),
+    )
+    monkeypatch.setattr(
+        summarizer_service,
+        "_rate_limiter",
+        TokenBucketLimiter(requests_per_minute=1000, tokens_per_minute=1_000_000),
+    )
+    yield server
+    server.shutdown()
+
+
+def test_llama_summarize_reuses_pooled_connection(stand_in_server: Any) -> None:
+    summarizer_service._client = None
+
+    results = [summarizer_service.llama_summarize(f"chunk {i}") for i in range(3)]
+
+    assert results == [f"summary of chunk {i}" for i in range(3)]
+    assert (
+        stand_in_server.requests[0]["model"] == summarizer_service.settings.GROQ_MODEL
+    )
+    # Keep-alive: the three calls went through a single TCP connection
+    assert len(stand_in_server.client_ports) == 1
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+@pytest.mark.asyncio
+async def test_allama_summarize(stand_in_server: Any) -> None:
+    summarizer_service._async_client = None
+
+    result = await summarizer_service.allama_summarize("chunk")
+
+    assert result == "summary of chunk"
+    await summarizer_service.close_http_clients()
+
+
+def test_identical_prompt_is_served_from_cache(stand_in_server: Any) -> None:
+    summarizer_service._client = None
+
+    first = summarizer_service.llama_summarize("same chunk")
+    second = summarizer_service.llama_summarize("same chunk")
+
+    assert first == second == "summary of same chunk"
+    assert len(stand_in_server.requests) == 1
+    stats = summarizer_service.get_response_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+def test_rate_limited_call_waits_for_retry_after(
+    stand_in_server: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    summarizer_service._client = None
+    monkeypatch.setattr(summarizer_service, "backoff_delay", lambda attempt: 0.0)
+    stand_in_server.rate_limited = 1
+    # The clock stops once the success is observed, so the budget does not
+    # refill before it is checked
+    frozen: List[float] = []
+    limiter = TokenBucketLimiter(
+        requests_per_minute=1000,
+        tokens_per_minute=1_000_000,
+        clock=lambda: frozen[0] if frozen else time.monotonic(),
+    )
+    observe = limiter.observe
+
+    def observe_and_freeze(headers: Any) -> None:
+        observe(headers)
+        if "x-ratelimit-remaining-tokens" in headers:
+            frozen.append(time.monotonic())
+
+    monkeypatch.setattr(limiter, "observe", observe_and_freeze)
+    monkeypatch.setattr(summarizer_service, "_rate_limiter", limiter)
+
+    result = summarizer_service.llama_summarize("chunk")
+
+    assert result == "summary of chunk"
+    assert len(stand_in_server.requests) == 2
+    # The remaining-tokens header of the success lowered the local budget
+    assert limiter.try_acquire(600) > 0
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+def test_llama_summarize_stream_yields_pieces(stand_in_server: Any) -> None:
+    summarizer_service._client = None
+
+    pieces = list(summarizer_service.llama_summarize_stream("chunk one"))
+
+    assert pieces == ["summary", " of", " chunk", " one"]
+    assert stand_in_server.requests[0]["stream"] is True
+    # The assembled completion is cached like a regular one
+    assert summarizer_service.llama_summarize("chunk one") == "summary of chunk one"
+    assert len(stand_in_server.requests) == 1
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+@pytest.mark.asyncio
+async def test_allama_summarize_stream(stand_in_server: Any) -> None:
+    summarizer_service._async_client = None
+
+    pieces = [p async for p in summarizer_service.allama_summarize_stream("chunk")]
+
+    assert "".join(pieces) == "summary of chunk"
+    assert len(pieces) == 3
+    await summarizer_service.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_async_calls_use_the_cache_off_the_event_loop(
+    stand_in_server: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    summarizer_service._async_client = None
+    cache = summarizer_service.get_response_cache()
+    threads: List[str] = []
+    get, put = cache.get, cache.put
+
+    def recording_get(key: str) -> Any:
+        threads.append(threading.current_thread().name)
+        return get(key)
+
+    def recording_put(key: str, value: Dict[str, Any]) -> None:
+        threads.append(threading.current_thread().name)
+        put(key, value)
+
+    monkeypatch.setattr(cache, "get", recording_get)
+    monkeypatch.setattr(cache, "put", recording_put)
+
+    pieces = [p async for p in summarizer_service.allama_summarize_stream("chunk")]
+    cached = await summarizer_service.allama_summarize("chunk")
+
+    assert "".join(pieces) == cached == "summary of chunk"
+    assert len(stand_in_server.requests) == 1
+    # get and put of the stream, get served from the cache
+    assert len(threads) == 3
+    assert threading.current_thread().name not in threads
+    await summarizer_service.close_http_clients()
+
+
+def test_interrupted_stream_raises_after_its_pieces(stand_in_server: Any) -> None:
+    summarizer_service._client = None
+    pieces: List[str] = []
+
+    with pytest.raises(SummaryError):
+        for piece in summarizer_service.llama_summarize_stream("drop"):
+            pieces.append(piece)
+
+    assert pieces == ["summary", " of"]
+    # Neither retried (pieces were already sent) nor cached
+    assert len(stand_in_server.requests) == 1
+    assert summarizer_service.llama_summarize("drop") == "summary of drop"
+    assert len(stand_in_server.requests) == 2
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+@pytest.mark.asyncio
+async def test_interrupted_async_stream_raises(stand_in_server: Any) -> None:
+    summarizer_service._async_client = None
+    pieces: List[str] = []
+
+    with pytest.raises(SummaryError):
+        async for piece in summarizer_service.allama_summarize_stream("drop"):
+            pieces.append(piece)
+
+    assert pieces == ["summary", " of"]
+    await summarizer_service.close_http_clients()
+
+
+def test_interrupted_final_summary_is_not_stored(
+    stand_in_server: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    summarizer_service._client = None
+    saved: List[Any] = []
+    monkeypatch.setattr(report_service, "save_report", lambda *args: saved.append(args))
+    prepared = {
+        "summaries": ["drop"],
+        "participants": ["SPEAKER_00"],
+        "language": "en",
+        "transcript": ["[SPEAKER_00] hello"],
+    }
+
+    stream = report_service.stream_report_summary(prepared, "0" * 32)
+    assert next(stream) == "summary"
+    with pytest.raises(SummaryError):
+        list(stream)
+
+    assert saved == []
+    summarizer_service.get_http_client().close()
+    summarizer_service._client = None
+
+
+def test_failed_stream_yields_no_error_text(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(summarizer_service, "GROQ_API_KEY", "")
+
+    with pytest.raises(SummaryError):
+        list(summarizer_service.llama_summarize_stream("chunk"))
+
+
+def test_summary_concurrency_follows_token_budget(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    settings = summarizer_service.settings
+    monkeypatch.setattr(settings, "SUMMARY_CONCURRENCY", 0)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 3000)
+    monkeypatch.setattr(settings, "GROQ_REQUESTS_PER_MINUTE", 30)
+    monkeypatch.setattr(settings, "GROQ_MAX_CONNECTIONS", 10)
+
+    # Free tier: one chunk call fits in a minute of tokens
+    monkeypatch.setattr(settings, "GROQ_TOKENS_PER_MINUTE", 6000)
+    assert summarizer_service.summary_concurrency() == 1
+    monkeypatch.setattr(settings, "GROQ_TOKENS_PER_MINUTE", 24000)
+    assert summarizer_service.summary_concurrency() == 5
+    # Never more calls than pooled connections
+    monkeypatch.setattr(settings, "GROQ_TOKENS_PER_MINUTE", 1_000_000)
+    assert summarizer_service.summary_concurrency() == 10
+    # An explicit setting wins
+    monkeypatch.setattr(settings, "SUMMARY_CONCURRENCY", 3)
+    assert summarizer_service.summary_concurrency() == 3
@@ -0,0 +1,206 @@
+import os
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import report_router
+from app.services import upload_service
+from app.services.upload_service import (
+    UploadConflictError,
+    UploadNotFoundError,
+    UploadRangeError,
+    UploadSessionStore,
+    UploadTooLargeError,
+    parse_content_range,
+)
+
+
+@pytest.fixture
+def store(tmp_path: Any) -> UploadSessionStore:
+    return UploadSessionStore(str(tmp_path), max_bytes=1000, ttl_seconds=60)
+
+
+def test_parse_content_range() -> None:
+    assert parse_content_range("bytes 0-99/1000") == (0, 99, 1000)
+    assert parse_content_range("bytes 100-199/*") == (100, 199, None)
+    with pytest.raises(ValueError):
+        parse_content_range("bytes 10-5/100")
+    with pytest.raises(ValueError):
+        parse_content_range("items 0-1/2")
+    with pytest.raises(ValueError):
+        parse_content_range("bytes 0-100/100")
+
+
+def test_ranges_are_appended_and_finalized(
+    store: UploadSessionStore, tmp_path: Any
+) -> None:
+    session = store.create(size=10)
+
+    with store.writer(session["upload_id"], 0) as write:
+        write(b"01234")
+    with store.writer(session["upload_id"], 5, total=10) as write:
+        write(b"56")
+        write(b"789")
+    destination = str(tmp_path / "meeting.wav")
+    store.finalize(session["upload_id"], destination)
+
+    with open(destination, "rb") as f:
+        assert f.read() == b"0123456789"
+    with pytest.raises(UploadNotFoundError):
+        store.status(session["upload_id"])
+
+
+def test_interrupted_range_resumes_from_offset(store: UploadSessionStore) -> None:
+    upload_id = store.create(size=10)["upload_id"]
+
+    with pytest.raises(ConnectionError):
+        with store.writer(upload_id, 0) as write:
+            write(b"0123")
+            raise ConnectionError("client went away")
+
+    assert store.status(upload_id)["offset"] == 4
+    with pytest.raises(UploadConflictError) as error:
+        with store.writer(upload_id, 0):
+            pass
+    assert error.value.offset == 4
+
+
+def test_one_writer_per_session(store: UploadSessionStore) -> None:
+    upload_id = store.create()["upload_id"]
+
+    with store.writer(upload_id, 0):
+        with pytest.raises(UploadConflictError):
+            with store.writer(upload_id, 0):
+                pass
+
+
+def test_size_limits(store: UploadSessionStore) -> None:
+    with pytest.raises(UploadTooLargeError):
+        store.create(size=2000)
+
+    upload_id = store.create(size=4)["upload_id"]
+    with pytest.raises(UploadTooLargeError):
+        with store.writer(upload_id, 0) as write:
+            write(b"12345")
+
+
+def test_incomplete_upload_cannot_be_finalized(
+    store: UploadSessionStore, tmp_path: Any
+) -> None:
+    upload_id = store.create(size=10)["upload_id"]
+    with store.writer(upload_id, 0) as write:
+        write(b"01234")
+
+    with pytest.raises(UploadConflictError):
+        store.finalize(upload_id, str(tmp_path / "meeting.wav"))
+
+
+def test_expired_sessions_are_pruned(tmp_path: Any) -> None:
+    store = UploadSessionStore(str(tmp_path), max_bytes=1000, ttl_seconds=-1)
+    upload_id = store.create()["upload_id"]
+
+    store.prune()
+
+    with pytest.raises(UploadNotFoundError):
+        store.status(upload_id)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_first_total_sent_becomes_the_size(
+    store: UploadSessionStore, tmp_path: Any
+) -> None:
+    upload_id = store.create()["upload_id"]
+    with store.writer(upload_id, 0) as write:
+        write(b"01234")
+    with store.writer(upload_id, 5, total=10) as write:
+        write(b"56")
+
+    assert store.status(upload_id)["size"] == 10
+    # A truncated upload is detected once the size is known
+    with pytest.raises(UploadConflictError):
+        store.finalize(upload_id, str(tmp_path / "meeting.wav"))
+    with pytest.raises(UploadConflictError):
+        with store.writer(upload_id, 7, total=12):
+            pass
+
+
+def test_upload_of_unknown_size_cannot_be_finalized(
+    store: UploadSessionStore, tmp_path: Any
+) -> None:
+    upload_id = store.create()["upload_id"]
+    with store.writer(upload_id, 0) as write:
+        write(b"01234")
+
+    with pytest.raises(UploadConflictError):
+        store.finalize(upload_id, str(tmp_path / "meeting.wav"))
+
+
+def test_range_being_written_is_not_finalized(
+    store: UploadSessionStore, tmp_path: Any
+) -> None:
+    upload_id = store.create(size=4)["upload_id"]
+    destination = str(tmp_path / "meeting.wav")
+
+    with store.writer(upload_id, 0) as write:
+        write(b"0123")
+        with pytest.raises(UploadConflictError):
+            store.finalize(upload_id, destination)
+    store.finalize(upload_id, destination)
+
+    # A range arriving after the move does not recreate the session
+    with pytest.raises(UploadNotFoundError):
+        with store.writer(upload_id, 4):
+            pass
+    assert sorted(os.listdir(str(tmp_path))) == ["meeting.wav"]
+
+
+@pytest.mark.parametrize("body", [b"012", b"01234"])
+def test_body_must_match_its_range(store: UploadSessionStore, body: bytes) -> None:
+    upload_id = store.create(size=10)["upload_id"]
+    with store.writer(upload_id, 0, end=1) as write:
+        write(b"01")
+
+    with pytest.raises(UploadRangeError):
+        with store.writer(upload_id, 2, end=5) as write:
+            write(body)
+
+    # Nothing of the rejected range is kept
+    assert store.status(upload_id)["offset"] == 2
+
+
+@pytest.fixture
+def client(store: UploadSessionStore, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    monkeypatch.setattr(upload_service, "_upload_store", store)
+    app = FastAPI()
+    app.include_router(report_router.router)
+    return TestClient(app)
+
+
+def test_put_range_checks_body_length(client: TestClient) -> None:
+    upload = client.post("/report/uploads").json()
+    url = f"/report/uploads/{upload['upload_id']}"
+
+    response = client.put(
+        url, content=b"0123", headers={"Content-Range": "bytes 0-4/*"}
+    )
+    assert response.status_code == 400
+    # Chunked body (no Content-Length) shorter than its range
+    response = client.put(
+        url, content=iter([b"01", b"23"]), headers={"Content-Range": "bytes 0-4/10"}
+    )
+    assert response.status_code == 400
+    assert client.get(url).json() == {
+        "upload_id": upload["upload_id"],
+        "offset": 0,
+        "size": None,
+    }
+
+    response = client.put(
+        url, content=b"01234", headers={"Content-Range": "bytes 0-4/10"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Upload-Offset"] == "5"
+    # The total of the range was recorded
+    assert response.json()["size"] == 10
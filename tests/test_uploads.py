@@ -0,0 +1,231 @@
+import os
+import tempfile
+from typing import Any, Dict, Iterator
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.api import uploads
+from app.api.uploads import (
+    MaxBodySizeMiddleware,
+    detect_audio_format,
+    receive_form,
+    receive_upload,
+    resolve_input_path,
+)
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+
+
+@pytest.mark.parametrize(
+    "header, suffix",
+    [
+        (WAV_HEADER, ".wav"),
+        (b"ID3\x04\x00\x00\x00\x00\x00\x00\x00\x00", ".mp3"),
+        (b"\xff\xfb\x90\x64\x00\x00\x00\x00\x00\x00\x00\x00", ".mp3"),
+        (b"\x00\x00\x00\x20ftypM4A ", ".m4a"),
+        (b"OggS\x00\x02\x00\x00\x00\x00\x00\x00", ".ogg"),
+        (b"fLaC\x00\x00\x00\x22\x00\x00\x00\x00", ".flac"),
+        (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81", ".webm"),
+        (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3", None),
+        (b"", None),
+    ],
+)
+def test_detect_audio_format(header: bytes, suffix: str) -> None:
+    assert detect_audio_format(header) == suffix
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        MaxBodySizeMiddleware,
+        max_bytes=64 * 1024,
+        route_limits={"/batch": 2 * 64 * 1024},
+    )
+
+    @app.post("/upload")
+    async def upload(request: Request) -> Dict[str, Any]:
+        path = await receive_upload(request, max_bytes=32 * 1024)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return {"suffix": os.path.splitext(path)[1], "size": len(data)}
+
+    @app.post("/batch")
+    async def batch(request: Request) -> Dict[str, Any]:
+        form = await receive_form(request, "files", max_files=3, max_bytes=60 * 1024)
+        sizes = [os.path.getsize(path) for path in form.paths("files")]
+        form.remove_files()
+        return {"sizes": sizes, "paths": form.values("paths")}
+
+    @app.post("/echo")
+    async def echo(request: Request) -> Dict[str, Any]:
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_upload_is_named_after_detected_format(client: TestClient) -> None:
+    body = WAV_HEADER + b"\x00" * 10_000
+
+    # The client-side name does not decide the decode path
+    response = client.post("/upload", files={"file": ("meeting.mp3", body)})
+
+    assert response.status_code == 200
+    assert response.json() == {"suffix": ".wav", "size": len(body)}
+
+
+def test_unknown_format_is_rejected(client: TestClient) -> None:
+    response = client.post("/upload", files={"file": ("notes.wav", b"plain text")})
+
+    assert response.status_code == 400
+
+
+def test_upload_over_limit_is_rejected(client: TestClient) -> None:
+    body = WAV_HEADER + b"\x00" * 40 * 1024
+
+    response = client.post("/upload", files={"file": ("meeting.wav", body)})
+
+    assert response.status_code == 413
+
+
+def test_body_over_limit_is_rejected_before_parsing(client: TestClient) -> None:
+    body = WAV_HEADER + b"\x00" * 100 * 1024
+
+    response = client.post("/upload", files={"file": ("meeting.wav", body)})
+
+    assert response.status_code == 413
+
+
+def test_batch_route_has_its_own_limit(client: TestClient) -> None:
+    body = WAV_HEADER + b"\x00" * 50 * 1024
+    two = [("files", (f"m{i}.wav", body)) for i in range(2)]
+
+    # Over the single-file limit of the other routes, within the batch one
+    response = client.post("/batch", files=two)
+
+    assert response.status_code == 200
+    assert response.json() == {"sizes": [len(body), len(body)], "paths": []}
+    three = [("files", (f"m{i}.wav", body)) for i in range(3)]
+    assert client.post("/batch", files=three).status_code == 413
+    # The same body is too large for the other routes
+    assert client.post("/echo", files=two).status_code == 413
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-1", "1e9"])
+def test_malformed_content_length_is_rejected(
+    client: TestClient, content_length: str
+) -> None:
+    response = client.post(
+        "/echo", content=b"data", headers={"Content-Length": content_length}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def temp_dir(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> Any:
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def test_upload_is_written_while_it_arrives(client: TestClient, temp_dir: Any) -> None:
+    body = WAV_HEADER + b"\x00" * 20_000
+
+    response = client.post("/upload", files={"file": ("meeting.wav", body)})
+
+    assert response.status_code == 200
+    assert response.json() == {"suffix": ".wav", "size": len(body)}
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_upload_without_file_field_is_rejected(
+    client: TestClient, temp_dir: Any
+) -> None:
+    response = client.post("/upload", files={"audio": ("meeting.wav", WAV_HEADER)})
+
+    assert response.status_code == 400
+    assert list(temp_dir.iterdir()) == []
+
+    response = client.post("/upload", content=WAV_HEADER)
+
+    assert response.status_code == 400
+
+
+def test_batch_form_fields_are_parsed(client: TestClient) -> None:
+    response = client.post(
+        "/batch",
+        data={"paths": ["a.wav", "b.wav"]},
+        files=[
+            ("files", ("one.wav", WAV_HEADER)),
+            # Browsers send an empty part when no file was picked
+            ("files", ("", b"")),
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"sizes": [len(WAV_HEADER)], "paths": ["a.wav", "b.wav"]}
+
+
+def test_batch_with_too_many_files_is_rejected(
+    client: TestClient, temp_dir: Any
+) -> None:
+    files = [("files", (f"{n}.wav", WAV_HEADER)) for n in range(4)]
+
+    response = client.post("/batch", files=files)
+
+    assert response.status_code == 400
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_oversized_file_removes_earlier_files(
+    client: TestClient, temp_dir: Any
+) -> None:
+    small = WAV_HEADER + b"\x00" * 1000
+    large = WAV_HEADER + b"\x00" * 61 * 1024
+
+    response = client.post(
+        "/batch",
+        files=[("files", ("one.wav", small)), ("files", ("two.wav", large))],
+    )
+
+    assert response.status_code == 413
+    assert list(temp_dir.iterdir()) == []
+
+
+def chunks(count: int, size: int = 16 * 1024) -> Iterator[bytes]:
+    for _ in range(count):
+        yield b"\x00" * size
+
+
+def test_chunked_body_is_counted_while_it_arrives(client: TestClient) -> None:
+    # A generator body is sent with chunked transfer, without Content-Length
+    response = client.post("/echo", content=chunks(3))
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 48 * 1024}
+
+    response = client.post("/echo", content=chunks(5))
+
+    assert response.status_code == 413
+
+
+def test_batch_paths_stay_in_input_directory(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    (inputs / "meeting.wav").write_bytes(WAV_HEADER)
+    (inputs / "notes.txt").write_bytes(b"not audio at all")
+    (tmp_path / "secret.wav").write_bytes(WAV_HEADER)
+    monkeypatch.setattr(uploads.settings, "BATCH_INPUT_DIR", str(inputs))
+
+    assert resolve_input_path("meeting.wav") == os.path.realpath(inputs / "meeting.wav")
+    with pytest.raises(HTTPException) as error:
+        resolve_input_path("../secret.wav")
+    assert error.value.status_code == 404
+    with pytest.raises(HTTPException) as error:
+        resolve_input_path("notes.txt")
+    assert error.value.status_code == 400
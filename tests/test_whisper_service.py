@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+from app.services import whisper_service
+
+SR = whisper_service.SAMPLING_RATE
+# Speech (seconds) with silences at 4-5, 9-11, 14-16 and 19-21
+SPEECH = [(0, 4), (5, 9), (11, 14), (16, 19), (21, 25)]
+
+
+@pytest.fixture
+def vad(monkeypatch: pytest.MonkeyPatch) -> None:
+    def get_speech_timestamps(audio: np.ndarray, options: Any) -> List[Dict[str, int]]:
+        return [{"start": start * SR, "end": end * SR} for start, end in SPEECH]
+
+    monkeypatch.setattr(whisper_service, "get_speech_timestamps", get_speech_timestamps)
+
+
+def test_split_on_silence_cuts_in_the_middle_of_silences(vad: None) -> None:
+    audio = np.zeros(26 * SR, dtype=np.float32)
+
+    pieces = whisper_service.split_on_silence(audio, piece_seconds=10)
+
+    assert pieces == [(0, 10 * SR), (10 * SR, 20 * SR), (20 * SR, 26 * SR)]
+
+
+def test_split_on_silence_keeps_short_audio_whole(vad: None) -> None:
+    audio = np.zeros(26 * SR, dtype=np.float32)
+
+    assert whisper_service.split_on_silence(audio, piece_seconds=60) == [(0, 26 * SR)]
+
+
+class FakeWhisper:
+    """One segment from 1 s to 2 s of every piece, tagged with its length."""
+
+    def transcribe(
+        self, audio: np.ndarray, language: Optional[str] = None
+    ) -> Tuple[Iterator[Any], Any]:
+        segment = SimpleNamespace(start=1.0, end=2.0, text=f" {len(audio) // SR}s ")
+        info = SimpleNamespace(language="fr", language_probability=0.9)
+        return iter([segment]), info
+
+
+def test_long_transcription_segments_get_global_offsets(
+    vad: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    split = whisper_service.split_on_silence
+    monkeypatch.setattr(
+        whisper_service,
+        "split_on_silence",
+        lambda audio: split(audio, piece_seconds=10),
+    )
+    monkeypatch.setattr(
+        whisper_service, "decode_audio", lambda path, sampling_rate: np.zeros(26 * SR)
+    )
+    monkeypatch.setattr(
+        whisper_service, "get_whisper_model", lambda cpu_threads=None: FakeWhisper()
+    )
+    pool = ThreadPoolExecutor(max_workers=3)
+    monkeypatch.setattr(whisper_service, "_get_long_audio_pool", lambda: pool)
+
+    try:
+        segments, language, probability = whisper_service.stream_long_transcription(
+            "meeting.wav"
+        )
+        segments = list(segments)
+    finally:
+        pool.shutdown()
+
+    assert (language, probability) == ("fr", 0.9)
+    assert segments == [
+        {"start": 1.0, "end": 2.0, "text": "10s"},
+        {"start": 11.0, "end": 12.0, "text": "10s"},
+        {"start": 21.0, "end": 22.0, "text": "6s"},
+    ]
+
+
+def test_shutdown_long_audio_pool_forgets_the_pool(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(whisper_service, "_long_audio_pool", pool)
+
+    whisper_service.shutdown_long_audio_pool()
+
+    assert whisper_service._long_audio_pool is None
+    with pytest.raises(RuntimeError):
+        pool.submit(print)
+    # Nothing to stop when no long recording was transcribed
+    whisper_service.shutdown_long_audio_pool()
+
+
+@pytest.fixture
+def speech(monkeypatch: pytest.MonkeyPatch) -> Dict[str, Any]:
+    """Stubbed transcribe and diarize, each waiting a moment for the other."""
+    state: Dict[str, Any] = {"running": 0, "overlapped": False}
+    lock = threading.Lock()
+
+    def stage(result: Any) -> Any:
+        with lock:
+            state["running"] += 1
+        time.sleep(0.1)
+        with lock:
+            state["overlapped"] = state["overlapped"] or state["running"] == 2
+            state["running"] -= 1
+        return result
+
+    segments = [{"start": 0.0, "end": 1.0, "text": "hello"}]
+    turns = [{"start": 0.0, "end": 1.0, "speaker": "SPEAKER_00"}]
+    monkeypatch.setattr(
+        whisper_service, "transcribe", lambda path: stage((segments, "en", 0.9))
+    )
+    monkeypatch.setattr(whisper_service, "diarize", lambda path: stage(turns))
+    return state
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_both_modes_give_the_same_result(
+    speech: Dict[str, Any], concurrent: bool
+) -> None:
+    stages: List[Tuple[str, Any]] = []
+
+    result = whisper_service.transcribe_and_diarize(
+        "meeting.wav",
+        concurrent,
+        progress=lambda stage, done=None, total=None: stages.append((stage, done)),
+    )
+
+    assert result == (
+        [{"start": 0.0, "end": 1.0, "text": "hello"}],
+        [{"start": 0.0, "end": 1.0, "speaker": "SPEAKER_00"}],
+        "en",
+        0.9,
+    )
+    assert sorted(stages) == [
+        ("diarization", 0),
+        ("diarization", 1),
+        ("transcription", 0),
+        ("transcription", 1),
+    ]
+    # Only the concurrent mode runs the two stages at the same time
+    assert speech["overlapped"] is concurrent
+
+
+def test_mode_follows_the_current_setting(
+    speech: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(whisper_service.settings, "PIPELINE_CONCURRENT", False)
+    whisper_service.transcribe_and_diarize("meeting.wav")
+    assert speech["overlapped"] is False
+
+    monkeypatch.setattr(whisper_service.settings, "PIPELINE_CONCURRENT", True)
+    whisper_service.transcribe_and_diarize("meeting.wav")
+    assert speech["overlapped"] is True